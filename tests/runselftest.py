@@ -254,11 +254,6 @@ def runTests(test_saves=False, test_unlink=False):
         print("%i/%i tests FAILED" % (fails, passes+fails))
         sys.exit(fails)
 
-oldflt = svg_export.fltStr
-def fltStr(v, prec=1):
-    """Only output floats to 1 dp."""
-    return oldflt(v, prec=prec)
-
 if __name__ == '__main__':
     os.environ['LC_ALL'] = 'C'
 
@@ -278,7 +273,8 @@ if __name__ == '__main__':
     # dpi (use old values)
     svg_export.dpi = 90.
     svg_export.scale = 1.
-    svg_export.fltStr = fltStr
+    # only output floats to 1 dp
+    svg_export.fltprec = 1
 
     parser = optparse.OptionParser()
     parser.add_option("", "--test-saves", action="store_true",
@@ -0,0 +1,42 @@
+"""Check that dataset plugins are only rerun when their input
+datasets change."""
+
+import sys
+
+import numpy as N
+import veusz.document as document
+import veusz.plugins as plugins
+
+class CountingMultiply(plugins.MultiplyDatasetPlugin):
+    """Multiply plugin which counts how often it is run."""
+
+    def __init__(self):
+        plugins.MultiplyDatasetPlugin.__init__(self)
+        self.runs = 0
+
+    def updateDatasets(self, fields, helper):
+        self.runs += 1
+        plugins.MultiplyDatasetPlugin.updateDatasets(self, fields, helper)
+
+def main(outfile):
+    doc = document.Document()
+    doc.setData('x', document.Dataset(data=N.arange(5.)))
+
+    plugin = CountingMultiply()
+    doc.applyOperation(document.OperationDatasetPlugin(
+        plugin, {'ds_in': 'x', 'factor': 2., 'ds_out': 'y'}))
+    startruns = plugin.runs
+
+    out = open(outfile, 'w')
+    out.write('first read: %s\n' % doc.data['y'].data.tolist())
+    out.write('second read: %s\n' % doc.data['y'].data.tolist())
+    out.write('runs for two reads: %i\n' % (plugin.runs-startruns))
+
+    doc.setData('x', document.Dataset(data=N.arange(3.)))
+    out.write('read after change: %s\n' % doc.data['y'].data.tolist())
+    doc.data['y'].data
+    out.write('runs after change: %i\n' % (plugin.runs-startruns))
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
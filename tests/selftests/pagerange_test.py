@@ -0,0 +1,22 @@
+"""Check parsing of page ranges for batch export."""
+
+import sys
+
+from veusz.veusz_main import parsePageRange
+
+def main(outfile):
+    out = open(outfile, 'w')
+    for text, numpages in (
+        (None, 3), ('all', 3), ('2', 3), ('1-2', 3), ('2-', 3),
+        ('-2', 3), ('1-3,5,7-', 8), ('3,1,3', 3), ('2-9', 3),
+        ('5', 3), ('4-', 3), ('2,4-6', 3), ('0', 3), ('3-1', 3),
+        ('x', 3)):
+        try:
+            res = parsePageRange(text, numpages)
+        except ValueError as e:
+            res = 'ValueError: %s' % e
+        out.write('%r of %i: %s\n' % (text, numpages, res))
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
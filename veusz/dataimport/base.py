@@ -298,3 +298,8 @@ class OperationDataImportBase(object):
         if self.oldconst is not None:
             document.customs = self.oldconst
             document.updateEvalContext()
+
+    def memoryCost(self):
+        """Memory used by datasets replaced by the import."""
+        return sum([ds.memoryCost() for name, ds in self.olddatasets
+                    if ds is not None])
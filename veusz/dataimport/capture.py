@@ -24,7 +24,9 @@ import socket
 import platform
 import signal
 
-from ..compat import cstr
+import numpy as N
+
+from ..compat import cstr, cvalues
 from .. import qtall as qt4
 from .. import utils
 from . import simpleread
@@ -231,6 +233,17 @@ class SocketCaptureStream(CaptureStream):
         """Close the socket."""
         self.socket.close()
 
+def _sameCapturedValues(oldds, newds):
+    """Do datasets share the same values in memory?
+
+    If copying is disabled, datasets share the memory of the values
+    captured, which are not modified once read."""
+    a = getattr(oldds, 'data', None)
+    b = newds.data
+    return ( isinstance(a, N.ndarray) and isinstance(b, N.ndarray) and
+             a.shape == b.shape and
+             a.__array_interface__['data'] == b.__array_interface__['data'] )
+
 class OperationDataCaptureSet(object):
     """An operation for setting the results from a SimpleRead into the
     document's data from a data capture.
@@ -240,23 +253,41 @@ class OperationDataCaptureSet(object):
 
     descr = _('data capture')
 
-    def __init__(self, simplereadobject):
-        """Takes a simpleread object containing the data to be set."""
+    def __init__(self, simplereadobject, copy=True):
+        """Takes a simpleread object containing the data to be set.
+
+        If copy is False, the datasets share memory with the values
+        being captured (for temporary updates while capturing)."""
         self.simplereadobject = simplereadobject
+        self.copy = copy
 
     def do(self, doc):
         """Set the data in the document."""
 
+        self.nameschanged = []
+        self.olddata = {}
+        self.update(doc)
+
+    def update(self, doc):
+        """Set the data in the document again, after more data have
+        been captured.
+
+        Only datasets which have changed length are replaced, so that
+        widgets plotting other datasets do not need to be redrawn."""
+
         # set the data to the document and keep a list of what's changed
         readdata = {}
-        self.simplereadobject.setOutput(readdata)
+        self.simplereadobject.setOutput(readdata, copy=self.copy)
 
-        # keep a copy of datasets which have changed from backup
-        self.nameschanged = list(readdata)
-        self.olddata = {}
-        for name in self.nameschanged:
-            if name in doc.data:
-                self.olddata[name] = doc.data[name]
+        for name in readdata:
+            if name in self.nameschanged:
+                if _sameCapturedValues(doc.data.get(name), readdata[name]):
+                    continue
+            else:
+                # keep a copy of datasets which have changed from backup
+                self.nameschanged.append(name)
+                if name in doc.data:
+                    self.olddata[name] = doc.data[name]
             doc.setData(name, readdata[name])
 
     def undo(self, doc):
@@ -269,3 +300,7 @@ class OperationDataCaptureSet(object):
             else:
                 # or delete datasets that weren't there before
                 doc.deleteData(name)
+
+    def memoryCost(self):
+        """Memory used by datasets replaced by the capture."""
+        return sum([ds.memoryCost() for ds in cvalues(self.olddata)])
@@ -157,20 +157,12 @@ def convertSliceToText(slice):
 
 def applySlices(data, slices):
     """Given hdf/numpy dataset, apply slicing tuple to it and return data."""
-    slist = []
-    for s in slices:
-        if isinstance(s, int):
-            slist.append(s)
-        else:
-            slist.append(slice(*s))
-            if s[2] is not None and s[2] < 0:
-                # negative slicing doesn't work in h5py, so we
-                # make a copy
-                data = N.array(data)
-    try:
-        data = data[tuple(slist)]
-    except (ValueError, IndexError):
-        data = N.array([], dtype=N.float64)
+    return document.applyHDF5Slices(data, slices)
+
+def readIfLazy(data):
+    """Read data now if it is a lazy HDF5 source."""
+    if isinstance(data, document.HDF5Source):
+        return data.read()
     return data
 
 def convertDatasetToObject(data, slices):
@@ -293,6 +285,16 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
             if self.params.slices and dsname in self.params.slices:
                 aslice = self.params.slices[dsname]
 
+            # linked 1D numeric datasets are read when first used
+            if ( self.params.linked and isinstance(dataset, h5py.Dataset) and
+                 dataset.dtype.kind in ('b', 'i', 'u', 'f') ):
+                src = document.HDF5Source(
+                    self.params.filename, dataset.name, slices=aslice,
+                    shape=dataset.shape)
+                if len(src.shape) == 1:
+                    dsread[name] = _DataRead(dsname, src, options)
+                    return
+
             # finally return data
             objdata = convertDatasetToObject(dataset, aslice)
             dsread[name] = _DataRead(dsname, objdata, options)
@@ -374,7 +376,8 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
         for name in list(dsread):
             dr = dsread[name]
             ds = dr.data
-            if not isinstance(ds, N.ndarray) or len(ds.shape) != 1:
+            if ( not isinstance(ds, (N.ndarray, document.HDF5Source)) or
+                 len(ds.shape) != 1 ):
                 # skip non-numeric or 2d datasets
                 continue
 
@@ -405,6 +408,7 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                 except (TypeError, KeyError):
                     mode = dread.options["vsz_convert_datetime"]
 
+                data = readIfLazy(data)
                 if mode == 'unix':
                     data = utils.floatUnixToVeusz(data)
                 ds = document.DatasetDateTime(data)
@@ -422,9 +426,13 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                               if d is not None])
                 for a in list(args):
                     if args[a] is not None and len(args[a]) > minlen:
-                        args[a] = args[a][:minlen]
+                        args[a] = readIfLazy(args[a])[:minlen]
 
-                ds = document.Dataset(**args)
+                if any( (isinstance(a, document.HDF5Source)
+                         for a in cvalues(args)) ):
+                    ds = document.DatasetLazy(**args)
+                else:
+                    ds = document.Dataset(**args)
 
         elif len(data.shape) == 2:
             # 2D dataset
@@ -525,7 +533,7 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
 
         # create the veusz output datasets
         for name, dread in citems(dsread):
-            if isinstance(dread.data, N.ndarray):
+            if isinstance(dread.data, (N.ndarray, document.HDF5Source)):
                 # numeric
                 ds = self.numericDataToDataset(name, dread, errordatasets)
             else:
@@ -105,8 +105,14 @@ class OperationDataImportPlugin(base.OperationDataImportBase):
         # convert results to real datasets
         for d in results:
             if isinstance(d, plugins.Dataset1D):
-                ds = document.Dataset(data=d.data, serr=d.serr, perr=d.perr,
-                                      nerr=d.nerr)
+                if any( (plugins.isReadOnlyArray(x)
+                         for x in (d.data, d.serr, d.perr, d.nerr)) ):
+                    # avoid copying memory-mapped data
+                    dsclass = document.DatasetMapped
+                else:
+                    dsclass = document.Dataset
+                ds = dsclass(data=d.data, serr=d.serr, perr=d.perr,
+                             nerr=d.nerr)
             elif isinstance(d, plugins.Dataset2D):
                 ds = document.Dataset2D(data=d.data,
                                         xrange=d.rangex, yrange=d.rangey,
@@ -21,12 +21,14 @@ in an easy-to-use manner."""
 
 from __future__ import division
 import re
+import itertools
 import numpy as N
 
-from ..compat import crange, cnext, CIterator
+from ..compat import crange, cnext, czip, CIterator
 from .. import document
 from .. import utils
 from .. import qtall as qt4
+from .simpleread import FloatBuffer
 
 class _FileReaderCols(CIterator):
     """Read a CSV file in rows. This acts as an iterator.
@@ -51,6 +53,20 @@ class _FileReaderCols(CIterator):
 
         return row
 
+    def nextLines(self, num):
+        """Return a list of up to num rows."""
+        rows = list(itertools.islice(self.csvreader, num))
+        if any(len(r) != self.maxlen for r in rows):
+            # pad rows as above
+            for i, row in enumerate(rows):
+                self.maxlen = max(self.maxlen, len(row))
+                rows[i] = row + ['']*(self.maxlen - len(row))
+        return rows
+
+    def lineLength(self):
+        """Approximate length of lines returned."""
+        return self.maxlen
+
 class _FileReaderRows(CIterator):
     """Read a CSV file in columns. This acts as an iterator.
 
@@ -87,6 +103,14 @@ class _FileReaderRows(CIterator):
         self.counter += 1
         return retn
 
+    def nextLines(self, num):
+        """Return a list of up to num columns."""
+        return list(itertools.islice(self, num))
+
+    def lineLength(self):
+        """Length of columns returned."""
+        return len(self.data)
+
 # list of codes which can be added to column descriptors
 typecodes = (
     ('(string)', 'string'),
@@ -98,6 +122,15 @@ typecodes = (
     ('(number)', 'float'),
     )
 
+# range of number of lines to convert at once
+csv_chunk_min_lines = 16
+csv_chunk_max_lines = 16384
+# maximum number of values to convert at once (for wide files)
+csv_chunk_max_values = 262144
+
+# match blank values in text of values separated by new lines
+csv_blank_re = re.compile(r'^[ \t]*$', re.MULTILINE)
+
 class _NextValue(Exception):
     """A class to be raised to move to next value."""
 
@@ -114,9 +147,18 @@ class ReadCSV(object):
         self.datere = re.compile(
             utils.dateStrToRegularExpression(params.dateformat))
 
-        # created datasets. Each name is associated with a list
+        # created datasets. Each name is associated with a list (or a
+        # FloatBuffer for numerical data)
         self.data = {}
 
+        # numbers with the decimal point of the locale, which are
+        # converted in the same way by Python and QLocale
+        self.decimalpoint = self.numericlocale.decimalPoint()
+        num = r'[+-]?[0-9]+(?:%s[0-9]+)?(?:[eE][+-]?[0-9]+)?' % (
+            re.escape(self.decimalpoint))
+        self.numbersre = re.compile(
+            r'(?:%s|[ \t]*)(?:\n(?:%s|[ \t]*))*\Z' % (num, num))
+
     def _generateName(self, column):
         """Generate a name for a column."""
         if self.params.readrows:
@@ -300,6 +342,104 @@ class ReadCSV(object):
             # conversion succeeded - append number to data
             self.data[self.colnames[colnum]].append(v)
 
+    def _convertFloatChunk(self, col):
+        """Convert a column of text to a list of numbers.
+        Raises ValueError if values cannot be converted."""
+
+        text = '\n'.join(col)
+        if self.numbersre.match(text) is None:
+            raise ValueError("Not numerical data")
+        if self.decimalpoint != '.':
+            text = text.replace(self.decimalpoint, '.')
+        strs = text.split('\n')
+        if len(strs) != len(col):
+            # an item contained a newline, so cannot be a number
+            raise ValueError("Multi-line item")
+
+        if csv_blank_re.search(text) is None:
+            vals = N.array(strs, dtype=N.float64)
+        else:
+            blanks = N.array([v.strip() == '' for v in strs], dtype=bool)
+            vals = N.array([v if v.strip() else 'nan' for v in strs],
+                           dtype=N.float64)
+            if not self.params.blanksaredata:
+                vals = vals[~blanks]
+
+        if N.isinf(vals).any():
+            # overflows are not accepted by QLocale
+            raise ValueError("Overflow")
+        return vals
+
+    def _convertDateChunk(self, col):
+        """Convert a column of text to a list of dates.
+        Raises ValueError if values cannot be converted."""
+
+        blanks = N.array([v.strip() == '' for v in col], dtype=bool)
+        nonblank = [v for v in col if v.strip()]
+        dates = utils.dateStringsToFloats(self.datere, nonblank)
+        if not self.params.blanksaredata:
+            return dates
+        vals = N.full(len(col), N.nan)
+        vals[~blanks] = dates
+        return vals
+
+    def _convertChunk(self, lines):
+        """Convert a set of lines in one go, if the types of the
+        columns are known and all the values can be converted.
+
+        Returns False if the values must be handled one at a time.
+        """
+
+        ncols = len(lines[0])
+        if any(len(line) != ncols for line in lines):
+            return False
+
+        colnames = self.colnames
+        names = [colnames[c] for c in crange(ncols) if c in colnames]
+        if len(set(names)) != len(names):
+            # columns read into the same dataset
+            return False
+
+        # convert each column
+        converted = []
+        for colnum, col in enumerate(czip(*lines)):
+            if colnum not in colnames:
+                if ''.join(col).strip():
+                    # need to start a new dataset
+                    return False
+                continue
+
+            ctype = self.coltypes[colnum]
+            if self.colignore[colnum] > 0 or ctype == 'unknown':
+                return False
+
+            try:
+                if ctype == 'float':
+                    vals = self._convertFloatChunk(col)
+                elif ctype == 'date':
+                    vals = self._convertDateChunk(col)
+                else:
+                    vals = col
+            except ValueError:
+                # value needs to be handled separately
+                return False
+            converted.append( (colnames[colnum], ctype, vals) )
+
+        # store data
+        for name, ctype, vals in converted:
+            data = self.data[name]
+            if ctype == 'string':
+                data += vals
+            else:
+                if not isinstance(data, FloatBuffer):
+                    # convert from a list to a buffer
+                    buf = FloatBuffer()
+                    buf.extend(N.array(data, dtype=N.float64))
+                    data = self.data[name] = buf
+                data.extend(vals)
+
+        return True
+
     def readData(self):
         """Read the data into the document."""
 
@@ -338,19 +478,27 @@ class ReadCSV(object):
         # type detection
         self.colblanks = {}
 
-        # iterate over each line (or column)
+        # read lines (or columns) in chunks, converting each chunk at
+        # once if possible, or value by value if not
+        chunklines = csv_chunk_min_lines
         while True:
-            try:
-                line = cnext(it)
-            except StopIteration:
+            lines = it.nextLines( max(1, min(
+                chunklines, csv_chunk_max_values // max(1, it.lineLength()))) )
+            if not lines:
                 break
 
-            # iterate over items on line
-            for colnum, col in enumerate(line):
-                try:
-                    self._handleVal(colnum, col)
-                except _NextValue:
-                    pass
+            if self._convertChunk(lines):
+                chunklines = min(chunklines*2, csv_chunk_max_lines)
+                continue
+            chunklines = max(chunklines//2, csv_chunk_min_lines)
+
+            # iterate over items on each line
+            for line in lines:
+                for colnum, col in enumerate(line):
+                    try:
+                        self._handleVal(colnum, col)
+                    except _NextValue:
+                        pass
 
     def setData(self, outmap, linkedfile=None):
         """Set the read-in datasets in the dict outmap."""
@@ -364,7 +512,10 @@ class ReadCSV(object):
             # get data and errors (if any)
             data = []
             for k in (name, name+'\0+-', name+'\0+', name+'\0-'):
-                data.append( self.data.get(k, None) )
+                d = self.data.get(k, None)
+                if isinstance(d, FloatBuffer):
+                    d = d.array()
+                data.append(d)
 
             # make them have a maximum length by adding NaNs
             maxlen = max([len(x) for x in data if x is not None])
@@ -43,10 +43,11 @@ x +- y + -
 from __future__ import division
 import re
 import ast
+import itertools
 
 import numpy as N
 
-from ..compat import crange, cnext, CStringIO
+from ..compat import crange, cnext, citems, cvalues, CStringIO
 from .. import utils
 from .. import document
 from .. import qtall as qt4
@@ -137,6 +138,30 @@ def interpretDescriptor(descr):
 
     return parts
 
+# range of number of lines to read at once when reading numbers quickly
+fast_read_min_lines = 16
+fast_read_max_lines = 16384
+
+# lines starting with text (for ignoring text)
+fast_read_text_re = re.compile(r'^[ \t]*[A-Za-z]', re.MULTILINE)
+
+_fast_read_lines_re_cache = {}
+def fastReadLinesRE(ncols):
+    """Get regular expression to match lines of text which are blank or
+    have ncols columns.
+
+    Columns cannot contain quotes, comments, continuations or
+    non-ascii characters."""
+    try:
+        return _fast_read_lines_re_cache[ncols]
+    except KeyError:
+        col = r'[$&()*+,\-./0-9:<=>?@A-Z\[\]^_a-z{|}~]+'
+        line = r'[ \t]*(?:(?:%s[ \t]+){%i}%s[ \t]*)?' % (
+            col, ncols-1, col)
+        regex = re.compile(r'%s(?:\r?\n%s)*\Z' % (line, line))
+        _fast_read_lines_re_cache[ncols] = regex
+        return regex
+
 class DescriptorError(ValueError):
     """Used to indicate an error with the descriptor."""
     pass
@@ -198,6 +223,84 @@ def guessDataType(val):
     # assume string otherwise
     return 'string'
 
+class FloatBuffer(object):
+    """An extendable array of floating point values, used to store
+    numerical data as they are read.
+
+    This behaves enough like a list for reading data, but uses much
+    less memory. Values can be removed from the start (e.g. to keep
+    the last values captured) as well as the end."""
+
+    def __init__(self):
+        self.data = N.empty(1024, dtype=N.float64)
+        # values are data[start:start+size]
+        self.start = 0
+        self.size = 0
+
+    def _reserve(self, num):
+        """Make sure there is space for num more values.
+
+        Values are copied into a new array, rather than moved within
+        the existing one, so that views returned by view() do not
+        change."""
+        needed = self.size + num
+        if self.start + needed > len(self.data):
+            if needed*2 <= len(self.data):
+                # lots of space discarded at the start
+                newdata = N.empty(len(self.data), dtype=N.float64)
+            else:
+                newdata = N.empty(max(needed, 2*len(self.data)),
+                                  dtype=N.float64)
+            newdata[:self.size] = self.data[self.start:self.start+self.size]
+            self.data = newdata
+            self.start = 0
+
+    def append(self, val):
+        """Add a value to the end."""
+        self._reserve(1)
+        self.data[self.start+self.size] = val
+        self.size += 1
+
+    def extend(self, vals):
+        """Add an array of values to the end."""
+        num = len(vals)
+        self._reserve(num)
+        pos = self.start + self.size
+        self.data[pos:pos+num] = vals
+        self.size += num
+
+    def array(self):
+        """Return a copy of the values as a numpy array."""
+        return N.array(self.view())
+
+    def view(self):
+        """Return a read-only view of the current values, without
+        copying them."""
+        v = self.data[self.start:self.start+self.size]
+        v.flags.writeable = False
+        return v
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        return self.data[self.start:self.start+self.size][idx]
+
+    def __delitem__(self, idx):
+        """Remove values from the end or start (only del buf[n:] or
+        del buf[:n] are supported)."""
+        start, stop, step = idx.indices(self.size)
+        if step != 1:
+            raise ValueError("Cannot delete with step from buffer")
+        if stop == self.size:
+            self.size = min(self.size, start)
+        elif start == 0:
+            stop = max(stop, 0)
+            self.start += stop
+            self.size -= stop
+        else:
+            raise ValueError("Can only delete values from ends of buffer")
+
 class DescriptorPart(object):
     """Represents part of a descriptor."""
 
@@ -246,15 +349,24 @@ class DescriptorPart(object):
                 # \0 is used as the user cannot enter it
                 fullname = '%s\0%s' % (name, col)
 
+                if not self.datatype:
+                    # try to guess type of data
+                    self.datatype = guessDataType(val)
+
                 # get dataset (or get new one)
                 try:
                     dataset = thedatasets[fullname]
                 except KeyError:
-                    dataset = thedatasets[fullname] = []
-
-                if not self.datatype:
-                    # try to guess type of data
-                    self.datatype = guessDataType(val)
+                    if self.datatype == 'float':
+                        dataset = FloatBuffer()
+                    else:
+                        dataset = []
+                    thedatasets[fullname] = dataset
+                else:
+                    if ( self.datatype != 'float' and
+                         isinstance(dataset, FloatBuffer) ):
+                        # datatype changed by a new descriptor
+                        dataset = thedatasets[fullname] = list(dataset[:])
 
                 # convert according to datatype
                 if self.datatype == 'float':
@@ -284,10 +396,37 @@ class DescriptorPart(object):
                 # add data into dataset
                 dataset.append(dat)
 
+    def fastColumns(self):
+        """Return the dataset names of the columns read by this part,
+        if it only reads numerical data from a fixed number of
+        columns. Otherwise return None.
+
+        Ignored columns are returned as None."""
+
+        if ( self.datatype != 'float' or
+             self.stopindex - self.startindex > 1000 ):
+            return None
+
+        names = []
+        for index in crange(self.startindex, self.stopindex+1):
+            if self.single:
+                name = self.name
+            else:
+                name = '%s_%i' % (self.name, index)
+            for col in self.columns:
+                if col == ',':
+                    names.append(None)
+                else:
+                    names.append('%s\0%s' % (name, col))
+        return names
+
     def setOutput(self, thedatasets, outmap, block=None,
                   linkedfile=None,
-                  prefix="", suffix="", tail=None):
-        """Set the read-in data in the document."""
+                  prefix="", suffix="", tail=None, copy=True):
+        """Set the read-in data in the document.
+
+        If copy is False, numerical values are not copied, so the
+        datasets share the memory of the values being read."""
 
         # we didn't read any data
         if self.datatype is None:
@@ -321,6 +460,12 @@ class DescriptorPart(object):
                     if ds is not None and len(ds) != minlength:
                         del ds[minlength:]
 
+                # convert buffers of numbers to arrays
+                vals, sym, pos, neg = [
+                    (x.array() if copy else x.view())
+                    if isinstance(x, FloatBuffer) else x
+                    for x in (vals, sym, pos, neg) ]
+
                 # only remember last N values
                 if tail is not None:
                     vals = vals[-tail:]
@@ -366,9 +511,16 @@ class Stream(object):
     [^ \t\n\r#!%;]+ # match normal space/tab separated items
     ''', re.VERBOSE )
 
+    # whether lines can be read directly using readLine, for reading
+    # numerical data quickly (readLine should only raise StopIteration
+    # at the end of the data)
+    allowfastread = False
+
     def __init__(self):
         """Initialise stream object."""
         self.remainingline = []
+        # lines returned by pushBackLines (in reverse order)
+        self.pushedlines = []
 
     def nextColumn(self):
         """Return value of next column of line."""
@@ -390,16 +542,38 @@ class Stream(object):
         StopIteration is raised if there is no more data."""
         pass
 
+    def readLines(self, num):
+        """Read up to num lines using readLine (after any lines pushed
+        back). Returns a list of lines, which is empty at the end of
+        the data."""
+        lines = []
+        while self.pushedlines and len(lines) < num:
+            lines.append(self.pushedlines.pop())
+        try:
+            while len(lines) < num:
+                lines.append(self.readLine())
+        except StopIteration:
+            pass
+        return lines
+
+    def pushBackLines(self, lines):
+        """Return lines read by readLine, so that they are read again
+        by newLine."""
+        self.pushedlines += lines[::-1]
+
     def newLine(self):
         """Read in, and split the next line."""
 
         while True:
             # get next line from data source
-            try:
-                line = self.readLine()
-            except StopIteration:
-                # end of file
-                return False
+            if self.pushedlines:
+                line = self.pushedlines.pop()
+            else:
+                try:
+                    line = self.readLine()
+                except StopIteration:
+                    # end of file
+                    return False
 
             # break up and append to buffer (removing comments)
             cmpts = self.find_re.findall(line)
@@ -414,6 +588,8 @@ class Stream(object):
 class FileStream(Stream):
     """A stream based on a python-style file (or iterable)."""
 
+    allowfastread = True
+
     def __init__(self, file):
         """File can be any iterator-like object."""
         Stream.__init__(self)
@@ -424,6 +600,12 @@ class FileStream(Stream):
         StopIteration is raised if there is no more data."""
         return cnext(self.file)
 
+    def readLines(self, num):
+        """Read up to num lines (after any lines pushed back)."""
+        lines = Stream.readLines(self, min(num, len(self.pushedlines)))
+        lines += itertools.islice(self.file, num-len(lines))
+        return lines
+
 class StringStream(FileStream):
     '''For reading data from a string.'''
     
@@ -499,6 +681,11 @@ class SimpleRead(object):
         self.blocks = None
         self.tail = None
 
+        # number of lines to read at once when reading numbers quickly
+        self.fastlines = fast_read_min_lines
+        # number of lines to read normally before trying again
+        self.fastskip = 0
+
     def _parseDescriptor(self, descriptor):
         """Take a descriptor, and parse it into its individual parts."""
         self.parts = interpretDescriptor(descriptor)
@@ -517,13 +704,127 @@ class SimpleRead(object):
         else:
             self._readDataUnblocked(stream, ignoretext)
 
+        if self.tail is not None:
+            self._discardBeforeTail()
+
+    def _discardBeforeTail(self):
+        """Discard values read before the last tail values, so that
+        memory use does not grow when capturing data."""
+
+        groups = {}
+        for fullname, vals in citems(self.datasets):
+            groups.setdefault(fullname.split('\0')[0], []).append(vals)
+
+        for vals in cvalues(groups):
+            num = min([len(v) for v in vals]) - self.tail
+            # discard in large pieces, so that removing values from
+            # the start of lists is cheap on average
+            if num > 0 and num >= self.tail:
+                for v in vals:
+                    del v[:num]
+
+    def _fastColumns(self):
+        """If the current parts only read numbers from a fixed number
+        of columns, return a list of the dataset names for each
+        column (None for ignored columns). Otherwise return None."""
+
+        if not self.parts:
+            return None
+        names = []
+        for part in self.parts:
+            partnames = part.fastColumns()
+            if partnames is None:
+                return None
+            names += partnames
+        return names
+
+    def _fastLinesOK(self, text, ncols):
+        """Can the lines in text be read quickly?"""
+        return not (
+            fastReadLinesRE(ncols).match(text) is None or
+            (self.ignoretext and fast_read_text_re.search(text)) )
+
+    def _readFast(self, stream):
+        """Quickly read a block of lines of numbers from the stream.
+
+        This is only done if every column is numerical. Lines with
+        quotes, comments, continuations, text, a different number of
+        columns or which cannot be converted to numbers are left to be
+        read by the normal method.
+
+        Returns True if any lines were read.
+        """
+
+        if self.fastskip > 0:
+            self.fastskip -= 1
+            return False
+        if not stream.allowfastread:
+            return False
+        names = self._fastColumns()
+        if names is None:
+            return False
+        ncols = len(names)
+
+        lines = stream.readLines(self.fastlines)
+        if not lines:
+            return False
+
+        text = '\n'.join(lines)
+        numlines = len(lines)
+        if self._fastLinesOK(text, ncols):
+            self.fastlines = min(self.fastlines*2, fast_read_max_lines)
+        else:
+            # only read lines before the first which cannot be read
+            # quickly, and use smaller blocks for a while
+            self.fastlines = max(self.fastlines//2, fast_read_min_lines)
+            for numlines, line in enumerate(lines):
+                if not self._fastLinesOK(line, ncols):
+                    break
+            stream.pushBackLines(lines[numlines:])
+            if numlines == 0:
+                return False
+            text = '\n'.join(lines[:numlines])
+
+        tokens = text.split()
+        if not tokens:
+            # only blank lines, which are ignored when not using blocks
+            return True
+
+        # convert each column (ignoring skipped columns)
+        colvals = []
+        try:
+            for colidx, name in enumerate(names):
+                if name is not None:
+                    colvals.append( (name, N.array(tokens[colidx::ncols],
+                                                   dtype=N.float64)) )
+        except ValueError:
+            # read these lines using the normal method
+            stream.pushBackLines(lines[:numlines])
+            self.fastskip = numlines
+            return False
+
+        for name, vals in colvals:
+            try:
+                dataset = self.datasets[name]
+            except KeyError:
+                dataset = self.datasets[name] = FloatBuffer()
+            dataset.extend(vals)
+
+        return True
+
     def _readDataUnblocked(self, stream, ignoretext):
         """Read in that data from the stream."""
 
         allparts = list(self.parts)
 
         # loop over lines
-        while stream.newLine():
+        while True:
+            # read lines of numbers quickly, if possible
+            if self._readFast(stream):
+                continue
+            if not stream.newLine():
+                break
+
             if stream.remainingline[:1] == ['descriptor']:
                 # a change descriptor statement
                 descriptor =  ' '.join(stream.remainingline[1:])
@@ -615,8 +916,12 @@ class SimpleRead(object):
         return out
 
     def setOutput(self, out, linkedfile=None,
-                  prefix='', suffix=''):
+                  prefix='', suffix='', copy=True):
         """Set the data in the out dict.
+
+        If copy is False, numerical datasets share memory with the
+        values being read, which is quicker when repeatedly setting
+        data while reading.
         """
 
         # iterate over blocks used
@@ -636,7 +941,7 @@ class SimpleRead(object):
                     block=block,
                     linkedfile=linkedfile,
                     prefix=prefix, suffix=suffix,
-                    tail=self.tail)
+                    tail=self.tail, copy=copy)
 
 #####################################################################
 # 2D data reading
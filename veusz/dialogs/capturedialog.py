@@ -283,17 +283,14 @@ class CapturingDialog(VeuszDialog):
     def slotUpdateTimer(self):
         """Called to update document while data is being captured."""
 
-        # undo any previous update
-        if self.updateoperation:
-            self.updateoperation.undo(self.document)
-
-        # create new one
-        self.updateoperation = capture.OperationDataCaptureSet(
-            self.simpleread)
-
         # apply it (bypass history here - urgh)
-        self.updateoperation.do(self.document)
-        self.document.setModified()
+        # datasets share memory with the captured values to avoid copying
+        if self.updateoperation:
+            self.updateoperation.update(self.document)
+        else:
+            self.updateoperation = capture.OperationDataCaptureSet(
+                self.simpleread, copy=False)
+            self.updateoperation.do(self.document)
 
     def streamCaptureFinished(self, message):
         """Stop timers, close stream and display message
@@ -36,6 +36,75 @@ def _(text, disambiguation=None, context="DataEditDialog"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+def _columnRuns(block, offset, convertfn):
+    """Yield (startrow, values) for runs of rows in block which have
+    an item in column offset, converting the items with convertfn.
+
+    Blank items which cannot be converted are skipped."""
+
+    start = None
+    vals = []
+    for i, items in enumerate(block):
+        val = None
+        if offset < len(items):
+            try:
+                val = convertfn(items[offset])
+            except ValueError:
+                if items[offset].strip():
+                    raise
+        if val is not None:
+            if start is None:
+                start = i
+            vals.append(val)
+        elif start is not None:
+            yield start, vals
+            start, vals = None, []
+    if start is not None:
+        yield start, vals
+
+def makePasteOperation(doc, row, block, columns):
+    """Make a single operation to paste block into datasets.
+
+    block is a list of rows, each a list of text items
+    columns is a list of (datasetname, columnname) to paste into
+    Columns of datasets which are not editable are skipped.
+    Returns None if there is nothing to paste.
+    Raises ValueError if an item cannot be converted.
+    """
+
+    inserts = []
+    setops = []
+    added = set()
+    for idx, (dsname, colname) in enumerate(columns):
+        ds = doc.data[dsname]
+        if not ds.editable:
+            continue
+        for start, vals in _columnRuns(block, idx, ds.uiConvertToDataItem):
+            # extend dataset to fit the values, once for each dataset
+            end = row+start+len(vals)
+            extra = end - len(ds.data) - sum(
+                [n for name, n in inserts if name == dsname])
+            if extra > 0:
+                inserts.append( (dsname, extra) )
+            if ( getattr(ds, colname) is None and
+                 (dsname, colname) not in added ):
+                added.add( (dsname, colname) )
+                setops.append(
+                    document.OperationDatasetAddColumn(dsname, colname))
+            setops.append(
+                document.OperationDatasetSetValues(
+                    dsname, colname, row+start, vals))
+
+    if not setops:
+        return None
+
+    ops = []
+    for dsname, extra in inserts:
+        ops.append(
+            document.OperationDatasetInsertRow(
+                dsname, len(doc.data[dsname].data), extra))
+    return document.OperationMultiple(ops+setops, descr=_('paste values'))
+
 class DatasetTableModel1D(qt4.QAbstractTableModel):
     """Provides access to editing and viewing of datasets."""
 
@@ -172,6 +241,28 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
             return False
         return True
 
+    def setDataBlock(self, row, column, block):
+        """Set a block of text items (list of rows) at row and column,
+        as a single operation."""
+
+        ds = self.document.data[self.dsname]
+        if not ds.editable:
+            return False
+        try:
+            op = makePasteOperation(
+                self.document, row, block,
+                [(self.dsname, c) for c in ds.columns[column:]])
+        except ValueError:
+            return False
+        if op is None:
+            return False
+
+        try:
+            self.document.applyOperation(op)
+        except (RuntimeError, ValueError):
+            return False
+        return True
+
 class DatasetTableModelMulti(qt4.QAbstractTableModel):
     """Edit multiple datasets simultaneously with a spreadsheet-like style."""
 
@@ -316,6 +407,30 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
         except RuntimeError:
             return False
 
+    def setDataBlock(self, row, column, block):
+        """Set a block of text items (list of rows) at row and column,
+        as a single operation."""
+
+        if self.changeset != self.document.changeset:
+            self.updateCounts()
+        ds = self.document.data.get(self.colattrs[column][0])
+        if ds is None or not ds.editable:
+            return False
+        try:
+            op = makePasteOperation(
+                self.document, row, block,
+                [(a[0], a[1]) for a in self.colattrs[column:]])
+        except ValueError:
+            return False
+        if op is None:
+            return False
+
+        try:
+            self.document.applyOperation(op)
+        except (RuntimeError, ValueError):
+            return False
+        return True
+
     def insertRows(self, row, count):
         ops = []
         for i, name in enumerate(self.dsnames):
@@ -489,6 +604,7 @@ class DataEditDialog(VeuszDialog):
         # actions for data table
         for text, slot in (
             (_('Copy'), self.slotCopy),
+            (_('Paste'), self.slotPaste),
             (_('Delete row'), self.slotDeleteRow),
             (_('Insert row'), self.slotInsertRow),
             ):
@@ -676,15 +792,45 @@ class DataEditDialog(VeuszDialog):
         # put text on clipboard
         qt4.QApplication.clipboard().setText(lines)
 
+    def slotPaste(self):
+        """Paste tab-separated text from clipboard, starting at the
+        current item."""
+        model = self.datatableview.model()
+        index = self.datatableview.currentIndex()
+        if ( model is None or not index.isValid() or
+             not hasattr(model, 'setDataBlock') ):
+            return
+
+        text = qt4.QApplication.clipboard().text()
+        block = [line.split('\t') for line in text.splitlines()]
+        # ignore blank lines at end
+        while block and block[-1] == ['']:
+            block.pop()
+        if block:
+            model.setDataBlock(index.row(), index.column(), block)
+
+    def selectedRowRange(self):
+        """Return (row, count) for the block of selected rows starting
+        from the first selected row, or the current row."""
+        rows = set([ i.row() for i in
+                     self.datatableview.selectionModel().selectedIndexes() ])
+        if not rows:
+            return self.datatableview.currentIndex().row(), 1
+
+        first = row = min(rows)
+        while row+1 in rows:
+            row += 1
+        return first, row-first+1
+
     def slotDeleteRow(self):
-        """Delete the current row."""
-        self.datatableview.model().removeRows(
-            self.datatableview.currentIndex().row(), 1)
+        """Delete the selected rows."""
+        row, count = self.selectedRowRange()
+        self.datatableview.model().removeRows(row, count)
 
     def slotInsertRow(self):
-        """Insert a new row."""
-        self.datatableview.model().insertRows(
-            self.datatableview.currentIndex().row(), 1)
+        """Insert new rows above the selected rows."""
+        row, count = self.selectedRowRange()
+        self.datatableview.model().insertRows(row, count)
 
     def slotNewNumericalDataset(self):
         """Add new value dataset."""
@@ -21,6 +21,7 @@
 from .widgetfactory import *
 from .doc import *
 from .datasets import *
+from .lazydata import *
 from .commandinterface import *
 from .commandinterpreter import *
 from .operations import *
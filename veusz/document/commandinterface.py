@@ -696,7 +696,8 @@ class CommandInterface(qt4.QObject):
             
     def Export(self, filename, color=True, page=0, dpi=100,
                antialias=True, quality=85, backcolor='#ffffff00',
-               pdfdpi=150, svgtextastext=False):
+               pdfdpi=150, svgtextastext=False, decimate=False,
+               svgstream=False):
         """Export plot to filename.
 
         color is True or False if color is requested in output file
@@ -708,12 +709,17 @@ class CommandInterface(qt4.QObject):
          a #RRGGBBAA value (red, green, blue, alpha)
         pdfdpi is the dpi to use when exporting eps or pdf files
         svgtextastext: write text in SVG as text, rather than curves
+        decimate: if True, skip plotting points which would not be visible
+         in the output (for large datasets)
+        svgstream: if True, write SVG output as it is drawn, rather than
+         keeping it in memory until the end (for large datasets)
         """
         
         e = export.Export(self.document, filename, page, color=color,
                           bitmapdpi=dpi, antialias=antialias,
                           quality=quality, backcolor=backcolor,
-                          pdfdpi=pdfdpi, svgtextastext=svgtextastext)
+                          pdfdpi=pdfdpi, svgtextastext=svgtextastext,
+                          decimate=decimate, svgstream=svgstream)
         e.export()
 
     def Rename(self, widget, newname):
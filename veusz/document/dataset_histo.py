@@ -18,8 +18,10 @@
 
 from __future__ import division
 import numpy as N
-from .datasets import Dataset1DBase, evalDatasetExpression
+from .datasets import (Dataset1DBase, expressionDependencies,
+                       datasetsMemoryCost, data_chunk_size)
 from .. import qtall as qt4
+from .. import utils
 
 def _(text, disambiguation=None, context="Datasets"):
     """Translate text."""
@@ -40,7 +42,7 @@ class DatasetHistoGenerator(object):
         errors = True/False
         """
 
-        self.changeset = -1
+        self.depkey = None
 
         self.document = document
         self.inexpr = inexpr
@@ -51,15 +53,49 @@ class DatasetHistoGenerator(object):
         self.errors = errors
         self.bindataset = self.valuedataset = None
 
-    def getData(self):
-        """Get data from input expression, caching result."""
-        if self.document.changeset != self.changeset:
-            d = evalDatasetExpression(self.document, self.inexpr)
-            if d is not None:
-                d = d.data
-            self._cacheddata = d
-            self.changeset = self.document.changeset
-        return self._cacheddata
+    def dependencies(self):
+        """Datasets used in input expression."""
+        return expressionDependencies(self.document.data, self.inexpr)
+
+    def dependencyKey(self):
+        """Key which changes when input datasets change."""
+        return self.document.dataDependencyKey(self.dependencies())
+
+    def getDataChunks(self):
+        """Return an iterator over the input data in chunks, or None
+        if the expression is invalid."""
+        ds = self.document.evalDatasetExpression(self.inexpr)
+        if ds is None:
+            return None
+        return ds.dataChunks(data_chunk_size)
+
+    def getHistogram(self):
+        """Return bin edges, counts in each bin and the total number
+        of input values, or None if there is no input data.
+
+        The input data are read in chunks, so that all the values do
+        not need to be in memory. The results are cached until the
+        input datasets change.
+        """
+        depkey = self.dependencyKey()
+        if depkey == self.depkey:
+            return self._cachedhisto
+
+        histo = None
+        chunks = self.getDataChunks()
+        if chunks is not None:
+            # auto bins read the data once to get the range first
+            binlocs = self.binLocations()
+            counts = N.zeros(max(len(binlocs)-1, 0), dtype=N.float64)
+            total = 0
+            for chunk in chunks:
+                counts += N.histogram(chunk, bins=binlocs)[0]
+                total += chunk.size
+            histo = (binlocs, counts, total)
+
+        self._cachedhisto = histo
+        self.depkey = depkey
+        return self._cachedhisto
 
     def binLocations(self):
         """Compute locations of bins edges, giving N+1 items."""
@@ -69,13 +105,14 @@ class DatasetHistoGenerator(object):
             numbins, minval, maxval, islog = self.binparams
 
             if minval == 'Auto' or maxval == 'Auto':
-                data = self.getData()
-                if data is None:
+                chunks = self.getDataChunks()
+                if chunks is None:
                     return N.array([])
+                datamin, datamax = utils.nanMinMaxChunks(chunks)
                 if minval == 'Auto':
-                    minval = N.nanmin(data)
+                    minval = datamin
                 if maxval == 'Auto':
-                    maxval = N.nanmax(data)
+                    maxval = datamax
 
             if not islog:
                 delta = (maxval - minval) / numbins
@@ -92,10 +129,11 @@ class DatasetHistoGenerator(object):
     def getBinLocations(self):
         """Return bin centre, -ve bin width, +ve bin width."""
 
-        if self.getData() is None:
+        histo = self.getHistogram()
+        if histo is None:
             return (N.array([]), None, None)
 
-        binlocs = self.binLocations()
+        binlocs = histo[0]
 
         if self.binparams and self.binparams[3]:
             # log bins
@@ -110,17 +148,14 @@ class DatasetHistoGenerator(object):
         perr = binlocs[1:] - data
         return data, nerr, perr
 
-    def getErrors(self, data, binlocs):
-        """Compute error bars if requried."""
-
-        hist, edges = N.histogram(data, bins=binlocs)
-        hist = hist.astype(N.float64)  # integers can break plots (github#49)
+    def getErrors(self, hist, binlocs, total):
+        """Compute error bars if requried, given counts in bins."""
 
         # calculate scaling values for error bars
         if self.method == 'density':
-            ratio = 1. / (hist.size*(edges[1]-edges[0]))
+            ratio = 1. / (hist.size*(binlocs[1]-binlocs[0]))
         elif self.method == 'fractions':
-            ratio = 1. / data.size
+            ratio = 1. / total
         else:
             ratio = 1.
 
@@ -139,17 +174,17 @@ class DatasetHistoGenerator(object):
     def getBinVals(self):
         """Return results for each bin."""
 
-        data = self.getData()
-        if data is None:
+        histo = self.getHistogram()
+        if histo is None:
             return (N.array([]), None, None)
 
-        normed = self.method == 'density'
-        binlocs = self.binLocations()
-        hist, edges = N.histogram(data, bins=binlocs, normed=normed)
-        hist = hist.astype(N.float64)  # integers can break plots (github#49)
-        
-        if self.method == 'fractions':
-            hist = hist * (1./data.size)
+        binlocs, counts, total = histo
+        if self.method == 'density':
+            hist = counts / (N.diff(binlocs) * counts.sum())
+        elif self.method == 'fractions':
+            hist = counts * (1./total)
+        else:
+            hist = counts
 
         # if cumulative wanted
         if self.cumulative == 'smalltolarge':
@@ -158,7 +193,7 @@ class DatasetHistoGenerator(object):
             hist = N.cumsum(hist[::-1])[::-1]
 
         if self.errors:
-            nerr, perr = self.getErrors(data, binlocs)
+            nerr, perr = self.getErrors(counts, binlocs, total)
         else:
             nerr, perr = None, None
 
@@ -213,15 +248,20 @@ class DatasetHistoBins(Dataset1DBase):
         self.document = document
         self.linked = None
         self._invalidpoints = None
-        self.changeset = -1
+        self.depkey = None
 
     def getData(self):
         """Get bin positions, caching results."""
-        if self.changeset != self.generator.document.changeset:
+        depkey = self.generator.dependencyKey()
+        if depkey != self.depkey:
             self.datacache = self.generator.getBinLocations()
-            self.changeset = self.generator.document.changeset
+            self.depkey = depkey
         return self.datacache
 
+    def dependencies(self):
+        """Datasets used to make histogram."""
+        return self.generator.dependencies()
+
     def linkedInformation(self):
         """Informating about linking."""
         return self.generator.linkedInformation() + _(" (bin positions)")
@@ -248,15 +288,20 @@ class DatasetHistoValues(Dataset1DBase):
         self.document = document
         self.linked = None
         self._invalidpoints = None
-        self.changeset = -1
+        self.depkey = None
 
     def getData(self):
         """Get bin heights, caching results."""
-        if self.changeset != self.generator.document.changeset:
+        depkey = self.generator.dependencyKey()
+        if depkey != self.depkey:
             self.datacache = self.generator.getBinVals()
-            self.changeset = self.generator.document.changeset
+            self.depkey = depkey
         return self.datacache
 
+    def dependencies(self):
+        """Datasets used to make histogram."""
+        return self.generator.dependencies()
+
     def saveDataRelationToText(self, fileobj, name):
         """Save dataset and its counterpart to a file."""
         self.generator.saveToFile(fileobj)
@@ -337,3 +382,8 @@ class OperationDatasetHistogram(object):
                 document.setData(self.outvalues, self.oldvaluesds)
         else:
             document.deleteData(self.outvalues)
+
+    def memoryCost(self):
+        """Memory used by overwritten datasets."""
+        return datasetsMemoryCost([getattr(self, 'oldvaluesds', None),
+                                   getattr(self, 'oldposnsds', None)])
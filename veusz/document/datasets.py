@@ -21,10 +21,11 @@
 
 from __future__ import division
 import re
+import mmap
 
 import numpy as N
 
-from ..compat import czip, crange, citems, cbasestr, cstr, crepr
+from ..compat import czip, crange, citems, cvalues, cbasestr, cstr, crepr
 from .. import qtall as qt4
 from .. import utils
 from .. import setting
@@ -33,6 +34,9 @@ def _(text, disambiguation=None, context="Datasets"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+# number of values to process at a time when iterating over datasets
+data_chunk_size = 1048576
+
 def convertNumpy(a, dims=1):
     """Convert to a numpy double if possible.
 
@@ -76,6 +80,38 @@ def _copyOrNone(a):
     elif isinstance(a, list):
         return list(a)
 
+def _isMapped(a):
+    """Is array a, or an array it is a view of, memory-mapped?"""
+    while a is not None:
+        if isinstance(a, (N.memmap, mmap.mmap)):
+            return True
+        # arrays have a base, buffers (memoryviews) an obj
+        a = getattr(a, 'base', getattr(a, 'obj', None))
+    return False
+
+def valuesMemoryCost(val):
+    """Estimate the number of bytes used by the values in val.
+
+    Arrays, strings and the contents of lists, tuples and dicts are
+    counted. Memory-mapped arrays, or views of them, are not counted,
+    as they are held in files.
+    """
+    if isinstance(val, N.ndarray):
+        return 0 if _isMapped(val) else val.nbytes
+    elif isinstance(val, cbasestr):
+        return len(val)
+    elif isinstance(val, (list, tuple)):
+        return 8*len(val) + sum([valuesMemoryCost(v) for v in val])
+    elif isinstance(val, dict):
+        return sum([valuesMemoryCost(v) for v in cvalues(val)])
+    return 0
+
+def datasetsMemoryCost(datasets):
+    """Estimate the number of bytes used by the datasets given.
+
+    Items which are None are ignored."""
+    return sum([ds.memoryCost() for ds in datasets if ds is not None])
+
 def generateValidDatasetParts(*datasets):
     """Generator to return array of valid parts of datasets.
 
@@ -252,6 +288,11 @@ class DatasetBase(object):
         """Return length of dataset."""
         return len(self.data)
 
+    def memoryCost(self):
+        """Estimate the number of bytes used by the values held by
+        the dataset (used to limit the size of the undo history)."""
+        return valuesMemoryCost(self.__dict__)
+
     def deleteRows(self, row, numrows):
         """Delete numrows rows starting from row.
         Returns deleted rows as a dict of {column:data, ...}
@@ -283,6 +324,11 @@ class DatasetBase(object):
         """Is it possible to rename this dataset?"""
         return self.linked is None
 
+    def dependencies(self):
+        """Return names of datasets this dataset is computed from.
+        Datasets holding their own values have no dependencies."""
+        return ()
+
     def datasetAsText(self, fmt='%g', join='\t'):
         """Return dataset as text (for use by user)."""
         return ''
@@ -564,6 +610,17 @@ def dsPreviewHelper(d):
         return line1
     return line1 + '\n' + line2
 
+def rangeVisitHelper(fn, data, serr, nerr, perr):
+    """Call fn on data points and error values, in order to get range."""
+    fn(data)
+    if serr is not None:
+        fn(data - serr)
+        fn(data + serr)
+    if nerr is not None:
+        fn(data + nerr)
+    if perr is not None:
+        fn(data + perr)
+
 class Dataset1DBase(DatasetBase):
     """Base for 1D datasets."""
 
@@ -644,14 +701,16 @@ class Dataset1DBase(DatasetBase):
 
     def rangeVisit(self, fn):
         '''Call fn on data points and error values, in order to get range.'''
-        fn(self.data)
-        if self.serr is not None:
-            fn(self.data - self.serr)
-            fn(self.data + self.serr)
-        if self.nerr is not None:
-            fn(self.data + self.nerr)
-        if self.perr is not None:
-            fn(self.data + self.perr)
+        rangeVisitHelper(fn, self.data, self.serr, self.nerr, self.perr)
+
+    def dataChunks(self, chunksize=None):
+        """Iterate over the data values in arrays of up to chunksize
+        values (default data_chunk_size). Datasets read from files may
+        override this to avoid reading all the values at once."""
+        chunksize = chunksize or data_chunk_size
+        data = self.data
+        for i in crange(0, len(data), chunksize):
+            yield data[i:i+chunksize]
 
     def empty(self):
         '''Is the data defined?'''
@@ -766,7 +825,8 @@ class Dataset(Dataset1DBase):
         for col in self.columns:
             coldata = getattr(self, col)
             if coldata is not None:
-                retn[col] = coldata[row:row+numrows]
+                # copy, so the old column is not kept alive by undo
+                retn[col] = N.array(coldata[row:row+numrows])
                 setattr(self, col, N.delete( coldata, N.s_[row:row+numrows] ))
 
         self.document.modifiedData(self)
@@ -787,6 +847,74 @@ class Dataset(Dataset1DBase):
 
         self.document.modifiedData(self)
 
+class DatasetMapped(Dataset):
+    '''A dataset backed by read-only arrays, e.g. memory-mapped files.
+
+    The arrays are not copied. They are only converted to float64 when
+    the values are first used, unless they are already float64.
+    '''
+
+    _converters = {
+        'data': convertNumpy,
+        'serr': convertNumpyAbs,
+        'perr': convertNumpyAbs,
+        'nerr': convertNumpyNegAbs,
+        }
+
+    def __init__(self, data = None, serr = None, nerr = None, perr = None,
+                 linked = None):
+        Dataset1DBase.__init__(self, linked=linked)
+
+        if data is None:
+            data = N.array([])
+        self._raw = {'data': data, 'serr': serr, 'perr': perr, 'nerr': nerr}
+        self._vals = {}
+
+        for x in serr, nerr, perr:
+            if x is not None and x.shape != data.shape:
+                raise DatasetException('Lengths of error data do not match data')
+
+    def _getColumn(self, col):
+        """Get column, converting raw values if necessary."""
+        try:
+            return self._vals[col]
+        except KeyError:
+            raw = self._raw.pop(col)
+            val = self._vals[col] = self._converters[col](raw)
+            return val
+
+    def _setColumn(self, col, val):
+        """Replace column values."""
+        self._raw.pop(col, None)
+        self._vals[col] = val
+
+    data = property( lambda self: self._getColumn('data'),
+                     lambda self, val: self._setColumn('data', val) )
+    serr = property( lambda self: self._getColumn('serr'),
+                     lambda self, val: self._setColumn('serr', val) )
+    perr = property( lambda self: self._getColumn('perr'),
+                     lambda self, val: self._setColumn('perr', val) )
+    nerr = property( lambda self: self._getColumn('nerr'),
+                     lambda self, val: self._setColumn('nerr', val) )
+
+    def userSize(self):
+        """Size of dataset, without converting values."""
+        if 'data' in self._raw:
+            return str(self._raw['data'].shape[0])
+        return Dataset.userSize(self)
+
+    def dataChunks(self, chunksize=None):
+        """Iterate over data, converting only a chunk of values at a
+        time if they have not been converted yet."""
+        if 'data' not in self._raw:
+            for chunk in Dataset.dataChunks(self, chunksize):
+                yield chunk
+        else:
+            chunksize = chunksize or data_chunk_size
+            raw = self._raw['data']
+            for i in crange(0, len(raw), chunksize):
+                yield convertNumpy(raw[i:i+chunksize])
+
 class DatasetDateTimeBase(Dataset1DBase):
     """Dataset holding dates and times."""
 
@@ -862,7 +990,7 @@ class DatasetDateTime(DatasetDateTimeBase):
         Returns deleted rows as a dict of {column:data, ...}
         """
         retn = {
-            'data': self.data[row:row+numrows],
+            'data': N.array(self.data[row:row+numrows]),
         }
         self.data = N.delete(self.data, N.s_[row:row+numrows])
         self.document.modifiedData(self)
@@ -972,9 +1100,8 @@ class DatasetText(DatasetBase):
         """
         data = rowdata.get('data', [])
 
-        insdata = data + (['']*(numrows-len(data)))
-        for d in insdata[::-1]:
-            self.data.insert(row, d)
+        insdata = list(data) + (['']*(numrows-len(data)))
+        self.data[row:row] = insdata
 
         self.document.modifiedData(self)
 
@@ -992,7 +1119,7 @@ dataexpr_split_re = re.compile(r'(`.*?`|[\.+\-*/\(\)\[\],<>=!|%^~& ])')
 dataexpr_quote_re = re.compile(r'^`.*`$')
 dataexpr_columns = {'data':True, 'serr':True, 'perr':True, 'nerr':True}
 
-def _substituteDatasets(datasets, expression, thispart):
+def substituteDatasets(datasets, expression, thispart):
     """Substitute the names of datasets with calls to a function which will
     evaluate them.
 
@@ -1024,7 +1151,13 @@ def _substituteDatasets(datasets, expression, thispart):
 
     return ''.join(bits), dslist
 
-def _evaluateDataset(datasets, dsname, dspart):
+def expressionDependencies(datasets, expression, thispart='data'):
+    """Return list of names of datasets read by expression."""
+    if expression in datasets:
+        return [expression]
+    return substituteDatasets(datasets, expression, thispart)[1]
+
+def evaluateDatasetPart(datasets, dsname, dspart):
     """Return the dataset given.
 
     dsname is the name of the dataset
@@ -1143,19 +1276,14 @@ def evalDatasetExpression(doc, origexpr, datatype='numeric',
         return None
 
     # replace dataset names by calls to _DS_(name,part)
-    expr, subdatasets = _substituteDatasets(doc.data, origexpr, part)
+    expr, subdatasets = doc.substituteDatasets(origexpr, part)
 
     comp = doc.compileCheckedExpression(expr, origexpr=origexpr)
     if comp is None:
         return
 
-    # set up environment for evaluation
-    env = doc.eval_context.copy()
-    def doeval(dsname, dspart):
-        return _evaluateDataset(doc.data, dsname, dspart)
-    env['_DS_'] = doeval
-
     # do evaluation
+    env = doc.evalEnvironment()
     try:
         evalout = eval(comp, env)
     except Exception as ex:
@@ -1197,7 +1325,10 @@ class DatasetExpression(Dataset1DBase):
         self.expr['perr'] = perr
         self.parametric = parametric
 
-        self.docchangeset = -1
+        # names of datasets read when evaluating, and the document
+        # dependency key at the time
+        self.deps = []
+        self.depkey = None
         self.evaluated = {}
 
     def evaluateDataset(self, dsname, dspart):
@@ -1206,22 +1337,19 @@ class DatasetExpression(Dataset1DBase):
         dsname is the name of the dataset
         dspart is the part to get (e.g. data, serr)
         """
-        return _evaluateDataset(self.document.data, dsname, dspart)
+        return evaluateDatasetPart(self.document.data, dsname, dspart)
 
-    def _evaluatePart(self, expr, part):
-        """Evaluate expression expr for part part.
+    def _evaluateExpr(self, newexpr, expr):
+        """Evaluate expression newexpr (expr with datasets substituted).
+        Returns numpy array or None if failed."""
 
-        Returns True if succeeded
-        """
-        # replace dataset names with calls
-        newexpr = _substituteDatasets(self.document.data, expr, part)[0]
-
-        comp = self.document.compileCheckedExpression(newexpr, origexpr=expr)
+        doc = self.document
+        comp = doc.compileCheckedExpression(newexpr, origexpr=expr)
         if comp is None:
-            return False
+            return None
 
-        # set up environment to evaluate expressions in
-        environment = self.document.eval_context.copy()
+        # environment to evaluate expressions in
+        environment = doc.evalEnvironment()
 
         # create dataset using parametric expression
         if self.parametric:
@@ -1231,11 +1359,9 @@ class DatasetExpression(Dataset1DBase):
                 t = N.arange(p[2])*deltat + p[0]
             else:
                 t = N.array([p[0]])
+            environment = dict(environment)
             environment['t'] = t
 
-        # this fn gets called to return the value of a dataset
-        environment['_DS_'] = self.evaluateDataset
-
         # actually evaluate the expression
         try:
             result = eval(comp, environment)
@@ -1244,10 +1370,36 @@ class DatasetExpression(Dataset1DBase):
             if len(evalout.shape) > 1:
                 raise RuntimeError("Number of dimensions is not 1")
         except Exception as ex:
-            self.document.log(
+            doc.log(
                 _("Error evaluating expression: %s\n"
-                  "Error: %s") % (self.expr[part], cstr(ex)) )
-            return False
+                  "Error: %s") % (expr, cstr(ex)) )
+            return None
+
+        return evalout
+
+    def _evaluatePart(self, expr, part, deps):
+        """Evaluate expression expr for part part.
+        Names of datasets used are added to deps.
+
+        Returns True if succeeded
+        """
+        doc = self.document
+
+        # replace dataset names with calls
+        newexpr, dslist = doc.substituteDatasets(expr, part)
+        deps += dslist
+
+        # identical expressions are only evaluated once while the
+        # datasets they use are unchanged
+        parametric = tuple(self.parametric) if self.parametric else None
+        key = ('expression', newexpr, parametric)
+        try:
+            evalout = doc.cachedExprResult(key)
+        except KeyError:
+            evalout = self._evaluateExpr(newexpr, expr)
+            if evalout is None:
+                return False
+            doc.setCachedExprResult(key, dslist, evalout)
 
         # make evaluated error expression have same shape as data
         if part != 'data':
@@ -1274,22 +1426,33 @@ class DatasetExpression(Dataset1DBase):
         Returns False if problem with any evaluation
         """
         ok = True
-        if self.docchangeset != self.document.changeset:
+        doc = self.document
+        depkey = doc.dataDependencyKey(self.deps)
+        if self.depkey != depkey:
             # avoid infinite recursion!
-            self.docchangeset = self.document.changeset
+            self.depkey = depkey
 
             # zero out previous values
             for part in self.columns:
                 self.evaluated[part] = None
 
             # update all parts
+            deps = []
             for part in self.columns:
                 expr = self.expr[part]
                 if expr is not None and expr.strip() != '':
-                    ok = ok and self._evaluatePart(expr, part)
+                    ok = ok and self._evaluatePart(expr, part, deps)
+
+            # now the inputs are known, record their state
+            self.deps = deps
+            self.depkey = doc.dataDependencyKey(deps)
 
         return ok
 
+    def dependencies(self):
+        """Datasets used in expressions."""
+        return self.deps
+
     def _propValues(self, part):
         """Check whether expressions need reevaluating,
         and recalculate if necessary."""
@@ -1482,7 +1645,8 @@ class Dataset2DXYZExpression(Dataset2DBase):
         Parameters are mathematical expressions based on datasets."""
         Dataset2DBase.__init__(self)
 
-        self.lastchangeset = -1
+        self.deps = []
+        self.depkey = None
         self.cacheddata = None
         self.xedge = self.yedge = self.xcent = self.ycent = None
 
@@ -1497,28 +1661,40 @@ class Dataset2DXYZExpression(Dataset2DBase):
         dsname is the name of the dataset
         dspart is the part to get (e.g. data, serr)
         """
-        return _evaluateDataset(self.document.data, dsname, dspart)
+        return evaluateDatasetPart(self.document.data, dsname, dspart)
 
     def evalDataset(self):
         """Return the evaluated dataset."""
 
         # FIXME: handle irregular grids
-        # return cached data if document unchanged
-        if self.document.changeset == self.lastchangeset:
+        # return cached data if input datasets unchanged
+        doc = self.document
+        depkey = doc.dataDependencyKey(self.deps)
+        if depkey == self.depkey:
             return self.cacheddata
-        self.lastchangeset = self.document.changeset
+        self.depkey = depkey
         self.cacheddata = None
 
+        deps = []
+        try:
+            return self._evalDatasetParts(deps)
+        finally:
+            # record state of datasets used
+            self.deps = deps
+            self.depkey = doc.dataDependencyKey(deps)
+
+    def _evalDatasetParts(self, deps):
+        """Evaluate dataset, adding names of datasets used to deps."""
+
         evaluated = {}
 
-        environment = self.document.eval_context.copy()
-        environment['_DS_'] = self.evaluateDataset
+        environment = self.document.evalEnvironment()
 
         # evaluate the x, y and z expressions
         for name in ('exprx', 'expry', 'exprz'):
             origexpr = getattr(self, name)
-            expr = _substituteDatasets(self.document.data, origexpr,
-                                       'data')[0]
+            expr, dslist = self.document.substituteDatasets(origexpr, 'data')
+            deps += dslist
 
             comp = self.document.compileCheckedExpression(
                 expr, origexpr=origexpr)
@@ -1579,6 +1755,10 @@ class Dataset2DXYZExpression(Dataset2DBase):
             return N.array( [[]] )
         return ds
 
+    def dependencies(self):
+        """Datasets used in expressions."""
+        return self.deps
+
     def description(self, showlinked=True):
         # FIXME: dataeditdialog descriptions should be taken from here somewhere
         text = self.name()
@@ -1614,7 +1794,6 @@ class Dataset2DExpression(Dataset2DBase):
         Dataset2DBase.__init__(self)
 
         self.expr = expr
-        self.lastchangeset = -1
 
     @property
     def data(self):
@@ -1622,6 +1801,10 @@ class Dataset2DExpression(Dataset2DBase):
         ds = self.evalDataset()
         return ds.data if ds is not None else N.array([[]])
 
+    def dependencies(self):
+        """Datasets used in expression."""
+        return expressionDependencies(self.document.data, self.expr)
+
     @property
     def xrange(self):
         """Return x range."""
@@ -1704,7 +1887,7 @@ class Dataset2DXYFunc(Dataset2DBase):
         self.xedge = self.yedge = self.xcent = self.ycent = None
 
         self.cacheddata = None
-        self.lastchangeset = -1
+        self.evalcontextchangeset = -1
 
     @property
     def data(self):
@@ -1718,7 +1901,8 @@ class Dataset2DXYFunc(Dataset2DBase):
     def evalDataset(self):
         """Evaluate the 2d dataset."""
 
-        if self.document.changeset == self.lastchangeset:
+        # only depends on the evaluation environment
+        if self.document.evalcontextchangeset == self.evalcontextchangeset:
             return self.cacheddata
 
         env = self.document.eval_context.copy()
@@ -1744,7 +1928,7 @@ class Dataset2DXYFunc(Dataset2DBase):
         data = data + xstep*0
 
         self.cacheddata = data
-        self.lastchangeset = self.document.changeset
+        self.evalcontextchangeset = self.document.evalcontextchangeset
         return data
 
     def saveDataRelationToText(self, fileobj, name):
@@ -1796,6 +1980,10 @@ class _DatasetPlugin(object):
         """Can relationship be unlinked?"""
         return True
 
+    def dependencies(self):
+        """Datasets read by the plugin."""
+        return self.pluginmanager.dependencies()
+
     def deleteRows(self, row, numrows):
         pass
 
@@ -1833,6 +2021,22 @@ class Dataset1DPlugin(_DatasetPlugin, Dataset1DBase):
     def __init__(self, manager, ds):
         _DatasetPlugin.__init__(self, manager, ds)
         Dataset1DBase.__init__(self)
+        # column -> (plugin array, converted array)
+        self._converted = {}
+
+    def _getConvertedData(self, attr):
+        """Get plugin data converted to float64, converting only when
+        the plugin returns a different array."""
+        raw = self.getPluginData(attr)
+        try:
+            cachedraw, val = self._converted[attr]
+            if cachedraw is raw:
+                return val
+        except KeyError:
+            pass
+        val = convertNumpy(raw)
+        self._converted[attr] = (raw, val)
+        return val
 
     def userSize(self):
         """Size of dataset."""
@@ -1847,13 +2051,14 @@ class Dataset1DPlugin(_DatasetPlugin, Dataset1DBase):
         return Dataset(**self._getItemHelper(key))
 
     # parent class sets these attributes, so override setattr to do nothing
-    data = property( lambda self: self.getPluginData('data'),
+    # plugins may return read-only arrays of other types
+    data = property( lambda self: self._getConvertedData('data'),
                      lambda self, val: None )
-    serr = property( lambda self: self.getPluginData('serr'),
+    serr = property( lambda self: self._getConvertedData('serr'),
                      lambda self, val: None )
-    nerr = property( lambda self: self.getPluginData('nerr'),
+    nerr = property( lambda self: self._getConvertedData('nerr'),
                      lambda self, val: None )
-    perr = property( lambda self: self.getPluginData('perr'),
+    perr = property( lambda self: self._getConvertedData('perr'),
                      lambda self, val: None )
 
 class Dataset2DPlugin(_DatasetPlugin, Dataset2DBase):
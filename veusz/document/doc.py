@@ -41,6 +41,7 @@ from .. import qtall as qt4
 
 from . import widgetfactory
 from . import datasets
+from . import lazydata
 from . import painthelper
 
 from .. import utils
@@ -50,11 +51,24 @@ def _(text, disambiguation=None, context="Document"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+def operationMemoryCost(operation):
+    """Estimate memory in bytes kept by operation for undoing it."""
+    cost = getattr(operation, 'memoryCost', None)
+    return 0 if cost is None else cost()
+
 # python identifier
 identifier_re = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 # for splitting
 identifier_split_re = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
 
+# number of compiled expressions, substituted expressions and
+# expression results to keep
+expr_compiled_cache_size = 1024
+expr_result_cache_size = 256
+
+# maximum number of operations to keep in the undo history
+undo_max_operations = 10
+
 # python module
 module_re = re.compile(r'^[A-Za-z_\.]+$')
 
@@ -105,6 +119,16 @@ class Document( qt4.QObject ):
         # change tracking of document as a whole
         self.changeset = 0            # increased when the document changes
 
+        # fine-grained change tracking of datasets (see datasetChangeset)
+        # maps dataset names to the value of datachangecounter when the
+        # dataset was last set, modified or deleted
+        self.datachangecounter = 0
+        self.datachangesets = {}
+        # increased when datasets are added, removed or renamed
+        self.datanameschangeset = 0
+        # increased when the evaluation context is rebuilt
+        self.evalcontextchangeset = 0
+
         # map tags to dataset names
         self.datasettags = defaultdict(list)
 
@@ -132,15 +156,18 @@ class Document( qt4.QObject ):
         self.colormaps = dict(utils.defaultcolormaps)
 
         # copies of validated compiled expressions
-        self.exprcompiled = {}
+        self.exprcompiled = utils.LRUCache(expr_compiled_cache_size)
         self.exprfailed = set()
         self.exprfailedchangeset = -1
-        self.evalexprcache = {}
-        self.evalexprcachechangeset = None
+        # expressions with dataset names substituted
+        self.exprsubstcache = utils.LRUCache(expr_compiled_cache_size)
+        # results of evaluating expressions, with datasets used
+        self.exprresultcache = utils.LRUCache(expr_result_cache_size)
 
     def wipe(self):
         """Wipe out any stored data."""
         self.data = {}
+        self.datanameschangeset += 1
         self.basewidget = widgetfactory.thefactory.makeWidget(
             'document', None, None)
         self.basewidget.document = self
@@ -151,6 +178,8 @@ class Document( qt4.QObject ):
         """Clear any history."""
         self.historybatch = []
         self.historyundo = []
+        # estimated memory used by each operation in historyundo
+        self.historyundocosts = []
         self.historyredo = []
         
     def suspendUpdates(self):
@@ -202,11 +231,33 @@ class Document( qt4.QObject ):
             self.historybatch[-1].addOperation(operation)
         else:
             # standard mode
-            self.historyundo = self.historyundo[-9:] + [operation]
+            self.historyundo.append(operation)
+            self.historyundocosts.append(operationMemoryCost(operation))
+            self.trimHistory()
         self.historyredo = []
 
         return retn
 
+    def trimHistory(self):
+        """Remove the oldest operations from the undo history, if
+        there are too many or they use too much memory.
+
+        The most recent operation is always kept."""
+
+        maxbytes = setting.settingdb.get(
+            'undo_maxmemory', 512) * 1024 * 1024
+        costs = self.historyundocosts
+
+        drop = max(len(costs) - undo_max_operations, 0)
+        total = sum(costs[drop:])
+        while drop < len(costs)-1 and total > maxbytes:
+            total -= costs[drop]
+            drop += 1
+
+        if drop > 0:
+            del self.historyundo[:drop]
+            del costs[:drop]
+
     def batchHistory(self, batch):
         """Enable/disable batch history mode.
         
@@ -226,6 +277,7 @@ class Document( qt4.QObject ):
         """Undo the previous operation."""
 
         operation = self.historyundo.pop()
+        self.historyundocosts.pop()
         self.suspendUpdates()
         try:
             operation.undo(self)
@@ -292,8 +344,17 @@ class Document( qt4.QObject ):
         """Does the document contain widgets and no data"""
         return self.changeset == 0
 
+    def _dataChanged(self, name, namechange=False):
+        """Update change tracking for dataset name.
+        namechange is True if the dataset was added or removed."""
+        self.datachangecounter += 1
+        self.datachangesets[name] = self.datachangecounter
+        if namechange:
+            self.datanameschangeset += 1
+
     def setData(self, name, dataset):
         """Set data to val, with symmetric or negative and positive errors."""
+        self._dataChanged(name, namechange=name not in self.data)
         self.data[name] = dataset
         dataset.document = self
         
@@ -304,13 +365,52 @@ class Document( qt4.QObject ):
         """Remove a dataset"""
         if name in self.data:
             del self.data[name]
+            self._dataChanged(name, namechange=True)
             self.setModified()
 
     def modifiedData(self, dataset):
         """The named dataset was modified"""
-        if dataset in self.data.values():
+        modified = False
+        for name, ds in citems(self.data):
+            if ds is dataset:
+                self._dataChanged(name)
+                modified = True
+        if modified:
             self.setModified()
 
+    def datasetChangeset(self, name, _visited=None):
+        """Return a value which changes whenever the dataset name, or
+        any of the datasets it is computed from, is modified."""
+
+        changeset = self.datachangesets.get(name, 0)
+        ds = self.data.get(name)
+        if ds is None:
+            return changeset
+
+        deps = ds.dependencies()
+        if not deps:
+            return changeset
+
+        # avoid infinite recursion with self-referencing datasets
+        if _visited is None:
+            _visited = set()
+        elif name in _visited:
+            return changeset
+        _visited.add(name)
+
+        return (changeset, tuple([
+            self.datasetChangeset(n, _visited=_visited) for n in deps]))
+
+    def dataDependencyKey(self, names):
+        """Return a key for the state of the datasets names (and the
+        evaluation environment).
+
+        A cached value computed from these datasets is valid while
+        the key does not change.
+        """
+        return ( self.evalcontextchangeset, self.datanameschangeset,
+                 tuple([self.datasetChangeset(n) for n in names]) )
+
     def getLinkedFiles(self, filenames=None):
         """Get a list of LinkedFile objects used by the document.
         if filenames is a set, only get the objects with filenames given
@@ -357,6 +457,7 @@ class Document( qt4.QObject ):
     def deleteDataset(self, name):
         """Remove the selected dataset."""
         del self.data[name]
+        self._dataChanged(name, namechange=True)
         self.setModified()
 
     def renameDataset(self, oldname, newname):
@@ -364,6 +465,8 @@ class Document( qt4.QObject ):
         d = self.data[oldname]
         del self.data[oldname]
         self.data[newname] = d
+        self._dataChanged(oldname, namechange=True)
+        self._dataChanged(newname, namechange=True)
 
         self.setModified()
 
@@ -590,6 +693,10 @@ class Document( qt4.QObject ):
         elif mode == 'hdf5':
             if h5py is None:
                 raise RuntimeError('Missing h5py module')
+            # datasets may still need to be read from the file
+            for ds in cvalues(self.data):
+                if isinstance(ds, lazydata.DatasetLazy):
+                    ds.detachFromFile(filename)
             with h5py.File(filename, 'w') as f:
                 self.saveToHDF5File(f)
         else:
@@ -917,6 +1024,8 @@ class Document( qt4.QObject ):
         """
         
         self.eval_context = c = {}
+        self.evalcontextchangeset += 1
+        self.evalenv = None
 
         # add numpy things
         # we try to avoid various bits and pieces for safety
@@ -943,6 +1052,54 @@ class Document( qt4.QObject ):
             else:
                 raise ValueError('Invalid custom type')
 
+        # in case used while updating above
+        self.evalenv = None
+
+    def evalEnvironment(self):
+        """Return environment for evaluating expressions where dataset
+        names have been substituted (see substituteDatasets).
+
+        This is shared, so should be copied before modification."""
+
+        if self.evalenv is None:
+            env = self.eval_context.copy()
+            env['_DS_'] = lambda dsname, dspart: datasets.evaluateDatasetPart(
+                self.data, dsname, dspart)
+            self.evalenv = env
+        return self.evalenv
+
+    def substituteDatasets(self, expr, part):
+        """Replace names of datasets in expr with calls to _DS_ to
+        evaluate them, for part (data, serr, perr, nerr).
+
+        Returns (new expression, list of datasets substituted)
+        """
+
+        key = (expr, part)
+        cached = self.exprsubstcache.get(key)
+        if cached is not None and cached[0] == self.datanameschangeset:
+            return cached[1]
+
+        retn = datasets.substituteDatasets(self.data, expr, part)
+        self.exprsubstcache[key] = (self.datanameschangeset, retn)
+        return retn
+
+    def cachedExprResult(self, key):
+        """Return cached result of an expression with key given.
+
+        Raises KeyError if there is no result or the datasets it was
+        computed from have changed.
+        """
+        deps, depkey, result = self.exprresultcache[key]
+        if depkey != self.dataDependencyKey(deps):
+            raise KeyError(key)
+        return result
+
+    def setCachedExprResult(self, key, deps, result):
+        """Cache result of an expression computed from datasets deps."""
+        deps = tuple(deps)
+        self.exprresultcache[key] = (deps, self.dataDependencyKey(deps), result)
+
     def customDict(self):
         """Return a dictionary mapping custom names to (idx, type, value)."""
         retn = {}
@@ -959,15 +1116,21 @@ class Document( qt4.QObject ):
         None is returned on error
         """
 
-        key = (expr, part, datatype, dimensions)
-        if self.evalexprcachechangeset != self.changeset:
-            self.evalexprcachechangeset = self.changeset
-            self.evalexprcache.clear()
-        elif key in self.evalexprcache:
-            return self.evalexprcache[key]
+        # cached results are kept while the datasets they were
+        # computed from are unchanged
+        key = ('dataset', expr, part, datatype, dimensions)
+        try:
+            return self.cachedExprResult(key)
+        except KeyError:
+            pass
 
-        self.evalexprcache[key] = ds = datasets.evalDatasetExpression(
+        ds = datasets.evalDatasetExpression(
             self, expr, part=part, datatype=datatype, dimensions=dimensions)
+        if expr in self.data:
+            deps = [expr]
+        else:
+            deps = self.substituteDatasets(expr, part)[1]
+        self.setCachedExprResult(key, deps, ds)
         return ds
 
     def valsToDataset(self, vals, datatype, dimensions):
@@ -69,7 +69,8 @@ class Export(object):
 
     def __init__(self, doc, filename, pagenumber, color=True, bitmapdpi=100,
                  antialias=True, quality=85, backcolor='#ffffff00',
-                 pdfdpi=150, svgtextastext=False):
+                 pdfdpi=150, svgtextastext=False, decimate=False,
+                 svgstream=False):
         """Initialise export class. Parameters are:
         doc: document to write
         filename: output filename
@@ -81,6 +82,8 @@ class Export(object):
         backcolor: background color default for bitmaps (default transparent).
         pdfdpi: dpi for pdf and eps files
         svgtextastext: write text in SVG as text, rather than curves
+        decimate: skip plotting points which would not be visible
+        svgstream: write SVG groups as they are completed, to save memory
         """
 
         self.doc = doc
@@ -93,6 +96,8 @@ class Export(object):
         self.backcolor = backcolor
         self.pdfdpi = pdfdpi
         self.svgtextastext = svgtextastext
+        self.decimate = decimate
+        self.svgstream = svgstream
 
     def export(self):
         """Export the figure to the filename."""
@@ -124,7 +129,8 @@ class Export(object):
         """Render page using paint helper to painter.
         This first renders to the helper, then to the painter
         """
-        helper = painthelper.PaintHelper(size, dpi=dpi, directpaint=painter)
+        helper = painthelper.PaintHelper(size, dpi=dpi, directpaint=painter,
+                                         decimate=self.decimate)
         painter.setClipRect( qt4.QRectF(
                 qt4.QPointF(0,0), qt4.QPointF(*size)) )
         painter.save()
@@ -254,7 +260,8 @@ class Export(object):
             self.pagenumber, dpi=(dpi,dpi), integer=False)
         with codecs.open(self.filename, 'w', 'utf-8') as f:
             paintdev = svg_export.SVGPaintDevice(
-                f, size[0]/dpi, size[1]/dpi, writetextastext=self.svgtextastext)
+                f, size[0]/dpi, size[1]/dpi, writetextastext=self.svgtextastext,
+                streaming=self.svgstream)
             painter = painthelper.DirectPainter(paintdev)
             self.renderPage(size, (dpi,dpi), painter)
 
@@ -0,0 +1,296 @@
+#    Copyright (C) 2014 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Datasets which are only read from their files when used.
+
+Values read are kept in memory, up to a total memory budget shared
+between lazy datasets. Beyond this, the least recently used values
+are discarded, to be read again if they are needed.
+"""
+
+from __future__ import division
+import os.path
+import itertools
+import weakref
+
+import numpy as N
+
+from ..compat import crange, citems
+from .datasets import (DatasetMapped, rangeVisitHelper, convertNumpy,
+                       data_chunk_size)
+
+# total size of data read by lazy datasets to keep in memory (bytes)
+lazy_data_budget = 512*1024*1024
+
+# number of values to read at a time when computing ranges
+lazy_range_chunk = 1048576
+
+def applyHDF5Slices(data, slices):
+    """Given hdf/numpy dataset, apply slicing tuple to it and return data.
+
+    Each item in slices is an integer index or a (start, stop, step)
+    tuple.
+    """
+    slist = []
+    for s in slices:
+        if isinstance(s, int):
+            slist.append(s)
+        else:
+            slist.append(slice(*s))
+            if s[2] is not None and s[2] < 0:
+                # negative slicing doesn't work in h5py, so we
+                # make a copy
+                data = N.array(data)
+    try:
+        data = data[tuple(slist)]
+    except (ValueError, IndexError):
+        data = N.array([], dtype=N.float64)
+    return data
+
+def slicedHDF5Shape(shape, slices):
+    """Return shape of data of shape given after applying slices."""
+    if not slices:
+        return tuple(shape)
+    # array of the same shape taking no memory
+    dummy = N.lib.stride_tricks.as_strided(
+        N.zeros(1), shape=shape, strides=(0,)*len(shape))
+    slist = [s if isinstance(s, int) else slice(*s) for s in slices]
+    try:
+        return dummy[tuple(slist)].shape
+    except (ValueError, IndexError):
+        return (0,)
+
+class HDF5Source(object):
+    """Numerical data to be read from a HDF5 file."""
+
+    def __init__(self, filename, objname, slices=None, shape=None):
+        """filename: HDF5 file name
+        objname: full name of dataset in file
+        slices: optional slices to apply to data (see applyHDF5Slices)
+        shape: shape of dataset in file
+        """
+        self.filename = filename
+        self.objname = objname
+        self.slices = slices
+        self.shape = slicedHDF5Shape(shape, slices)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def sameFile(self, filename):
+        """Is the source in the file given?"""
+        try:
+            return os.path.samefile(self.filename, filename)
+        except EnvironmentError:
+            return False
+
+    def chunkable(self):
+        """Can the data be read in parts?"""
+        return not self.slices and len(self.shape) == 1
+
+    def read(self, start=None, stop=None):
+        """Read data from file, returning a float64 array.
+
+        start and stop can be given to read part of the data (if
+        chunkable)."""
+
+        import h5py
+        with h5py.File(self.filename, 'r') as hdff:
+            node = hdff[self.objname]
+            if start is not None or stop is not None:
+                data = node[start:stop]
+            elif self.slices:
+                data = applyHDF5Slices(node, self.slices)
+            else:
+                data = node[...]
+            return N.array(data, dtype=N.float64)
+
+class LazyDataCache(object):
+    """Keep track of memory used by lazy datasets, discarding the least
+    recently used values above the memory budget."""
+
+    def __init__(self):
+        # map id(dataset) -> [weakref to dataset, bytes, last use]
+        self.entries = {}
+        self.counter = itertools.count()
+
+    def totalSize(self):
+        return sum([e[1] for e in self.entries.values()])
+
+    def touch(self, ds):
+        """Record dataset was used."""
+        entry = self.entries.get(id(ds))
+        if entry is not None:
+            entry[2] = next(self.counter)
+
+    def loaded(self, ds, nbytes):
+        """Record dataset has read more data from its source."""
+
+        key = id(ds)
+        entry = self.entries.get(key)
+        if entry is None:
+            # forget about dataset when deleted
+            ref = weakref.ref(ds, lambda r: self.entries.pop(key, None))
+            entry = self.entries[key] = [ref, 0, 0]
+        entry[1] += nbytes
+        entry[2] = next(self.counter)
+
+        self.shrink(keep=key)
+
+    def unloaded(self, ds, nbytes):
+        """Record values of dataset are no longer discardable."""
+        entry = self.entries.get(id(ds))
+        if entry is not None:
+            entry[1] = max(entry[1] - nbytes, 0)
+
+    def forget(self, ds):
+        """Stop tracking the dataset."""
+        self.entries.pop(id(ds), None)
+
+    def shrink(self, keep=None):
+        """Discard the least recently used values until within budget.
+        keep is the id of a dataset not to discard."""
+
+        total = self.totalSize()
+        if total <= lazy_data_budget:
+            return
+
+        byuse = sorted( [(e[2], k) for k, e in citems(self.entries)] )
+        for use, key in byuse:
+            if total <= lazy_data_budget:
+                break
+            if key == keep:
+                continue
+            ref, nbytes, use = self.entries.pop(key)
+            ds = ref()
+            if ds is not None:
+                ds._discardValues()
+            total -= nbytes
+
+# shared between all lazy datasets
+lazycache = LazyDataCache()
+
+class DatasetLazy(DatasetMapped):
+    '''A 1D dataset whose columns are read from a source (e.g. a
+    HDF5Source) when first needed.
+
+    The read values may be discarded if memory is short, to be read
+    again later. Columns which are modified are kept in memory.
+    Columns can also be given as arrays, as for DatasetMapped.
+    '''
+
+    def _isSource(self, col):
+        return isinstance(self._raw.get(col), HDF5Source)
+
+    def _getColumn(self, col):
+        """Get column, reading from source if necessary."""
+        try:
+            val = self._vals[col]
+        except KeyError:
+            if not self._isSource(col):
+                return DatasetMapped._getColumn(self, col)
+
+            val = self._vals[col] = self._converters[col](
+                self._raw[col].read())
+            if val is not None:
+                lazycache.loaded(self, val.nbytes)
+            return val
+
+        lazycache.touch(self)
+        return val
+
+    def _setColumn(self, col, val):
+        """Replace column values, keeping them in memory."""
+        if self._isSource(col) and col in self._vals:
+            lazycache.unloaded(self, self._vals[col].nbytes)
+        DatasetMapped._setColumn(self, col, val)
+
+    def _discardValues(self):
+        """Discard any values which can be read again from sources."""
+        for col in list(self._vals):
+            if self._isSource(col):
+                del self._vals[col]
+
+    def isLoaded(self):
+        """Have the values been read from the sources?"""
+        for col in self._raw:
+            if self._isSource(col) and col not in self._vals:
+                return False
+        return True
+
+    def detachFromFile(self, filename):
+        """Read all values from file given, so that the file is no
+        longer needed."""
+
+        for col in list(self._raw):
+            if self._isSource(col) and self._raw[col].sameFile(filename):
+                self._setColumn(col, self._getColumn(col))
+        if not any([self._isSource(c) for c in self._raw]):
+            lazycache.forget(self)
+
+    def userPreview(self):
+        """Preview of data, if values have been read."""
+        if not self.isLoaded():
+            return None
+        return DatasetMapped.userPreview(self)
+
+    def dataChunks(self, chunksize=None):
+        """Iterate over data, reading chunks from the source if the
+        values have not been read already."""
+        if not self._isSource('data'):
+            for chunk in DatasetMapped.dataChunks(self, chunksize):
+                yield chunk
+            return
+
+        src = self._raw['data']
+        if 'data' in self._vals or not src.chunkable():
+            data = self.data
+        else:
+            data = src
+        chunksize = chunksize or data_chunk_size
+        for start in crange(0, len(data), chunksize):
+            if data is src:
+                yield convertNumpy(src.read(start, start+chunksize))
+            else:
+                yield data[start:start+chunksize]
+
+    def rangeVisit(self, fn):
+        '''Call fn on data points and error values, in order to get
+        range, reading unread data from file in chunks.'''
+
+        srcs = dict([ (c, s) for c, s in citems(self._raw)
+                      if s is not None and c not in self._vals ])
+        if ( isinstance(srcs.get('data'), HDF5Source) and
+             all([isinstance(s, HDF5Source) and s.chunkable()
+                  for s in srcs.values()]) ):
+
+            length = len(srcs['data'])
+            for start in crange(0, length, lazy_range_chunk):
+                stop = start + lazy_range_chunk
+                vals = {}
+                for col in self.columns:
+                    if col in srcs:
+                        vals[col] = self._converters[col](
+                            srcs[col].read(start, stop))
+                    else:
+                        v = getattr(self, col)
+                        vals[col] = None if v is None else v[start:stop]
+                rangeVisitHelper(
+                    fn, vals['data'], vals['serr'], vals['nerr'], vals['perr'])
+        else:
+            DatasetMapped.rangeVisit(self, fn)
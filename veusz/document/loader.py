@@ -22,6 +22,7 @@ import sys
 import os.path
 import traceback
 import io
+import ast
 import numpy as N
 
 from .. import qtall as qt4
@@ -31,6 +32,7 @@ from .. import utils
 from ..compat import cexec, cstr, cstrerror, cbytes
 from .commandinterface import CommandInterface
 from . import datasets
+from . import lazydata
 
 # loaded lazily
 h5py = None
@@ -65,6 +67,76 @@ def bconv(s):
         return s.decode('utf-8')
     return s
 
+class _LoadInterface(CommandInterface):
+    """Command interface for replaying documents.
+
+    Settings are set directly, rather than with operations, as the
+    undo history is not kept when loading documents."""
+
+    def Set(self, var, val):
+        """Set the value of a setting."""
+        if self.verbose:
+            CommandInterface.Set(self, var, val)
+        else:
+            self.currentwidget.prefLookup(var).set(val)
+
+    def SetToReference(self, var, val):
+        """Set setting to a reference value."""
+        if self.verbose:
+            CommandInterface.SetToReference(self, var, val)
+        else:
+            self.currentwidget.prefLookup(var).set(setting.Reference(val))
+
+def parseCommandScript(script, filename):
+    """Parse a script which only calls safe commands with literal
+    arguments, as written when saving documents.
+
+    Returns a list of (command, args, keywordargs), or None if the
+    script contains anything else, so must be executed in full.
+    """
+
+    try:
+        tree = ast.parse(script, filename)
+    except (SyntaxError, ValueError, TypeError):
+        return None
+
+    safe = set(CommandInterface.safe_commands)
+    cmds = []
+    for stmt in tree.body:
+        if ( not isinstance(stmt, ast.Expr) or
+             not isinstance(stmt.value, ast.Call) ):
+            return None
+        call = stmt.value
+        if ( not isinstance(call.func, ast.Name) or
+             call.func.id not in safe or
+             getattr(call, 'starargs', None) is not None or
+             getattr(call, 'kwargs', None) is not None ):
+            return None
+
+        try:
+            args = [ast.literal_eval(a) for a in call.args]
+            argsk = {}
+            for k in call.keywords:
+                if k.arg is None:
+                    return None
+                argsk[k.arg] = ast.literal_eval(k.value)
+        except (ValueError, TypeError):
+            return None
+        cmds.append( (call.func.id, args, argsk) )
+
+    return cmds
+
+def replayCommands(thedoc, filename, cmds):
+    """Run commands returned by parseCommandScript on the document."""
+
+    interface = _LoadInterface(thedoc)
+    # allow import to happen relative to loaded file
+    interface.AddImportPath( os.path.dirname(os.path.abspath(filename)) )
+
+    with _UpdateSuspender(thedoc):
+        for cmd, args, argsk in cmds:
+            getattr(interface, cmd)(*args, **argsk)
+
 def executeScript(thedoc, filename, script, callbackunsafe=None):
     """Execute a script for the document.
 
@@ -84,6 +156,18 @@ def executeScript(thedoc, filename, script, callbackunsafe=None):
         backtrace = ''.join(traceback.format_exception(*info))
         return LoadError(cstr(exc), backtrace=backtrace)
 
+    # documents which only call commands can be replayed quickly
+    # without compiling and executing them
+    cmds = parseCommandScript(script, filename)
+    if cmds is not None:
+        try:
+            replayCommands(thedoc, filename, cmds)
+        except LoadError:
+            raise
+        except Exception as e:
+            raise genexception(e)
+        return
+
     # compile script and check for security (if reqd)
     unsafe = [setting.transient_settings['unsafe_mode']]
     while True:
@@ -143,8 +227,11 @@ def loadHDF5Dataset1D(datagrp):
     # this gives error: 'perr' in datagrp
     parts = set(datagrp) & set(('data', 'serr', 'perr', 'nerr'))
     for v in parts:
-        args[v] = N.array(datagrp[v])
-    return datasets.Dataset(**args)
+        # values are read when needed
+        node = datagrp[v]
+        args[v] = lazydata.HDF5Source(
+            datagrp.file.filename, node.name, shape=node.shape)
+    return lazydata.DatasetLazy(**args)
 
 def loadHDF5Dataset2D(datagrp):
     args = {}
@@ -24,6 +24,10 @@ Operations should be passed to the document to be enacted with applyOperation
 Each operation provides do(document) and undo(document) methods.
 Operations store paths to objects to be modified rather than object references
 because some operations cannot restore references (e.g. add object)
+
+Operations which keep large amounts of data for undo (e.g. old datasets)
+should provide a memoryCost() method, returning an estimate of the number
+of bytes kept, so that the document can limit the size of its history.
 """
 
 from __future__ import division, print_function
@@ -32,11 +36,12 @@ import io
 
 import numpy as N
 
-from ..compat import czip, crange, citems, cbasestr
+from ..compat import czip, crange, citems, cvalues, cbasestr
 from . import datasets
 from . import widgetfactory
 
 from .. import plugins
+from .. import setting
 from .. import qtall as qt4
 
 def _(text, disambiguation=None, context="Operations"):
@@ -346,6 +351,7 @@ class OperationWidgetMove(object):
                 self.oldname = child.name
                 child.name = child.chooseName()
 
+        setting.treeChanged()
         self.newchildpath = child.path
 
     def undo(self, document):
@@ -365,6 +371,8 @@ class OperationWidgetMove(object):
         if self.oldname is not None:
             child.name = self.oldname
 
+        setting.treeChanged()
+
 class OperationWidgetAdd(object):
     """Add a widget of specified type to parent."""
 
@@ -438,6 +446,10 @@ class OperationDatasetSet(object):
         document.deleteData(self.datasetname)
         if self.olddata is not None:
             document.setData(self.datasetname, self.olddata)
+
+    def memoryCost(self):
+        """Memory used by old dataset."""
+        return datasets.datasetsMemoryCost([self.olddata])
     
 class OperationDatasetDelete(object):
     """Delete a dateset."""
@@ -456,6 +468,10 @@ class OperationDatasetDelete(object):
         """Put dataset back"""
         document.setData(self.datasetname, self.olddata)
 
+    def memoryCost(self):
+        """Memory used by deleted dataset."""
+        return datasets.datasetsMemoryCost([self.olddata])
+
 class OperationDatasetRename(object):
     """Rename the dataset.
 
@@ -531,6 +547,10 @@ class OperationDatasetDuplicate(object):
             document.deleteData(self.duplname)
         else:
             document.setData(self.duplname, self.olddata)
+
+    def memoryCost(self):
+        """Memory used by overwritten dataset."""
+        return datasets.datasetsMemoryCost([self.olddata])
         
 class OperationDatasetUnlinkFile(object):
     """Remove association between dataset and file."""
@@ -565,6 +585,10 @@ class OperationDatasetUnlinkRelation(object):
         
     def undo(self, document):
         document.setData(self.datasetname, self.olddataset)
+
+    def memoryCost(self):
+        """Memory used by linked dataset."""
+        return datasets.datasetsMemoryCost([self.olddataset])
         
 class OperationDatasetCreate(object):
     """Create dataset base class."""
@@ -585,6 +609,10 @@ class OperationDatasetCreate(object):
         document.deleteData(self.datasetname)
         if self.olddataset is not None:
             document.setData(self.datasetname, self.olddataset)
+
+    def memoryCost(self):
+        """Memory used by overwritten dataset."""
+        return datasets.datasetsMemoryCost([self.olddataset])
         
 class OperationDatasetCreateRange(OperationDatasetCreate):
     """Create a dataset in a specfied range."""
@@ -749,6 +777,10 @@ class OperationDataset2DBase(object):
         if self.olddataset:
             document.setData(self.datasetname, self.olddataset)
 
+    def memoryCost(self):
+        """Memory used by overwritten dataset."""
+        return datasets.datasetsMemoryCost([self.olddataset])
+
 class OperationDataset2DCreateExpressionXYZ(OperationDataset2DBase):
     descr = _('create 2D dataset from x, y and z expressions')
 
@@ -838,6 +870,10 @@ class OperationDatasetDeleteByFile(object):
         for name, ds in citems(self.olddatasets):
             document.setData(name, ds)
 
+    def memoryCost(self):
+        """Memory used by deleted datasets."""
+        return datasets.datasetsMemoryCost(cvalues(self.olddatasets))
+
 ###############################################################################
 # Import datasets
 
@@ -934,6 +970,9 @@ class OperationDatasetSetVal(object):
         """Set the value."""
         ds = document.data[self.datasetname]
         datacol = getattr(ds, self.columnname)
+        if not datacol.flags.writeable:
+            # e.g. memory-mapped data
+            datacol = N.array(datacol)
         self.oldval = datacol[self.row]
         datacol[self.row] = self.val
         ds.changeValues(self.columnname, datacol)
@@ -945,6 +984,46 @@ class OperationDatasetSetVal(object):
         datacol[self.row] = self.oldval
         ds.changeValues(self.columnname, datacol)
     
+class OperationDatasetSetValues(object):
+    """Set a block of values in a column of a dataset."""
+
+    descr = _('change dataset values')
+
+    def __init__(self, datasetname, columnname, row, vals):
+        """Set rows in column columnname, starting at row, to vals.
+
+        The dataset must already have enough rows."""
+        self.datasetname = datasetname
+        self.columnname = columnname
+        self.row = row
+        self.vals = vals
+
+    def do(self, document):
+        """Set the values."""
+        ds = document.data[self.datasetname]
+        datacol = getattr(ds, self.columnname)
+        rows = slice(self.row, self.row+len(self.vals))
+        if isinstance(datacol, N.ndarray):
+            if not datacol.flags.writeable:
+                # e.g. memory-mapped data
+                datacol = N.array(datacol)
+            self.oldvals = N.array(datacol[rows])
+        else:
+            self.oldvals = datacol[rows]
+        datacol[rows] = self.vals
+        ds.changeValues(self.columnname, datacol)
+
+    def undo(self, document):
+        """Restore the values."""
+        ds = document.data[self.datasetname]
+        datacol = getattr(ds, self.columnname)
+        datacol[self.row:self.row+len(self.oldvals)] = self.oldvals
+        ds.changeValues(self.columnname, datacol)
+
+    def memoryCost(self):
+        """Memory used by old and new values."""
+        return datasets.valuesMemoryCost([self.oldvals, self.vals])
+
 class OperationDatasetSetVal2D(object):
     """Set a value in a 2D dataset."""
 
@@ -991,6 +1070,10 @@ class OperationDatasetDeleteRow(object):
         ds = document.data[self.datasetname]
         ds.insertRows(self.row, self.numrows, self.saveddata)
 
+    def memoryCost(self):
+        """Memory used by deleted rows."""
+        return datasets.valuesMemoryCost(self.saveddata)
+
 class OperationDatasetInsertRow(object):
     """Insert a row or several in the dataset."""
 
@@ -1069,6 +1152,15 @@ class OperationMultiple(object):
         for op in self.operations[::-1]:
             op.undo(document)
 
+    def memoryCost(self):
+        """Memory used by the operations."""
+        total = 0
+        for op in self.operations:
+            cost = getattr(op, 'memoryCost', None)
+            if cost is not None:
+                total += cost()
+        return total
+
 class OperationLoadStyleSheet(OperationMultiple):
     """An operation to load a stylesheet."""
     
@@ -1180,3 +1272,7 @@ class OperationDatasetPlugin(object):
         # put back old datasets
         for name, ds in citems(self.olddata):
             document.setData(name, ds)
+
+    def memoryCost(self):
+        """Memory used by overwritten datasets."""
+        return datasets.datasetsMemoryCost(cvalues(self.olddata))
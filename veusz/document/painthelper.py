@@ -33,15 +33,18 @@ except ImportError:
 class DrawState(object):
     """Each widget plotted has a recorded state in this object."""
 
-    def __init__(self, widget, bounds, clip, helper):
+    def __init__(self, widget, bounds, clip, helper, record=None):
         """Initialise state for widget.
         bounds: tuple of (x1, y1, x2, y2)
-        clip: if clipping should be done, another tuple."""
+        clip: if clipping should be done, another tuple.
+        record: reuse this previously recorded layer if set"""
 
         self.widget = widget
-        self.record = RecordPaintDevice(
-            helper.pagesize[0], helper.pagesize[1],
-            helper.dpi[0], helper.dpi[1])
+        if record is None:
+            record = RecordPaintDevice(
+                helper.pagesize[0], helper.pagesize[1],
+                helper.dpi[0], helper.dpi[1])
+        self.record = record
         self.bounds = bounds
         self.clip = clip
 
@@ -74,6 +77,45 @@ class DirectPainter(qt4.QPainter):
     def __exit__(self, exc_type, exc_value, traceback):
         pass
 
+class RenderCache(object):
+    """Keep recorded layers of widgets between redraws.
+
+    Each layer is stored with a key describing everything used to
+    draw it (settings, data, axes and page geometry). If the key is
+    unchanged on the next redraw, the layer is replayed instead of
+    the widget being drawn again. Layers not used during a redraw
+    are dropped by finishRedraw().
+    """
+
+    def __init__(self):
+        self.layers = {}
+        self.used = {}
+
+    def getLayer(self, widget, key):
+        """Return recorded layer for widget if it matches key, or None."""
+        try:
+            oldkey, record = self.layers[widget]
+        except KeyError:
+            return None
+        if oldkey != key:
+            return None
+        self.used[widget] = (key, record)
+        return record
+
+    def setLayer(self, widget, key, record):
+        """Store recorded layer for widget with key."""
+        self.used[widget] = (key, record)
+
+    def finishRedraw(self):
+        """Drop layers which were not used in the last redraw."""
+        self.layers = self.used
+        self.used = {}
+
+    def clear(self):
+        """Remove all layers."""
+        self.layers = {}
+        self.used = {}
+
 class PaintHelper(object):
     """Helper used when painting widgets.
 
@@ -83,7 +125,7 @@ class PaintHelper(object):
     """
 
     def __init__(self, pagesize, scaling=1., dpi=(100, 100),
-                 directpaint=None):
+                 directpaint=None, rendercache=None, decimate=False):
         """Initialise using page size (tuple of pixelw, pixelh).
 
         If directpaint is set to a painter, use this directly rather
@@ -91,6 +133,12 @@ class PaintHelper(object):
         case the painter must be a DirectPainter object, and
         save()/restore() must be placed around doing the rendering to
         the painter.
+
+        If rendercache is a RenderCache object, widgets can reuse
+        layers recorded in previous redraws (see cachedLayer).
+
+        If decimate is True, widgets may reduce the number of points
+        they draw where this does not visibly change the output.
         """
 
         self.dpi = dpi
@@ -108,12 +156,21 @@ class PaintHelper(object):
         # whether to directly render to a painter or make new layers
         self.directpaint = directpaint
 
+        # layers kept from previous redraws (not used if painting directly)
+        self.rendercache = rendercache if directpaint is None else None
+
+        # whether widgets can skip points which would not be visible
+        self.decimate = decimate
+
         # state for root widget
         self.rootstate = None
 
         # keep track of last widget being plotted
         self.widgetstack = []
 
+        # distances converted to plotter units (see Distance.convert)
+        self.distcache = {}
+
     @property
     def maxsize(self):
         """Return maximum page dimension (using PaintHelper's DPI)."""
@@ -129,13 +186,8 @@ class PaintHelper(object):
         self.pagesize = ( setting.Distance.convertDistance(self, pagew),
                           setting.Distance.convertDistance(self, pageh) )
 
-    def painter(self, widget, bounds, clip=None, layer=None):
-        """Return a painter for use when drawing the widget.
-        widget: widget object
-        bounds: tuple (x1, y1, x2, y2) of widget bounds
-        clip: a QRectF, if set
-        layer: layer to plot widget, or None to get next automatically
-        """
+    def _addState(self, widget, bounds, clip, layer, record=None):
+        """Make a new DrawState for widget and add it to the tree."""
 
         # automatically add a layer if not given
         if layer is None:
@@ -143,12 +195,49 @@ class PaintHelper(object):
             while (widget, layer) in self.states:
                 layer += 1
 
-        s = self.states[(widget, layer)] = DrawState(widget, bounds, clip, self)
+        s = self.states[(widget, layer)] = DrawState(
+            widget, bounds, clip, self, record=record)
 
         if self.widgetstack:
             self.states[(self.widgetstack[-1], 0)].children.append(s)
         else:
             self.rootstate = s
+        return s
+
+    def cachedLayer(self, widget, bounds, cachekey, clip=None):
+        """Reuse a layer recorded in a previous redraw, if possible.
+
+        cachekey should describe everything used to draw the widget.
+        Returns True if the layer was reused, so the widget does not
+        need to draw itself, or False if it should be drawn.
+        """
+
+        if self.rendercache is None:
+            return False
+        key = (cachekey, self.pagesize, self.dpi, self.scaling,
+               self.decimate)
+        record = self.rendercache.getLayer(widget, key)
+        if record is None:
+            return False
+        self._addState(widget, bounds, clip, None, record=record)
+        return True
+
+    def painter(self, widget, bounds, clip=None, layer=None, cachekey=None):
+        """Return a painter for use when drawing the widget.
+        widget: widget object
+        bounds: tuple (x1, y1, x2, y2) of widget bounds
+        clip: a QRectF, if set
+        layer: layer to plot widget, or None to get next automatically
+        cachekey: if set, keep the recorded layer for later redraws
+        """
+
+        s = self._addState(widget, bounds, clip, layer)
+
+        if cachekey is not None and self.rendercache is not None:
+            self.rendercache.setLayer(
+                widget, (cachekey, self.pagesize, self.dpi, self.scaling,
+                         self.decimate),
+                s.record)
 
         if self.directpaint is None:
             # save to multiple recorded layers
@@ -165,6 +254,8 @@ class PaintHelper(object):
         p.pagesize = self.pagesize
         p.maxsize = max(*self.pagesize)
         p.dpi = self.dpi[1]
+        p.decimate = self.decimate
+        p.distcache = self.distcache
 
         if clip is not None:
             p.setClipRect(clip)
@@ -213,15 +304,18 @@ class PaintHelper(object):
         origpix = qt4.QPixmap(2*box+1, 2*box+1)
         origpix.fill(specialcolor)
         origimg = origpix.toImage()
-        # store most recent widget here
-        lastwidget = [None]
-        
-        def rendernextstate(state):
-            """Recursively draw painter.
+        boxrect = qt4.QRectF(x-box, y-box, box*2+1, box*2+1)
 
-            Checks whether drawing a widgetchanges the small image
-            around the point given.
-            """
+        def drawsonpoint(state):
+            """Checks whether drawing a widget changes the small image
+            around the point given."""
+
+            # widgets clipped away from the point cannot draw there
+            if state.clip is not None and not state.clip.intersects(boxrect):
+                return False
+            if ( hasattr(state.record, 'drawItemCount') and
+                 state.record.drawItemCount() == 0 ):
+                return False
 
             pixmap = qt4.QPixmap(origpix)
             painter = qt4.QPainter(pixmap)
@@ -234,14 +328,22 @@ class PaintHelper(object):
             painter.end()
             newimg = pixmap.toImage()
 
-            if newimg != origimg:
-                lastwidget[0] = state.widget
+            return newimg != origimg
 
+        # states in the order drawn
+        states = []
+        def addstates(state):
+            states.append(state)
             for child in state.children:
-                rendernextstate(child)
-
-        rendernextstate(self.rootstate)
-        return lastwidget[0]
+                addstates(child)
+        addstates(self.rootstate)
+
+        # the most recently drawn widget on the point is wanted, so
+        # stop at the first found going backwards
+        for state in reversed(states):
+            if drawsonpoint(state):
+                return state.widget
+        return None
 
     def pointInWidgetBounds(self, x, y, widgettype):
         """Which graph widget plots at point x,y?
@@ -21,6 +21,9 @@ and exporting text as paths for WYSIWYG."""
 
 from __future__ import division, print_function
 import re
+import hashlib
+
+import numpy as N
 
 from ..compat import crange, cbytes
 from .. import qtall as qt4
@@ -33,6 +36,9 @@ scale = 0.1
 inch_mm = 25.4
 inch_pt = 72.0
 
+# when streaming, write out group contents after this many elements
+stream_flush_elements = 1000
+
 def printpath(path):
     """Debugging print path."""
     print("Contents of", path)
@@ -40,10 +46,15 @@ def printpath(path):
         el = path.elementAt(i)
         print(" ", el.type, el.x, el.y)
 
-def fltStr(v, prec=2):
+# default number of decimal places to write coordinates with
+fltprec = 2
+
+def fltStr(v, prec=None):
     """Change a float to a string, using a maximum number of decimal places
     but removing trailing zeros."""
 
+    if prec is None:
+        prec = fltprec
     # ensures consistent rounding behaviour on different platforms
     v = round(v, prec+2)
 
@@ -67,39 +78,127 @@ def escapeXML(text):
     text = text.replace(u'\ue001', '&amp;')
     return text
 
+# for removing trailing zeros and decimal points from numbers
+_trailzero_re = re.compile(r'(\.[0-9]*?)0+(?![0-9])')
+_trailpoint_re = re.compile(r'\.(?![0-9])')
+
+def fltFormat(fmt, vals, prec=None):
+    """Format the floats in vals into fmt, which has a %s for each value.
+
+    This gives the same output as calling fltStr on each value, but
+    works on the whole array at once. fmt should not contain other
+    numbers or decimal points.
+    """
+
+    if prec is None:
+        prec = fltprec
+    vals = N.asarray(vals, dtype=N.float64).ravel()
+    if len(vals) == 0:
+        return fmt
+
+    # round to prec+2 decimal places, as fltStr, giving integers
+    mult = 10.**(prec+2)
+    scaled = vals * mult
+    k = N.rint(scaled)
+    # values close to a rounding tie are rounded by python, as the
+    # multiplication above can move them across the tie
+    frac = N.abs(scaled - N.floor(scaled) - 0.5)
+    for i in N.nonzero(frac < N.maximum(1e-6, 1e-12*N.abs(scaled)))[0]:
+        k[i] = N.rint(round(float(vals[i]), prec+2) * mult)
+
+    # truncate to prec decimal places
+    t = N.floor(N.abs(k) / 100.)
+    # this gets rid of -0s
+    t[k < 0] *= -1
+    t += 0.
+
+    out = fmt.replace('%s', '%%.%if' % prec) % tuple(
+        (t * 10.**(-prec)).tolist())
+
+    # drop trailing zeros
+    out = _trailzero_re.sub(r'\1', out)
+    return _trailpoint_re.sub('', out)
+
+def _streamBytes(obj):
+    """Serialize Qt object to bytes using QDataStream."""
+    data = qt4.QByteArray()
+    stream = qt4.QDataStream(data, qt4.QIODevice.WriteOnly)
+    stream.setFloatingPointPrecision(qt4.QDataStream.DoublePrecision)
+    stream << obj
+    return cbytes(data)
+
+# layout of elements when QPainterPath is serialized
+_pathel_dtype = N.dtype([('type', '>i4'), ('x', '>f8'), ('y', '>f8')])
+
+def pathElements(path):
+    """Return arrays of element types, x and y coordinates in path."""
+
+    count = path.elementCount()
+    try:
+        # get all the elements at once (count, elements, cstart, fillrule)
+        raw = _streamBytes(path)
+    except TypeError:
+        raw = None
+    if count > 0 and raw is not None and len(raw) == 12+count*20:
+        els = N.frombuffer(raw, dtype=_pathel_dtype, count=count, offset=4)
+        return (els['type'].astype(N.int32), els['x'].astype(N.float64),
+                els['y'].astype(N.float64))
+
+    # slow way
+    els = [path.elementAt(i) for i in crange(count)]
+    return ( N.array([int(e.type) for e in els], dtype=N.int32),
+             N.array([e.x for e in els], dtype=N.float64),
+             N.array([e.y for e in els], dtype=N.float64) )
+
+def polygonCoords(points):
+    """Return arrays of x and y coordinates of points in polygon."""
+
+    poly = qt4.QPolygonF(points)
+    count = poly.count()
+    try:
+        # get the points at once (count, points)
+        raw = _streamBytes(poly)
+    except TypeError:
+        raw = None
+    if raw is not None and len(raw) == 4+count*16:
+        xy = N.frombuffer(raw, dtype='>f8', count=count*2, offset=4)
+        xy = xy.astype(N.float64)
+        return xy[0::2], xy[1::2]
+
+    # slow way
+    return ( N.array([p.x() for p in poly], dtype=N.float64),
+             N.array([p.y() for p in poly], dtype=N.float64) )
+
+# svg path format for each QPainterPath element type
+_pathel_fmts = N.array(['m%s,%s', 'l%s,%s', 'c%s,%s', ',%s,%s'], dtype=object)
+
 def createPath(path):
     """Convert qt path to svg path.
 
     We use relative coordinates to make the file size smaller and help
     compression
     """
-    p = []
-    count = path.elementCount()
-    i = 0
-    ox, oy = 0, 0
-    while i < count:
-        e = path.elementAt(i)
-        nx, ny = e.x*scale, e.y*scale
-        if e.type == qt4.QPainterPath.MoveToElement:
-            p.append( 'm%s,%s' % (fltStr(nx-ox), fltStr(ny-oy)) )
-            ox, oy = nx, ny
-        elif e.type == qt4.QPainterPath.LineToElement:
-            p.append( 'l%s,%s' % (fltStr(nx-ox), fltStr(ny-oy)) )
-            ox, oy = nx, ny
-        elif e.type == qt4.QPainterPath.CurveToElement:
-            e1 = path.elementAt(i+1)
-            e2 = path.elementAt(i+2)
-            p.append( 'c%s,%s,%s,%s,%s,%s' % (
-                    fltStr(nx-ox), fltStr(ny-oy),
-                    fltStr(e1.x*scale-ox), fltStr(e1.y*scale-oy),
-                    fltStr(e2.x*scale-ox), fltStr(e2.y*scale-oy)) )
-            ox, oy = e2.x*scale, e2.y*scale
-            i += 2
-        else:
-            assert False
 
-        i += 1
-    return ''.join(p)
+    types, x, y = pathElements(path)
+    if len(types) == 0:
+        return ''
+    x *= scale
+    y *= scale
+
+    # coordinates are relative to the end of the previous segment, or
+    # the point before the start of a curve for curve data
+    idx = N.arange(len(types))
+    start = N.maximum.accumulate(N.where(types != 3, idx, 0))
+    ox = N.concatenate(( [0.], x[:-1] ))[start]
+    oy = N.concatenate(( [0.], y[:-1] ))[start]
+
+    vals = N.column_stack(( x-ox, y-oy ))
+    fmt = ''.join(_pathel_fmts[N.clip(types, 0, 3)].tolist())
+    return fltFormat(fmt, vals)
+
+def _hashKey(text):
+    """Short key identifying text, for caching."""
+    return hashlib.sha1(text.encode('utf-8')).digest()
 
 class SVGElement(object):
     """SVG element in output.
@@ -119,32 +218,55 @@ class SVGElement(object):
         self.parent = parent
         self.text = text
 
+        # whether opening tag has been written when streaming
+        self.opened = False
+
         if parent:
             parent.children.append(self)
 
-    def write(self, fileobj):
-        """Write element and its children to the output file."""
+    def writeStart(self, fileobj):
+        """Write the opening tag of the element."""
         fileobj.write('<%s' % self.eltype)
         if self.attrb:
             fileobj.write(' ' + self.attrb)
+        fileobj.write('>\n')
+
+    def writeEnd(self, fileobj):
+        """Write the closing tag of the element."""
+        fileobj.write('</%s>\n' % self.eltype)
 
+    def write(self, fileobj):
+        """Write element and its children to the output file."""
         if self.text:
+            fileobj.write('<%s' % self.eltype)
+            if self.attrb:
+                fileobj.write(' ' + self.attrb)
             fileobj.write('>%s</%s>\n' % (self.text, self.eltype))
         elif self.children:
-            fileobj.write('>\n')
+            self.writeStart(fileobj)
             for c in self.children:
                 c.write(fileobj)
-            fileobj.write('</%s>\n' % self.eltype)
+            self.writeEnd(fileobj)
         else:
             # simple close tag if not children or text
+            fileobj.write('<%s' % self.eltype)
+            if self.attrb:
+                fileobj.write(' ' + self.attrb)
             fileobj.write('/>\n')
 
 class SVGPaintEngine(qt4.QPaintEngine):
     """Paint engine class for writing to svg files."""
 
-    def __init__(self, width_in, height_in, writetextastext=False):
+    def __init__(self, width_in, height_in, writetextastext=False,
+                 streaming=False):
         """Create the class, using width and height as size of canvas
-        in inches."""
+        in inches.
+
+        If streaming is set, groups are written to the output file
+        as they are closed, rather than keeping the whole document in
+        memory until the end. Equal neighbouring groups are not merged
+        in this mode.
+        """
 
         qt4.QPaintEngine.__init__(self,
                                   qt4.QPaintEngine.Antialiasing |
@@ -160,6 +282,7 @@ class SVGPaintEngine(qt4.QPaintEngine):
 
         self.imageformat = 'png'
         self.writetextastext = writetextastext
+        self.streaming = streaming
 
     def begin(self, paintdevice):
         """Start painting."""
@@ -197,8 +320,67 @@ class SVGPaintEngine(qt4.QPaintEngine):
         self.pathcache = {}
         self.pathcacheidx = 0
 
+        if self.streaming:
+            self.writeHeader()
+
         return True
 
+    def writeHeader(self):
+        """Write XML header to the output file."""
+        self.device.fileobj.write(
+            '<?xml version="1.0" standalone="no"?>\n'
+            '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n'
+            '  "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
+
+    def streamOpen(self, element):
+        """Write the opening tag of element when streaming.
+
+        Any ancestors and earlier siblings are written first. The
+        element must be the last child of its parent.
+        """
+        if element.opened:
+            return
+        parent = element.parent
+        if parent is not None:
+            self.streamOpen(parent)
+            fileobj = self.device.fileobj
+            for c in parent.children[:-1]:
+                c.write(fileobj)
+            del parent.children[:-1]
+        element.writeStart(self.device.fileobj)
+        element.opened = True
+
+    def streamFlush(self, element):
+        """Write out the children of the open element when streaming."""
+        if element.children:
+            self.streamOpen(element)
+            fileobj = self.device.fileobj
+            for c in element.children:
+                c.write(fileobj)
+            del element.children[:]
+
+    def streamClose(self, element):
+        """Write out a group which is being closed when streaming.
+
+        Empty groups are dropped."""
+        if element.children or element.opened or element.parent is None:
+            self.streamFlush(element)
+            self.streamOpen(element)
+            element.writeEnd(self.device.fileobj)
+        parent = element.parent
+        if parent is not None and parent.children:
+            # this is the last child, as it was open
+            if parent.children[-1] is element:
+                parent.children.pop()
+            else:
+                parent.children.remove(element)
+
+    def checkStream(self):
+        """Write out the current group if it is getting large."""
+        if ( self.streaming and
+             len(self.celement.children) >= stream_flush_elements ):
+            self.streamFlush(self.celement)
+
     def pruneEmptyGroups(self):
         """Take the element tree and remove any empty group entries."""
 
@@ -229,15 +411,20 @@ class SVGPaintEngine(qt4.QPaintEngine):
         recursive(self.rootelement)
 
     def end(self):
+        if self.streaming:
+            # close any groups which are still open
+            element = self.celement
+            while element is not None:
+                self.streamClose(element)
+                element = element.parent
+            return True
+
         self.pruneEmptyGroups()
 
-        fileobj = self.device.fileobj
-        fileobj.write('<?xml version="1.0" standalone="no"?>\n'
-                      '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n'
-                      '  "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
+        self.writeHeader()
 
         # write all the elements
-        self.rootelement.write(fileobj)
+        self.rootelement.write(self.device.fileobj)
 
         return True
 
@@ -291,6 +478,8 @@ class SVGPaintEngine(qt4.QPaintEngine):
         # go back up the tree the required number of times
         for i in crange(pop):
             if self.oldstate[i]:
+                if self.streaming:
+                    self.streamClose(self.celement)
                 self.celement = self.celement.parent
 
         # create new elements for changed states
@@ -308,15 +497,20 @@ class SVGPaintEngine(qt4.QPaintEngine):
             return ()
 
         path = createPath(self.clippath)
+        key = _hashKey(path)
 
-        if path in self.existingclips:
-            url = 'url(#c%i)' % self.existingclips[path]
+        if key in self.existingclips:
+            url = 'url(#c%i)' % self.existingclips[key]
         else:
-            clippath = SVGElement(self.defs, 'clipPath',
+            # the definitions at the top may already have been written
+            # when streaming, so define the clip where we are
+            defs = ( SVGElement(self.celement, 'defs', '')
+                     if self.streaming else self.defs )
+            clippath = SVGElement(defs, 'clipPath',
                                   'id="c%i"' % self.clipnum)
             SVGElement(clippath, 'path', 'd="%s"' % path)
             url = 'url(#c%i)' % self.clipnum
-            self.existingclips[path] = self.clipnum
+            self.existingclips[key] = self.clipnum
             self.clipnum += 1
 
         return ('clip-path="%s"' % url,)
@@ -398,22 +592,31 @@ class SVGPaintEngine(qt4.QPaintEngine):
         attrb = 'd="%s"' % p
         if path.fillRule() == qt4.Qt.WindingFill:
             attrb += ' fill-rule="nonzero"'
+        key = _hashKey(attrb)
 
-        if attrb in self.pathcache:
-            element, num = self.pathcache[attrb]
+        if key in self.pathcache:
+            element, num = self.pathcache[key]
             if num is None:
                 # this is the first time an element has been referenced again
                 # assign it an id for use below
                 num = self.pathcacheidx
                 self.pathcacheidx += 1
-                self.pathcache[attrb] = element, num
+                if self.streaming:
+                    # the first element may have been written already,
+                    # so write this one with the id instead
+                    SVGElement(self.celement, 'path',
+                               '%s id="p%i"' % (attrb, num))
+                    self.pathcache[key] = None, num
+                    self.checkStream()
+                    return
+                self.pathcache[key] = element, num
                 # add an id attribute
                 element.attrb += ' id="p%i"' % num
 
             # if the parent is a translation, swallow this into the use element
             m = re.match('transform="translate\(([-0-9.]+),([-0-9.]+)\)"',
                          self.celement.attrb)
-            if m:
+            if m and not self.streaming:
                 SVGElement(self.celement.parent, 'use',
                            'xlink:href="#p%i" x="%s" y="%s"' % (
                         num, m.group(1), m.group(2)))
@@ -421,7 +624,8 @@ class SVGPaintEngine(qt4.QPaintEngine):
                 SVGElement(self.celement, 'use', 'xlink:href="#p%i"' % num)
         else:
             pathel = SVGElement(self.celement, 'path', attrb)
-            self.pathcache[attrb] = [pathel, None]
+            self.pathcache[key] = [None if self.streaming else pathel, None]
+        self.checkStream()
 
     def drawTextItem(self, pt, textitem):
         """Convert text to a path and draw it.
@@ -479,33 +683,33 @@ class SVGPaintEngine(qt4.QPaintEngine):
                 self.celement, 'path',
                 'd="%s" fill="%s" stroke="none" fill-opacity="%.3g"' % (
                     p, self.pen.color().name(), self.pen.color().alphaF()) )
+        self.checkStream()
 
     def drawLines(self, lines):
         """Draw multiple lines."""
-        paths = []
-        for line in lines:
-            path = 'M%s,%sl%s,%s' % (
-                fltStr(line.x1()*scale), fltStr(line.y1()*scale),
-                fltStr((line.x2()-line.x1())*scale),
-                fltStr((line.y2()-line.y1())*scale))
-            paths.append(path)
-        SVGElement(self.celement, 'path', 'd="%s"' % ''.join(paths))
+        vals = N.array([(l.x1(), l.y1(), l.x2()-l.x1(), l.y2()-l.y1())
+                        for l in lines], dtype=N.float64)
+        path = fltFormat('M%s,%sl%s,%s'*len(vals), vals*scale)
+        SVGElement(self.celement, 'path', 'd="%s"' % path)
+        self.checkStream()
 
     def drawPolygon(self, points, mode):
         """Draw polygon on output."""
-        pts = []
-        for p in points:
-            pts.append( '%s,%s' % (fltStr(p.x()*scale), fltStr(p.y()*scale)) )
+        x, y = polygonCoords(points)
+        pts = fltFormat(
+            ' '.join(['%s,%s']*len(x)),
+            N.column_stack((x, y))*scale)
 
         if mode == qt4.QPaintEngine.PolylineMode:
             SVGElement(self.celement, 'polyline',
-                       'fill="none" points="%s"' % ' '.join(pts))
+                       'fill="none" points="%s"' % pts)
 
         else:
-            attrb = 'points="%s"' % ' '.join(pts)
+            attrb = 'points="%s"' % pts
             if mode == qt4.Qt.WindingFill:
                 attrb += ' fill-rule="nonzero"'
             SVGElement(self.celement, 'polygon', attrb)
+        self.checkStream()
 
     def drawEllipse(self, rect):
         """Draw an ellipse to the svg file."""
@@ -515,6 +719,7 @@ class SVGPaintEngine(qt4.QPaintEngine):
                     fltStr(rect.center().y()*scale),
                     fltStr(rect.width()*0.5*scale),
                     fltStr(rect.height()*0.5*scale)))
+        self.checkStream()
 
     def drawPoints(self, points):
         """Draw points."""
@@ -523,6 +728,7 @@ class SVGPaintEngine(qt4.QPaintEngine):
             SVGElement(self.celement, 'line',
                        ('x1="%s" y1="%s" x2="%s" y2="%s" '
                         'stroke-linecap="round"') % (x, y, x, y))
+        self.checkStream()
 
     def drawImage(self, r, img, sr, flags):
         """Draw image.
@@ -549,6 +755,7 @@ class SVGPaintEngine(qt4.QPaintEngine):
                   cbytes(data.toBase64()).decode('ascii'),
                   '" preserveAspectRatio="none"' ]
         SVGElement(self.celement, 'image', ''.join(attrb))
+        self.checkStream()
 
     def type(self):
         """A random number for the engine."""
@@ -558,10 +765,11 @@ class SVGPaintDevice(qt4.QPaintDevice):
     """Paint device for SVG paint engine."""
 
     def __init__(self, fileobj, width_in, height_in,
-                 writetextastext=False):
+                 writetextastext=False, streaming=False):
         qt4.QPaintDevice.__init__(self)
         self.engine = SVGPaintEngine(width_in, height_in,
-                                     writetextastext=writetextastext)
+                                     writetextastext=writetextastext,
+                                     streaming=streaming)
         self.fileobj = fileobj
 
     def paintEngine(self):
@@ -37,6 +37,11 @@ time.sleep(60)
 g.Close()
 
 More than one embedded window can be opened at once
+
+Large numerical numpy arrays given to commands are sent to Veusz as
+raw binary data, rather than being pickled. Commands can also be sent
+without waiting for each to run, by calling SetAsync(True), which is
+useful when sending many commands (e.g. to update data in a loop).
 """
 
 from __future__ import division
@@ -58,8 +63,24 @@ try:
 except ImportError:
     import pickle
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # check remote process has this API version
-API_VERSION = 2
+API_VERSION = 3
+
+# numerical arrays this size or larger (in bytes) are sent as raw data
+# following the pickled command, rather than pickled
+embed_raw_min_bytes = 65536
+
+# commands which return values, so are always waited for
+embed_result_commands = frozenset((
+        'Add', 'CloneWidget', 'Get', 'GetChildren', 'GetClick', 'GetData',
+        'GetDataType', 'GetDatasets', 'IsClosed', 'NodeChildren',
+        'NodeType', 'ReloadData', 'ResolveReference', 'SettingType',
+        'WidgetType', '_apiVersion'))
 
 def findOnPath(cmd):
     """Find a command on the system path, or None if does not exist."""
@@ -79,6 +100,9 @@ class Embedded(object):
 
     remote = None
 
+    # number of asynchronous commands sent since last waiting for Veusz
+    pendingasync = 0
+
     def __init__(self, name='Veusz', copyof=None, hidden=False):
         """Initialse the embedded veusz window.
 
@@ -90,6 +114,8 @@ class Embedded(object):
         if not Embedded.remote:
             Embedded.startRemote()
 
+        self.asyncmode = False
+
         if not copyof:
             retval = self.sendCommand( (-1, '_NewWindow',
                                          (name,),
@@ -136,6 +162,22 @@ class Embedded(object):
         while not self.IsClosed():
             time.sleep(0.1)
 
+    def SetAsync(self, enable=True):
+        """Enable or disable asynchronous commands.
+
+        If enabled, commands are sent without waiting for Veusz to run
+        them, and return None, so many commands can be sent quickly.
+        Commands which return values (e.g. GetData) still wait. Errors
+        from asynchronous commands are raised by the next command which
+        waits, or by Flush().
+        """
+        self.asyncmode = enable
+
+    def Flush(self):
+        """Wait until asynchronous commands have been run, raising the
+        first error from them, if any."""
+        self.flushCommands()
+
     @classmethod
     def makeSockets(cls):
         """Make socket(s) to communicate with remote process.
@@ -290,15 +332,66 @@ class Embedded(object):
         while count < len(data):
             count += socket.send(data[count:])
 
+    @staticmethod
+    def extractRawArrays(args, argsv):
+        """Remove large numerical arrays from command arguments, to be
+        sent as raw data.
+
+        Returns new args and argsv, and a list of (location, array),
+        where location is the index or keyword of the argument.
+        """
+
+        def israw(v):
+            return ( isinstance(v, numpy.ndarray) and
+                     v.dtype.kind in 'biufc' and
+                     v.nbytes >= embed_raw_min_bytes )
+
+        arrays = []
+        if numpy is None:
+            return args, argsv, arrays
+
+        args = list(args)
+        for i, v in enumerate(args):
+            if israw(v):
+                arrays.append( (i, numpy.ascontiguousarray(v)) )
+                args[i] = None
+        argsv = dict(argsv)
+        for k, v in argsv.items():
+            if israw(v):
+                arrays.append( (k, numpy.ascontiguousarray(v)) )
+                argsv[k] = None
+        return tuple(args), argsv, arrays
+
     @classmethod
-    def sendCommand(cls, cmd):
-        """Send the command to the remote process."""
+    def sendCommand(cls, cmd, wait=True):
+        """Send the command to the remote process.
+
+        If wait is False, do not wait for the command to be run and
+        return None. Any error is raised by a later command which waits.
+        """
+
+        if wait and cls.pendingasync:
+            cls.flushCommands()
+
+        window, name, args, argsv = cmd
+        args, argsv, arrays = cls.extractRawArrays(args, argsv)
+        if arrays or not wait:
+            # extended command: arrays are sent after the pickle
+            rawinfo = [ (loc, a.dtype.str, a.shape) for loc, a in arrays ]
+            cmd = (window, name, args, argsv, rawinfo, not wait)
 
         # note: protocol 2 for python2 compat
         outs = pickle.dumps(cmd, 2)
 
         cls.writeToSocket( cls.serv_socket, struct.pack('<I', len(outs)) )
         cls.writeToSocket( cls.serv_socket, outs )
+        for loc, a in arrays:
+            if a.nbytes:
+                cls.serv_socket.sendall(a.data)
+
+        if not wait:
+            cls.pendingasync += 1
+            return None
 
         backlen = struct.unpack('<I', cls.readLenFromSocket(cls.serv_socket,
                                                             cls.cmdlen))[0]
@@ -310,14 +403,25 @@ class Embedded(object):
         else:
             return retobj
 
+    @classmethod
+    def flushCommands(cls):
+        """Wait for asynchronous commands to be run, raising the first
+        error from them."""
+        cls.pendingasync = 0
+        cls.sendCommand( (-1, '_Flush', (), {}) )
+
     def runCommand(self, cmd, *args, **args2):
         """Execute the given function in the Qt thread with the arguments
         given."""
-        return self.sendCommand( (self.winno, cmd, args[1:], args2) )
+        wait = not self.asyncmode or cmd in embed_result_commands
+        return self.sendCommand( (self.winno, cmd, args[1:], args2),
+                                 wait=wait )
 
     @classmethod
     def exitQt(cls):
         """Exit the Qt thread."""
+        # errors from asynchronous commands are lost on exit
+        cls.pendingasync = 0
         try:
             cls.sendCommand( (-1, '_Quit', (), {}) )
             cls.serv_socket.shutdown(socket.SHUT_RDWR)
@@ -20,6 +20,10 @@ from __future__ import division
 import sys
 import struct
 import socket
+import select
+import time
+
+import numpy as N
 
 from .compat import citems, pickle
 from .windows.simplewindow import SimpleWindow
@@ -30,7 +34,11 @@ from . import qtall as qt4
 """Program to be run by embedding interface to run Veusz commands."""
 
 # embed.py module checks this is the same as its version number
-API_VERSION = 2
+API_VERSION = 3
+
+# keep running commands already sent for up to this time (s) before
+# returning to the event loop
+embed_batch_time = 0.1
 
 class EmbeddedClient(object):
     """An object for each instance of embedded window with document."""
@@ -182,14 +190,35 @@ class EmbedApplication(qt4.QApplication):
         self.clients = {}
         self.clientcounter = 0
 
+        # errors from commands not waited for by embed process
+        self.asyncerrors = []
+
     def readLenFromSocket(thesocket, length):
         """Read length bytes from socket."""
-        s = b''
-        while len(s) < length:
-            s += thesocket.recv(length-len(s))
-        return s
+        parts = []
+        while length > 0:
+            s = thesocket.recv(min(length, 1048576))
+            if not s:
+                raise socket.error('Connection closed')
+            parts.append(s)
+            length -= len(s)
+        return b''.join(parts)
     readLenFromSocket = staticmethod(readLenFromSocket)
 
+    def readArrayFromSocket(thesocket, dtype, shape):
+        """Read raw array data of the type and shape given from the
+        socket, directly into the memory of a new array."""
+        arr = N.empty(shape, dtype=N.dtype(dtype))
+        buf = arr.reshape(-1).view(N.uint8)
+        count = 0
+        while count < len(buf):
+            num = thesocket.recv_into(buf[count:], len(buf)-count)
+            if num == 0:
+                raise socket.error('Connection closed')
+            count += num
+        return arr
+    readArrayFromSocket = staticmethod(readArrayFromSocket)
+
     def writeToSocket(thesocket, data):
         """Write to socket until all data written."""
         count = 0
@@ -198,12 +227,29 @@ class EmbedApplication(qt4.QApplication):
     writeToSocket = staticmethod(writeToSocket)
 
     def readCommand(thesocket):
+        """Read command from socket.
+
+        Returns (window, cmd, args, argsv, noreply)."""
+
         # get length of packet
         length = struct.unpack('<I', EmbedApplication.readLenFromSocket(
                 thesocket, EmbedApplication.cmdlenlen))[0]
         # unpickle command and arguments
         temp = EmbedApplication.readLenFromSocket(thesocket, length)
-        return pickle.loads(temp)
+        msg = pickle.loads(temp)
+        if len(msg) == 4:
+            return tuple(msg) + (False,)
+
+        # extended command, with raw arrays following
+        window, cmd, args, argsv, rawinfo, noreply = msg
+        args = list(args)
+        for loc, dtype, shape in rawinfo:
+            arr = EmbedApplication.readArrayFromSocket(thesocket, dtype, shape)
+            if isinstance(loc, int):
+                args[loc] = arr
+            else:
+                argsv[loc] = arr
+        return window, cmd, args, argsv, noreply
     readCommand = staticmethod(readCommand)
 
     def makeNewClient(self, title, doc=None, hidden=False):
@@ -249,9 +295,26 @@ class EmbedApplication(qt4.QApplication):
     def readFromSocket(self):
         self.notifier.setEnabled(False)
         self.socket.setblocking(1)
-        
+
+        # run commands already sent (e.g. asynchronous ones) together,
+        # but return to event loop regularly to update the windows
+        starttime = time.time()
+        while True:
+            if not self.runCommandFromSocket():
+                return
+            if time.time()-starttime > embed_batch_time:
+                break
+            if not select.select([self.socket], [], [], 0)[0]:
+                break
+
+        self.socket.setblocking(0)
+        self.notifier.setEnabled(True)
+
+    def runCommandFromSocket(self):
+        """Read and run a command. Returns False if quitting."""
+
         # unpickle command and arguments
-        window, cmd, args, argsv = self.readCommand(self.socket)
+        window, cmd, args, argsv, noreply = self.readCommand(self.socket)
 
         if cmd == '_NewWindow':
             retval = self.makeNewClient(args[0], hidden=argsv['hidden'])
@@ -264,6 +327,10 @@ class EmbedApplication(qt4.QApplication):
             retval = self.makeNewClient( args[0],
                                          doc=self.clients[args[1]].document,
                                          hidden=argsv['hidden'] )
+        elif cmd == '_Flush':
+            # return first error from commands not waited for
+            retval = self.asyncerrors[0] if self.asyncerrors else None
+            self.asyncerrors = []
         else:
             interpreter = self.clients[window].ci
 
@@ -276,15 +343,16 @@ class EmbedApplication(qt4.QApplication):
             except Exception as e:
                 retval = e
 
-        self.writeOutput(retval)
+        if not noreply:
+            self.writeOutput(retval)
+        elif isinstance(retval, Exception):
+            self.asyncerrors.append(retval)
 
         # do quit after if requested
         if cmd == '_Quit':
             self.finishRemote()
-            return
-
-        self.socket.setblocking(0)
-        self.notifier.setEnabled(True)
+            return False
+        return True
 
 def runremote():
     """Run remote end of embedding module."""
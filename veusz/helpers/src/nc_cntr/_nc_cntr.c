@@ -252,8 +252,14 @@ struct Csite
     /* making the actual marks requires a bunch of other stuff */
     const double *x, *y, *z;    /* mesh coordinates and function values */
     double *xcp, *ycp;          /* output contour points */
+    int coords1d;               /* x and y are 1D arrays of length imax
+                                 * and jmax for a rectilinear mesh */
 };
 
+/* coordinates of mesh point p, where ij = i + imax*j */
+#define MESH_X(p) (site->coords1d ? x[(p) % site->imax] : x[p])
+#define MESH_Y(p) (site->coords1d ? y[(p) / site->imax] : y[p])
+
 #if 0
 static void print_Csite(Csite *Csite)
 {
@@ -391,8 +397,8 @@ zone_crosser (Csite * site, int level, int pass2)
         {
             /* second pass actually computes and stores the point */
             double zcp = (zlevel - z[p0]) / (z[p1] - z[p0]);
-            xcp[n] = zcp * (x[p1] - x[p0]) + x[p0];
-            ycp[n] = zcp * (y[p1] - y[p0]) + y[p0];
+            xcp[n] = zcp * (MESH_X(p1) - MESH_X(p0)) + MESH_X(p0);
+            ycp[n] = zcp * (MESH_Y(p1) - MESH_Y(p0)) + MESH_Y(p0);
         }
         if (!done && !jedge)
         {
@@ -588,8 +594,8 @@ edge_walker (Csite * site,  int pass2)
             /* mark current boundary point */
             if (pass2)
             {
-                xcp[n] = x[p0];
-                ycp[n] = y[p0];
+                xcp[n] = MESH_X(p0);
+                ycp[n] = MESH_Y(p0);
             }
             marked = 1;
         }
@@ -602,8 +608,8 @@ edge_walker (Csite * site,  int pass2)
             {
                 double zcp = site->zlevel[(z0 != 0)];
                 zcp = (zcp - site->z[p0]) / (site->z[p1] - site->z[p0]);
-                xcp[n] = zcp * (x[p1] - x[p0]) + x[p0];
-                ycp[n] = zcp * (y[p1] - y[p0]) + y[p0];
+                xcp[n] = zcp * (MESH_X(p1) - MESH_X(p0)) + MESH_X(p0);
+                ycp[n] = zcp * (MESH_Y(p1) - MESH_Y(p0)) + MESH_Y(p0);
             }
             marked = 1;
         }
@@ -730,8 +736,8 @@ slit_cutter (Csite * site, int up, int pass2)
                 site->n = n;
                 return 2;
             }
-            xcp[n] = x[p1];
-            ycp[n] = y[p1];
+            xcp[n] = MESH_X(p1);
+            ycp[n] = MESH_Y(p1);
             n++;
             p1 += imax;
         }
@@ -786,8 +792,8 @@ slit_cutter (Csite * site, int up, int pass2)
             }
             if (pass2)
             {
-                xcp[n] = x[p0];
-                ycp[n] = y[p0];
+                xcp[n] = MESH_X(p0);
+                ycp[n] = MESH_Y(p0);
                 n++;
             }
             else
@@ -1288,12 +1294,13 @@ cntr_new(void)
     site->x = NULL;
     site->y = NULL;
     site->z = NULL;
+    site->coords1d = 0;
     return site;
 }
 
 static int
 cntr_init(Csite *site, long iMax, long jMax, double *x, double *y,
-                double *z, char *mask)
+                double *z, char *mask, int coords1d)
 {
     long ijmax = iMax * jMax;
     long nreg = iMax * jMax + iMax + 1;
@@ -1332,6 +1339,7 @@ cntr_init(Csite *site, long iMax, long jMax, double *x, double *y,
     site->x = x;
     site->y = y;
     site->z = z;
+    site->coords1d = coords1d;
     site->xcp = NULL;
     site->ycp = NULL;
     return 0;
@@ -1461,6 +1469,9 @@ build_cntr_list_v2(long *np, double *xp, double *yp, int nparts, long ntotal)
    is 2, the set of polygons bounded by the levels will be returned.
    If points is True, the lines will be returned as a list of list
    of points; otherwise, as a list of tuples of vectors.
+
+   The GIL is released while tracing, so that different Cntr objects
+   can be traced in several threads at once.
 */
 
 static PyObject *
@@ -1478,6 +1489,11 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
     long ntotal = 0;
     long nparts2 = 0;
     long ntotal2 = 0;
+    int pass2error = 0;
+    long i;
+
+    xp0 = yp0 = NULL;
+    nseg0 = NULL;
 
     site->zlevel[0] = levels[0];
     site->zlevel[1] = levels[0];
@@ -1486,6 +1502,14 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
         site->zlevel[1] = levels[1];
     }
     site->n = site->count = 0;
+
+    Py_BEGIN_ALLOW_THREADS
+
+    /* reset saddle triangulation from previous traces, so that the
+       result does not depend on which levels were traced before */
+    for (i = 0; i < site->imax * site->jmax; i++)
+        site->triangle[i] = 0;
+
     data_init (site, 0, nchunk);
 
     /* make first pass to compute required sizes for second pass */
@@ -1505,6 +1529,8 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
             ntotal -= n;
         }
     }
+    Py_END_ALLOW_THREADS
+
     xp0 = (double *) PyMem_Malloc(ntotal * sizeof(double));
     yp0 = (double *) PyMem_Malloc(ntotal * sizeof(double));
     nseg0 = (long *) PyMem_Malloc(nparts * sizeof(long));
@@ -1518,14 +1544,14 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
     site->xcp = xp0;
     site->ycp = yp0;
     iseg = 0;
+    Py_BEGIN_ALLOW_THREADS
     for (;;iseg++)
     {
         n = curve_tracer (site, 1);
         if (ntotal2 + n > ntotal)
         {
-            PyErr_SetString(PyExc_RuntimeError,
-                "curve_tracer: ntotal2, pass 2 exceeds ntotal, pass 1");
-            goto error;
+            pass2error = 1;
+            break;
         }
         if (n == 0)
             break;
@@ -1540,11 +1566,24 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
         }
         else
         {
-            PyErr_SetString(PyExc_RuntimeError,
-                "Negative n from curve_tracer in pass 2");
-            goto error;
+            pass2error = 2;
+            break;
         }
     }
+    Py_END_ALLOW_THREADS
+
+    if (pass2error == 1)
+    {
+        PyErr_SetString(PyExc_RuntimeError,
+            "curve_tracer: ntotal2, pass 2 exceeds ntotal, pass 1");
+        goto error;
+    }
+    else if (pass2error == 2)
+    {
+        PyErr_SetString(PyExc_RuntimeError,
+            "Negative n from curve_tracer in pass 2");
+        goto error;
+    }
 
 
     if (points)
@@ -1644,6 +1683,7 @@ Cntr_init(Cntr *self, PyObject *args, PyObject *kwds)
     PyArrayObject *xpa, *ypa, *zpa, *mpa;
     long iMax, jMax;
     char *mask;
+    int coords1d;
 
     marg = NULL;
 
@@ -1661,11 +1701,12 @@ Cntr_init(Cntr *self, PyObject *args, PyObject *kwds)
         return -1;
     }
 
+    /* x and y can be 2D, or 1D for a rectilinear mesh */
     xpa = (PyArrayObject *) PyArray_ContiguousFromObject(xarg,
-							 NPY_DOUBLE, 2, 2);
+							 NPY_DOUBLE, 1, 2);
     ypa = (PyArrayObject *) PyArray_ContiguousFromObject(yarg,
 							 NPY_DOUBLE,
-							 2, 2);
+							 1, 2);
     zpa = (PyArrayObject *) PyArray_ContiguousFromObject(zarg, NPY_DOUBLE,
 							 2, 2);
     if (marg)
@@ -1678,13 +1719,19 @@ Cntr_init(Cntr *self, PyObject *args, PyObject *kwds)
     if (xpa == NULL || ypa == NULL || zpa == NULL || (marg && mpa == NULL))
     {
         PyErr_SetString(PyExc_ValueError,
-            "Arguments x, y, z, mask (if present) must be 2D arrays.");
+            "Arguments z, mask (if present) must be 2D arrays,"
+            " and x, y 1D or 2D arrays.");
         goto error;
     }
     iMax = PyArray_DIMS(zpa)[1];
     jMax = PyArray_DIMS(zpa)[0];
-    if (PyArray_DIMS(xpa)[0] != jMax || PyArray_DIMS(xpa)[1] != iMax ||
-        PyArray_DIMS(ypa)[0] != jMax || PyArray_DIMS(ypa)[1] != iMax ||
+    coords1d = PyArray_NDIM(xpa) == 1;
+    if ( PyArray_NDIM(ypa) != PyArray_NDIM(xpa) ||
+         (coords1d &&
+          (PyArray_DIMS(xpa)[0] != iMax || PyArray_DIMS(ypa)[0] != jMax)) ||
+         (!coords1d &&
+          (PyArray_DIMS(xpa)[0] != jMax || PyArray_DIMS(xpa)[1] != iMax ||
+           PyArray_DIMS(ypa)[0] != jMax || PyArray_DIMS(ypa)[1] != iMax)) ||
         (mpa && (PyArray_DIMS(mpa)[0] != jMax || PyArray_DIMS(mpa)[1] != iMax)))
     {
         PyErr_SetString(PyExc_ValueError,
@@ -1696,7 +1743,7 @@ Cntr_init(Cntr *self, PyObject *args, PyObject *kwds)
     else     mask = NULL;
     if ( cntr_init(self->site, iMax, jMax, (double *)PyArray_DATA(xpa),
 		   (double *)PyArray_DATA(ypa),
-		   (double *)PyArray_DATA(zpa), mask))
+		   (double *)PyArray_DATA(zpa), mask, coords1d))
     {
         PyErr_SetString(PyExc_MemoryError,
             "Memory allocation failure in cntr_init");
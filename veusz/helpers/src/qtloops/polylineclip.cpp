@@ -411,23 +411,111 @@ QPolygonF RotatedRectangle::makePolygon() const
   return poly;
 }
 
+namespace
+{
+  // maximum number of grid cells a rectangle can be added to
+  const int max_rect_cells = 1024;
+}
+
 RectangleOverlapTester::RectangleOverlapTester()
+  : _cellsize(0)
 {
 }
 
+bool RectangleOverlapTester::cellRange(const QRectF& bbox, int& x1, int& y1,
+                                       int& x2, int& y2) const
+{
+  const double x1f = std::floor(bbox.left() / _cellsize);
+  const double y1f = std::floor(bbox.top() / _cellsize);
+  const double x2f = std::floor(bbox.right() / _cellsize);
+  const double y2f = std::floor(bbox.bottom() / _cellsize);
+
+  if( !(x2f-x1f < max_rect_cells && y2f-y1f < max_rect_cells &&
+        (x2f-x1f+1)*(y2f-y1f+1) <= max_rect_cells &&
+        std::abs(x1f) < 1e9 && std::abs(y1f) < 1e9 &&
+        std::abs(x2f) < 1e9 && std::abs(y2f) < 1e9) )
+    return false;
+
+  x1 = int(x1f); y1 = int(y1f);
+  x2 = int(x2f); y2 = int(y2f);
+  return true;
+}
+
+bool RectangleOverlapTester::overlapsIndex(const QPolygonF& poly,
+                                           const QRectF& bbox,
+                                           int idx) const
+{
+  return bbox.intersects(_bboxes.at(idx)) &&
+    doPolygonsIntersect(poly, _rects.at(idx).makePolygon());
+}
+
 bool RectangleOverlapTester::willOverlap(const RotatedRectangle& rect)
 {
   const QPolygonF thispoly(rect.makePolygon());
+  const QRectF bbox(thispoly.boundingRect());
+
+  for(int i = 0; i < _large.size(); ++i)
+    if( overlapsIndex(thispoly, bbox, _large.at(i)) )
+      return true;
+
+  if( _grid.isEmpty() )
+    return false;
 
-  for(int i = 0; i < _rects.size(); ++i)
+  int x1, y1, x2, y2;
+  if( ! cellRange(bbox, x1, y1, x2, y2) )
     {
-      if( doPolygonsIntersect(thispoly, _rects.at(i).makePolygon()) )
-        return true;
+      // too big for the grid, so check everything
+      for(int i = 0; i < _rects.size(); ++i)
+        if( overlapsIndex(thispoly, bbox, i) )
+          return true;
+      return false;
     }
 
+  for(int cy = y1; cy <= y2; ++cy)
+    for(int cx = x1; cx <= x2; ++cx)
+      {
+        QHash< CellKey, QVector<int> >::const_iterator it =
+          _grid.constFind(CellKey(cx, cy));
+        if( it == _grid.constEnd() )
+          continue;
+
+        const QVector<int>& cell = it.value();
+        for(int i = 0; i < cell.size(); ++i)
+          if( overlapsIndex(thispoly, bbox, cell.at(i)) )
+            return true;
+      }
+
   return false;
 }
 
+void RectangleOverlapTester::addRect(const RotatedRectangle& rect)
+{
+  const QRectF bbox(rect.makePolygon().boundingRect());
+  const int idx = _rects.size();
+  _rects.append(rect);
+  _bboxes.append(bbox);
+
+  // size the cells from the first rectangle, as labels are usually
+  // of a similar size
+  if( _cellsize <= 0 )
+    {
+      _cellsize = std::max(bbox.width(), bbox.height());
+      if( !(_cellsize > 1) )
+        _cellsize = 1;
+    }
+
+  int x1, y1, x2, y2;
+  if( ! cellRange(bbox, x1, y1, x2, y2) )
+    {
+      _large.append(idx);
+      return;
+    }
+
+  for(int cy = y1; cy <= y2; ++cy)
+    for(int cx = x1; cx <= x2; ++cx)
+      _grid[CellKey(cx, cy)].append(idx);
+}
+
 ///////////////////////////////////////////////////////
 
 LineLabeller::LineLabeller(QRectF cliprect, bool rotatelabels)
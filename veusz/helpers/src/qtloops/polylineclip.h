@@ -25,6 +25,9 @@
 #include <QPainter>
 #include <QPolygonF>
 #include <QSizeF>
+#include <QHash>
+#include <QPair>
+#include <QVector>
 
 // clip a line made up of the points given, returning true
 // if is in region or false if not
@@ -96,15 +99,32 @@ private:
   QVector<QSizeF> _textsizes;
 };
 
+// Keep track of whether RotatedRectangles overlap
+// Rectangles are indexed in a uniform grid of cells, so that each test
+// only considers rectangles which are nearby
 class RectangleOverlapTester
 {
 public:
   RectangleOverlapTester();
   bool willOverlap(const RotatedRectangle& rect);
-  void addRect(const RotatedRectangle& rect) { _rects.append(rect); };
+  void addRect(const RotatedRectangle& rect);
+
+private:
+  typedef QPair<int,int> CellKey;
+
+  // get range of cells covering bounding box (returns false if too many)
+  bool cellRange(const QRectF& bbox, int& x1, int& y1,
+                 int& x2, int& y2) const;
+  bool overlapsIndex(const QPolygonF& poly, const QRectF& bbox,
+                     int idx) const;
 
 private:
   QVector<RotatedRectangle> _rects;
+  QVector<QRectF> _bboxes;
+  double _cellsize;
+  QHash< CellKey, QVector<int> > _grid;
+  // rectangles too large to put in grid
+  QVector<int> _large;
 };
 
 #endif
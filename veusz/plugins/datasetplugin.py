@@ -24,7 +24,7 @@ from __future__ import division
 import numpy as N
 from . import field
 
-from ..compat import czip, citems, cstr
+from ..compat import czip, citems, cvalues, cstr, cbasestr
 from .. import utils
 try:
     from ..helpers import qtloops
@@ -44,37 +44,53 @@ class DatasetPluginException(RuntimeError):
     """
     pass
 
-def numpyCopyOrNone(data):
+def isReadOnlyArray(data):
+    """Is data a read-only numeric numpy array (e.g. memory-mapped)?"""
+    return ( isinstance(data, N.ndarray) and not data.flags.writeable and
+             data.dtype.kind in 'biuf' )
+
+def numpyCopyOrNone(data, mapped=False):
     """If data is None return None
-    Otherwise return a numpy array corresponding to data."""
+    Otherwise return a numpy array corresponding to data.
+
+    If mapped is set, read-only (memory-mapped) arrays are returned
+    without copying. They are converted to float64 when the dataset
+    is used."""
     if data is None:
         return None
+    if mapped and isReadOnlyArray(data):
+        return data
     return N.array(data, dtype=N.float64)
 
 # these classes are returned from dataset plugins
 class Dataset1D(object):
     """1D dataset for ImportPlugin or DatasetPlugin."""
-    def __init__(self, name, data=[], serr=None, perr=None, nerr=None):
+    def __init__(self, name, data=[], serr=None, perr=None, nerr=None,
+                 mapped=False):
         """1D dataset
         name: name of dataset
         data: data in dataset: list of floats or numpy 1D array
         serr: (optional) symmetric errors on data: list or numpy array
         perr: (optional) positive errors on data: list or numpy array
         nerr: (optional) negative errors on data: list or numpy array
+        mapped: (optional) keep read-only arrays (e.g. memory-mapped
+         from an import) without copying them
 
         If errors are returned for data give serr or nerr and perr.
         nerr should be negative values if used.
         perr should be positive values if used.
         """
         self.name = name
-        self.update(data=data, serr=serr, perr=perr, nerr=nerr)
+        self.update(data=data, serr=serr, perr=perr, nerr=nerr,
+                    mapped=mapped)
 
-    def update(self, data=[], serr=None, perr=None, nerr=None):
+    def update(self, data=[], serr=None, perr=None, nerr=None,
+               mapped=False):
         """Update values to those given."""
-        self.data = numpyCopyOrNone(data)
-        self.serr = numpyCopyOrNone(serr)
-        self.perr = numpyCopyOrNone(perr)
-        self.nerr = numpyCopyOrNone(nerr)
+        self.data = numpyCopyOrNone(data, mapped=mapped)
+        self.serr = numpyCopyOrNone(serr, mapped=mapped)
+        self.perr = numpyCopyOrNone(perr, mapped=mapped)
+        self.nerr = numpyCopyOrNone(nerr, mapped=mapped)
 
     def _null(self):
         """Empty data contents."""
@@ -91,7 +107,7 @@ class Dataset2D(object):
     """2D dataset for ImportPlugin or DatasetPlugin."""
     def __init__(self, name, data=[[]], rangex=None, rangey=None,
                  xedge=None, yedge=None,
-                 xcent=None, ycent=None):
+                 xcent=None, ycent=None, mapped=False):
         """2D dataset.
         name: name of dataset
         data: 2D numpy array of values or list of lists of floats
@@ -101,16 +117,21 @@ class Dataset2D(object):
         yedge: y values for grid (instead of rangey)
         xcent: x values for pixel centres (instead of rangex)
         ycent: y values for pixel centres (instead of rangey)
+        mapped: (optional) keep a read-only float64 array (e.g.
+         memory-mapped from an import) without copying it
         """
         self.name = name
         self.update(data=data, rangex=rangex, rangey=rangey,
                     xedge=xedge, yedge=yedge,
-                    xcent=xcent, ycent=ycent)
+                    xcent=xcent, ycent=ycent, mapped=mapped)
 
     def update(self, data=[[]], rangex=None, rangey=None,
                xedge=None, yedge=None,
-               xcent=None, ycent=None):
-        self.data = N.array(data, dtype=N.float64)
+               xcent=None, ycent=None, mapped=False):
+        if mapped and isReadOnlyArray(data) and data.dtype == N.float64:
+            self.data = data
+        else:
+            self.data = N.array(data, dtype=N.float64)
         self.rangex = rangex
         self.rangey = rangey
         self.xedge = xedge
@@ -216,6 +237,8 @@ class DatasetPluginHelper(object):
     def __init__(self, doc):
         """Construct helper object to pass to DatasetPlugins."""
         self._doc = doc
+        # names of datasets read through the helper
+        self._deps = []
 
     @property
     def datasets1d(self):
@@ -254,23 +277,18 @@ class DatasetPluginHelper(object):
 
         Returns None if expression could not be evaluated.
         """
+        from .. import document
+        self._deps += document.expressionDependencies(
+            self._doc.data, expr, part)
         ds = self._doc.evalDatasetExpression(expr, part=part)
         if ds is not None:
             return ds.data
         else:
             return None
 
-    def getDataset(self, name, dimensions=1):
-        """Return numerical dataset object for name given.
-        Please make sure that dataset data are not modified.
-
-        name: name of dataset
-        dimensions: number of dimensions dataset requires
-
-        name not found: raise a DatasetPluginException
-        dimensions not right: raise a DatasetPluginException
-        """
-        from .. import document
+    def _getNumericDataset(self, name, dimensions):
+        """Return document numerical dataset, checking dimensions."""
+        self._deps.append(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -283,6 +301,20 @@ class DatasetPluginHelper(object):
         if ds.datatype != 'numeric':
             raise DatasetPluginException(
                 _("Dataset '%s' is not a numerical dataset") % name)
+        return ds
+
+    def getDataset(self, name, dimensions=1):
+        """Return numerical dataset object for name given.
+        Please make sure that dataset data are not modified.
+
+        name: name of dataset
+        dimensions: number of dimensions dataset requires
+
+        name not found: raise a DatasetPluginException
+        dimensions not right: raise a DatasetPluginException
+        """
+        from .. import document
+        ds = self._getNumericDataset(name, dimensions)
 
         if isinstance(ds, document.DatasetDateTime):
             return DatasetDateTime(name, data=ds.data)
@@ -301,6 +333,32 @@ class DatasetPluginHelper(object):
         """Get a list of numerical datasets (of the dimension given)."""
         return [ self.getDataset(n, dimensions=dimensions) for n in names ]
 
+    def iterDatasetChunks(self, names, chunksize=None):
+        """Iterate over the data values of the 1D numerical datasets
+        with the names given, without reading all the values into
+        memory at once. For each chunk a list of arrays is returned,
+        one for each dataset. Do not modify the arrays.
+
+        name not found or wrong type: raise a DatasetPluginException
+        datasets have different lengths: raise a DatasetPluginException
+        """
+
+        iters = [ self._getNumericDataset(n, 1).dataChunks(chunksize)
+                  for n in names ]
+
+        def chunks():
+            while True:
+                vals = [ next(i, None) for i in iters ]
+                if all([v is None for v in vals]):
+                    break
+                if ( any([v is None for v in vals]) or
+                     len(set([len(v) for v in vals])) != 1 ):
+                    raise DatasetPluginException(
+                        _('Datasets do not have the same length'))
+                yield vals
+
+        return chunks()
+
     def getTextDataset(self, name):
         """Return a text dataset with name given.
         Do not modify this dataset.
@@ -308,6 +366,7 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         """
 
+        self._deps.append(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -332,7 +391,9 @@ class DatasetPluginManager(object):
         self.document = doc
         self.helper = DatasetPluginHelper(doc)
         self.fields = dict(fields)
-        self.changeset = -1
+        # datasets read by the plugin when last updated and their state
+        self.deps = []
+        self.depkey = None
 
         self.fixMissingFields()
         self.setupDatasets()
@@ -390,11 +451,14 @@ class DatasetPluginManager(object):
         when updating the dataset
         """
 
-        if self.document.changeset == self.changeset:
+        # only update if the datasets read by the plugin have changed
+        depkey = self.document.dataDependencyKey(self.dependencies())
+        if depkey == self.depkey:
             return
-        self.changeset = self.document.changeset
+        self.depkey = depkey
 
-        # run the plugin with its parameters
+        # run the plugin with its parameters, recording datasets read
+        self.helper._deps = []
         try:
             self.plugin.updateDatasets(self.fields, self.helper)
         except DatasetPluginException as ex:
@@ -405,6 +469,26 @@ class DatasetPluginManager(object):
             # otherwise if there's an error, then log and null outputs
             self.document.log( cstr(ex) )
             self.nullDatasets()
+        finally:
+            self.deps = self.helper._deps
+            # must be made in the same way as the key checked above
+            self.depkey = self.document.dataDependencyKey(
+                self.dependencies())
+
+    def dependencies(self):
+        """Return names of datasets read by plugin, including those
+        named in its input fields, but not the datasets it creates."""
+        deps = list(self.deps)
+        data = self.document.data
+        for val in cvalues(self.fields):
+            if isinstance(val, cbasestr):
+                if val in data:
+                    deps.append(val)
+            elif isinstance(val, (list, tuple)):
+                deps += [v for v in val if isinstance(v, cbasestr) and
+                         v in data]
+        outputs = set(self.datasetnames)
+        return [d for d in deps if d not in outputs]
 
 class DatasetPlugin(object):
     """Base class for defining dataset plugins."""
@@ -1781,23 +1865,30 @@ class Histogram2D(DatasetPlugin):
     def updateDatasets(self, fields, helper):
         """Calculate values of output dataset."""
 
-        dsy = helper.getDataset(fields['ds_iny']).data
-        dsx = helper.getDataset(fields['ds_inx']).data
+        # the data are read in chunks, so large datasets in files do
+        # not need to be read into memory
+        names = [fields['ds_iny'], fields['ds_inx']]
 
         # use range of data or specified parameters
-        miny = fields['miny']
-        if miny == 'Auto': miny = N.nanmin(dsy)
-        maxy = fields['maxy']
-        if maxy == 'Auto': maxy = N.nanmax(dsy)
-        minx = fields['minx']
-        if minx == 'Auto': minx = N.nanmin(dsx)
-        maxx = fields['maxx']
-        if maxx == 'Auto': maxx = N.nanmax(dsx)
-
-        # compute counts in each bin
-        histo, xedge, yedge = N.histogram2d(
-            dsy, dsx, bins=[fields['binsy'], fields['binsx']],
-            range=[[miny,maxy], [minx,maxx]], normed=False)
+        miny, maxy = fields['miny'], fields['maxy']
+        minx, maxx = fields['minx'], fields['maxx']
+        if 'Auto' in (miny, maxy, minx, maxx):
+            # merge ranges of each chunk with range so far
+            ranges = [(N.nan, N.nan)]*2
+            for chunks in helper.iterDatasetChunks(names):
+                ranges = [ utils.nanMinMaxChunks((c, N.array(r)))
+                           for c, r in czip(chunks, ranges) ]
+            if miny == 'Auto': miny = ranges[0][0]
+            if maxy == 'Auto': maxy = ranges[0][1]
+            if minx == 'Auto': minx = ranges[1][0]
+            if maxx == 'Auto': maxx = ranges[1][1]
+
+        # compute counts in each bin, adding up histograms of chunks
+        bins = [fields['binsy'], fields['binsx']]
+        histo = N.zeros(bins)
+        for dsy, dsx in helper.iterDatasetChunks(names):
+            histo += N.histogram2d(
+                dsy, dsx, bins=bins, range=[[miny,maxy], [minx,maxx]])[0]
 
         m = fields['mode']
         if m == 'Count':
@@ -442,34 +442,41 @@ class ImportPluginQdp(ImportPlugin):
 
         return rqdp.retndata
 
-def cnvtImportNumpyArray(name, val, errorsin2d=True):
-    """Convert a numpy array to plugin returns."""
+def cnvtImportNumpyArray(name, val, errorsin2d=True, mapped=False):
+    """Convert a numpy array to plugin returns.
+
+    If mapped is set, val is memory-mapped and is not copied."""
 
     try:
         val.shape
     except AttributeError:
         raise ImportPluginException(_("Not the correct format file"))
-    try:
-        val + 0.
-        val = val.astype(N.float64)
-    except TypeError:
-        raise ImportPluginException(_("Unsupported array type"))
+    if mapped and datasetplugin.isReadOnlyArray(val):
+        # memory-mapped arrays are converted when used
+        pass
+    else:
+        try:
+            val + 0.
+            val = val.astype(N.float64)
+        except TypeError:
+            raise ImportPluginException(_("Unsupported array type"))
 
     if val.ndim == 1:
-        return datasetplugin.Dataset1D(name, val)
+        return datasetplugin.Dataset1D(name, val, mapped=mapped)
     elif val.ndim == 2:
         if errorsin2d and val.shape[1] in (2, 3):
             # return 1d array
             if val.shape[1] == 2:
                 # use as symmetric errors
-                return datasetplugin.Dataset1D(name, val[:,0], serr=val[:,1])
+                return datasetplugin.Dataset1D(name, val[:,0], serr=val[:,1],
+                                               mapped=mapped)
             else:
                 # asymmetric errors
                 # unclear on ordering here...
                 return datasetplugin.Dataset1D(name, val[:,0], perr=val[:,1],
-                                               nerr=val[:,2])
+                                               nerr=val[:,2], mapped=mapped)
         else:
-            return datasetplugin.Dataset2D(name, val)
+            return datasetplugin.Dataset2D(name, val, mapped=mapped)
     else:
         raise ImportPluginException(_("Unsupported dataset shape"))
 
@@ -489,6 +496,10 @@ class ImportPluginNpy(ImportPlugin):
                             descr=_("Treat 2 and 3 column 2D arrays as\n"
                                     "data with error bars"),
                             default=True),
+            field.FieldBool("memorymap",
+                            descr=_("Memory map file, rather than\n"
+                                    "reading it into memory"),
+                            default=False),
             ]
 
     def getPreview(self, params):
@@ -518,14 +529,19 @@ class ImportPluginNpy(ImportPlugin):
         if not name:
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
+        mmap_mode = 'r' if params.field_results.get("memorymap") else None
         try:
-            retn = N.load(params.filename)
+            retn = N.load(params.filename, mmap_mode=mmap_mode)
         except Exception as e:
             raise ImportPluginException(_("Error while reading file: %s") %
                                         cstr(e))
+        if isinstance(retn, N.memmap):
+            # plain view of the mapped file
+            retn = N.asarray(retn)
 
         return [ cnvtImportNumpyArray(
-                name, retn, errorsin2d=params.field_results["errorsin2d"]) ]
+                name, retn, errorsin2d=params.field_results["errorsin2d"],
+                mapped=mmap_mode is not None) ]
 
 class ImportPluginNpz(ImportPlugin):
     """For reading single datasets from NPY numpy saved files."""
@@ -610,7 +626,11 @@ class ImportPluginBinary(ImportPlugin):
             field.FieldCombo("endian", descr=_("Endian (byte order)"),
                              items = ("little", "big"), editable=False),
             field.FieldInt("offset", descr=_("Offset (bytes)"), default=0, minval=0),
-            field.FieldInt("length", descr=_("Length (values)"), default=-1)
+            field.FieldInt("length", descr=_("Length (values)"), default=-1),
+            field.FieldBool("memorymap",
+                            descr=_("Memory map file, rather than\n"
+                                    "reading it into memory"),
+                            default=False),
             ]
 
     def getNumpyDataType(self, params):
@@ -655,6 +675,10 @@ class ImportPluginBinary(ImportPlugin):
         if not name:
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
+        if params.field_results.get("memorymap"):
+            data = self.mapData(params)
+            return [ datasetplugin.Dataset1D(name, data, mapped=True) ]
+
         try:
             f = open(params.filename, "rb")
             f.seek( params.field_results["offset"] )
@@ -674,6 +698,43 @@ class ImportPluginBinary(ImportPlugin):
         data = data.astype(N.float64)
         return [ datasetplugin.Dataset1D(name, data) ]
 
+    def mapData(self, params):
+        """Return a read-only array memory-mapped from the file."""
+
+        dtype = self.getNumpyDataType(params)
+        offset = params.field_results["offset"]
+        length = params.field_results["length"]
+
+        try:
+            avail = os.path.getsize(params.filename) - offset
+        except EnvironmentError as e:
+            raise ImportPluginException(_("Error while reading file '%s'\n\n%s") %
+                                        (params.filename, cstrerror(e)))
+
+        if length < 0:
+            if avail % dtype.itemsize != 0:
+                raise ImportPluginException(
+                    _("Error converting data for file '%s'\n\n%s") %
+                    (params.filename,
+                     _("Size of data is not a multiple of data type size")))
+            length = avail // dtype.itemsize
+        else:
+            length = min(length, max(avail, 0) // dtype.itemsize)
+
+        if length <= 0:
+            # cannot map empty regions
+            return N.array([])
+
+        try:
+            data = N.memmap(params.filename, dtype=dtype, mode='r',
+                            offset=offset, shape=(length,))
+        except (EnvironmentError, ValueError) as e:
+            raise ImportPluginException(_("Error while reading file '%s'\n\n%s") %
+                                        (params.filename, cstr(e)))
+
+        # plain view of the mapped file, rather than a memmap object
+        return N.asarray(data)
+
 importpluginregistry += [
     ImportPluginNpy,
     ImportPluginNpz,
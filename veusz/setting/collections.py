@@ -365,6 +365,11 @@ class PointLabel(Text):
                                     descr=_('Horizontal position of label'),
                                     usertext=_('Horz position'),
                                     formatting=True), 0 )
+        self.add( setting.Bool('hideOverlap', False,
+                               descr=_('Hide labels which would overlap '
+                                       'labels already drawn'),
+                               usertext=_('Hide overlaps'),
+                               formatting=True) )
 
 class MarkerColor(Settings):
     """Settings for a coloring points using data values."""
@@ -18,6 +18,20 @@
 
 from __future__ import division
 
+# increased when the structure of the widget tree changes, as resolved
+# references are cached until this happens
+tree_version = 0
+
+def treeChanged():
+    """Call after widgets or settings are added, removed, renamed or
+    moved, to discard cached resolutions of references."""
+    global tree_version
+    tree_version += 1
+
+def treeVersion():
+    """Return current version of the structure of the widget tree."""
+    return tree_version
+
 class ReferenceBase(object):
     """Reference objects are inherited from this base class.
 
@@ -67,6 +81,20 @@ class Reference(ReferenceBase):
         if self.resolved:
             return self.resolved
 
+        # other references are cached in the setting until the tree
+        # changes
+        try:
+            cache = thissetting._refcache
+        except AttributeError:
+            cache = None
+        else:
+            if cache is None or cache[0] != tree_version:
+                cache = thissetting._refcache = (tree_version, {})
+            else:
+                item = cache[1].get(self)
+                if item is not None:
+                    return item
+
         item = thissetting.parent
         parts = list(self.split)
         if parts[0] == '':
@@ -102,6 +130,8 @@ class Reference(ReferenceBase):
         # hopefully this won't ever change
         if len(self.split) > 2 and self.split[1] == 'StyleSheet':
             self.resolved = item
+        elif cache is not None:
+            cache[1][self] = item
 
         return item
 
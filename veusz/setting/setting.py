@@ -40,13 +40,33 @@ from .reference import ReferenceBase, Reference
 
 from .. import utils
 
+def _slotNames(cls, _cache={}):
+    """Return names of slots of setting class and its bases."""
+    try:
+        return _cache[cls]
+    except KeyError:
+        names = []
+        for c in cls.__mro__:
+            names += [n for n in c.__dict__.get('__slots__', ())
+                      if n not in names]
+        _cache[cls] = names
+        return names
+
 class OnModified(qt4.QObject):
-    """onmodified is emitted from an object contained in each setting."""
+    """onmodified is emitted from an object contained in a setting.
+
+    This is only made when a function is connected to the setting, as
+    most settings are never connected."""
     onModified = qt4.pyqtSignal()
 
 class Setting(object):
     """A class to store a value with a particular type."""
 
+    # settings are numerous, so do not give each a dict
+    __slots__ = ('readonly', 'parent', 'name', 'descr', 'usertext',
+                 'formatting', 'hidden', 'default', '_val', '_onmodified',
+                 '_refcache')
+
     # differentiate widgets, settings and setting
     nodetype = 'setting'
 
@@ -71,7 +91,9 @@ class Setting(object):
         self.formatting = formatting
         self.hidden = hidden
         self.default = value
-        self.onmodified = OnModified()
+        self._onmodified = None
+        # resolved references (see Reference.resolve)
+        self._refcache = None
         self._val = None
 
         # calls the set function for the val property
@@ -81,38 +103,30 @@ class Setting(object):
         """Is this object a widget?"""
         return False
 
-    def _copyHelper(self, before, after, optional):
-        """Help copy an object.
-
-        before are arguments before val
-        after are arguments after val
-        optinal as optional arguments
-        """
-
-        if isinstance(self._val, ReferenceBase):
-            val = self._val
-        else:
-            val = self.val
-
-        args = (self.name,) + before + (val,) + after
-
-        opt = optional.copy()
-        opt['descr'] = self.descr
-        opt['usertext'] = self.usertext
-        opt['formatting'] = self.formatting
-        opt['hidden'] = self.hidden
-
-        obj = self.__class__(*args, **opt)
-        obj.readonly = self.readonly
-        obj.default = self.default
-        return obj
-
     def copy(self):
         """Make a setting which has its values copied from this one.
 
-        This needs to be overridden if the constructor changes
+        The attributes are copied directly, rather than constructing
+        a new setting, as this is much faster.
         """
-        return self._copyHelper((), (), {})
+        cls = self.__class__
+        obj = cls.__new__(cls)
+        for attr in _slotNames(cls):
+            try:
+                setattr(obj, attr, getattr(self, attr))
+            except AttributeError:
+                pass
+        if hasattr(self, '__dict__'):
+            # subclasses elsewhere may not use slots
+            obj.__dict__.update(self.__dict__)
+        if isinstance(self._val, list):
+            obj._val = list(self._val)
+        elif isinstance(self._val, dict):
+            obj._val = dict(self._val)
+        obj.parent = None
+        obj._onmodified = None
+        obj._refcache = None
+        return obj
 
     def get(self):
         """Get the value."""
@@ -131,7 +145,16 @@ class Setting(object):
             # this also removes the linked value if there is one set
             self._val = self.convertTo(v)
 
-        self.onmodified.onModified.emit()
+        if self._onmodified is not None:
+            self._onmodified.onModified.emit()
+
+        # increase change counter of widget containing setting
+        obj = self.parent
+        while obj is not None:
+            if obj.isWidget():
+                obj.changeset += 1
+                break
+            obj = obj.parent
 
     val = property(get, set, None,
                    'Get or modify the value of the setting')
@@ -268,7 +291,9 @@ class Setting(object):
 
     def setOnModified(self, fn):
         """Set the function to be called on modification (passing True)."""
-        self.onmodified.onModified.connect(fn)
+        if self._onmodified is None:
+            self._onmodified = OnModified()
+        self._onmodified.onModified.connect(fn)
 
         if isinstance(self._val, ReferenceBase):
             # tell references to notify us if they are modified
@@ -276,7 +301,8 @@ class Setting(object):
 
     def removeOnModified(self, fn):
         """Remove the function from the list of function to be called."""
-        self.onmodified.onModified.disconnect(fn)
+        if self._onmodified is not None:
+            self._onmodified.onModified.disconnect(fn)
 
     def newDefault(self, value):
         """Update the default and the value."""
@@ -359,6 +385,8 @@ class SettingBackwardCompat(Setting):
     This is used for backward-compatibility.
     """
 
+    __slots__ = ('relpath', 'translatefn')
+
     typename = 'backward-compat'
 
     def __init__(self, name, newrelpath, val, translatefn = None,
@@ -397,10 +425,6 @@ class SettingBackwardCompat(Setting):
     def get(self):
         return self.getForward().get()
 
-    def copy(self):
-        return self._copyHelper(('/'.join(self.relpath),), (),
-                                {'translatefn': self.translatefn})
-
     def makeControl(self, *args):
         return None
 
@@ -415,6 +439,8 @@ class SettingBackwardCompat(Setting):
 class Str(Setting):
     """String setting."""
 
+    __slots__ = ()
+
     typename = 'str'
 
     def convertTo(self, val):
@@ -434,6 +460,8 @@ class Str(Setting):
 class Notes(Str):
     """String for making notes."""
 
+    __slots__ = ()
+
     typename = 'str-notes'
 
     def makeControl(self, *args):
@@ -443,6 +471,8 @@ class Notes(Str):
 class Bool(Setting):
     """Bool setting."""
 
+    __slots__ = ()
+
     typename = 'bool'
 
     def convertTo(self, val):
@@ -472,6 +502,8 @@ class Bool(Setting):
 class Int(Setting):
     """Integer settings."""
 
+    __slots__ = ('minval', 'maxval')
+
     typename = 'int'
 
     def __init__(self, name, value, minval=-1000000, maxval=1000000,
@@ -486,14 +518,6 @@ class Int(Setting):
         self.maxval = maxval
         Setting.__init__(self, name, value, **args)
 
-    def copy(self):
-        """Make a setting which has its values copied from this one.
-
-        This needs to be overridden if the constructor changes
-        """
-        return self._copyHelper((), (), {'minval': self.minval,
-                                         'maxval': self.maxval})
-
     def convertTo(self, val):
         if isinstance(val, int):
             if val >= self.minval and val <= self.maxval:
@@ -531,6 +555,8 @@ def _finiteRangeFloat(f, minval=-1e300, maxval=1e300):
 class Float(Setting):
     """Float settings."""
 
+    __slots__ = ('minval', 'maxval')
+
     typename = 'float'
 
     def __init__(self, name, value, minval=-1e200, maxval=1e200,
@@ -545,14 +571,6 @@ class Float(Setting):
         self.maxval = maxval
         Setting.__init__(self, name, value, **args)
 
-    def copy(self):
-        """Make a setting which has its values copied from this one.
-
-        This needs to be overridden if the constructor changes
-        """
-        return self._copyHelper((), (), {'minval': self.minval,
-                                         'maxval': self.maxval})
-
     def convertTo(self, val):
         if isinstance(val, int) or isinstance(val, float):
             return _finiteRangeFloat(val,
@@ -576,6 +594,8 @@ class Float(Setting):
 class FloatOrAuto(Float):
     """Save a float or text auto."""
 
+    __slots__ = ()
+
     typename = 'float-or-auto'
 
     def convertTo(self, val):
@@ -611,6 +631,8 @@ class FloatOrAuto(Float):
 class IntOrAuto(Setting):
     """Save an int or text auto."""
 
+    __slots__ = ()
+
     typename = 'int-or-auto'
 
     def convertTo(self, val):
@@ -707,6 +729,8 @@ $'''
 class Distance(Setting):
     """A veusz distance measure, e.g. 1pt or 3%."""
 
+    __slots__ = ()
+
     typename = 'distance'
 
     # match a distance
@@ -788,12 +812,23 @@ class Distance(Setting):
         painter: painter to get metrics to convert physical sizes
         '''
 
+        # painters may keep distances converted while painting
+        cache = getattr(painter, 'distcache', None)
+        if cache is not None:
+            try:
+                return cache[dist]
+            except KeyError:
+                pass
+
         # match distance against expression
         m = kls.distre.match(dist)
         if m is not None:
             # lookup function to call to do conversion
             func = kls.unit_func[m.group(2)]
-            return func(m, painter)
+            val = func(m, painter)
+            if cache is not None:
+                cache[dist] = val
+            return val
 
         # none of the regexps match
         raise ValueError( "Cannot convert distance in form '%s'" %
@@ -825,12 +860,16 @@ class Distance(Setting):
 class DistancePt(Distance):
     """For a distance in points."""
 
+    __slots__ = ()
+
     def makeControl(self, *args):
         return controls.DistancePt(self, *args)
 
 class DistancePhysical(Distance):
     """For physical distances (no fractional)."""
 
+    __slots__ = ()
+
     def isDist(self, val):
         m = self.distre.match(val)
         if m:
@@ -845,6 +884,8 @@ class DistancePhysical(Distance):
 class DistanceOrAuto(Distance):
     """A distance or the value Auto"""
 
+    __slots__ = ()
+
     typename = 'distance-or-auto'
 
     distre = re.compile( distre_expr + r'|^Auto$', re.VERBOSE )
@@ -858,6 +899,8 @@ class DistanceOrAuto(Distance):
 class Choice(Setting):
     """One out of a list of strings."""
 
+    __slots__ = ('vallist', 'descriptions')
+
     # maybe should be implemented as a dict to speed up checks
 
     typename = 'choice'
@@ -877,10 +920,6 @@ class Choice(Setting):
 
         Setting.__init__(self, name, val, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((self.vallist,), (), {})
-
     def convertTo(self, val):
         if val in self.vallist:
             return val
@@ -903,6 +942,8 @@ class Choice(Setting):
 class ChoiceOrMore(Setting):
     """One out of a list of strings, or anything else."""
 
+    __slots__ = ('vallist', 'descriptions')
+
     # maybe should be implemented as a dict to speed up checks
 
     typename = 'choice-or-more'
@@ -920,10 +961,6 @@ class ChoiceOrMore(Setting):
 
         Setting.__init__(self, name, val, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((self.vallist,), (), {})
-
     def convertTo(self, val):
         return val
 
@@ -940,6 +977,8 @@ class ChoiceOrMore(Setting):
 class FloatChoice(ChoiceOrMore):
     """A numeric value, which can also be chosen from the list of values."""
 
+    __slots__ = ()
+
     typename = 'float-choice'
 
     def convertTo(self, val):
@@ -966,6 +1005,8 @@ class FloatChoice(ChoiceOrMore):
 class FloatDict(Setting):
     """A dictionary, taking floats as values."""
 
+    __slots__ = ()
+
     typename = 'float-dict'
 
     def convertTo(self, val):
@@ -1014,6 +1055,8 @@ class FloatDict(Setting):
 class FloatList(Setting):
     """A list of float values."""
 
+    __slots__ = ()
+
     typename = 'float-list'
 
     def convertTo(self, val):
@@ -1061,6 +1104,8 @@ class FloatList(Setting):
 class WidgetPath(Str):
     """A setting holding a path to a widget. This is checked for validity."""
 
+    __slots__ = ('relativetoparent', 'allowedwidgets')
+
     typename = 'widget-path'
 
     def __init__(self, name, val, relativetoparent=True,
@@ -1079,12 +1124,6 @@ class WidgetPath(Str):
         self.relativetoparent = relativetoparent
         self.allowedwidgets = allowedwidgets
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (),
-                                {'relativetoparent': self.relativetoparent,
-                                 'allowedwidgets': self.allowedwidgets})
-
     def getReferredWidget(self, val = None):
         """Get the widget referred to. We double-check here to make sure
         it's the one.
@@ -1130,6 +1169,8 @@ class WidgetPath(Str):
 class Dataset(Str):
     """A setting to choose from the possible datasets."""
 
+    __slots__ = ('dimensions', 'datatype')
+
     typename = 'dataset'
 
     def __init__(self, name, val, dimensions=1, datatype='numeric',
@@ -1142,12 +1183,6 @@ class Dataset(Str):
         self.datatype = datatype
         Setting.__init__(self, name, val, **args)
 
-    def copy(self):
-        """Make a setting which has its values copied from this one."""
-        return self._copyHelper((), (),
-                                {'dimensions': self.dimensions,
-                                 'datatype': self.datatype})
-
     def makeControl(self, *args):
         """Allow user to choose between the datasets."""
         return controls.Dataset(self, self.getDocument(), self.dimensions,
@@ -1164,6 +1199,8 @@ class Dataset(Str):
 class Strings(Setting):
     """A multiple set of strings."""
 
+    __slots__ = ()
+
     typename = 'str-multi'
 
     def convertTo(self, val):
@@ -1191,6 +1228,8 @@ class Strings(Setting):
 class Datasets(Setting):
     """A setting to choose one or more of the possible datasets."""
 
+    __slots__ = ('dimensions', 'datatype')
+
     typename = 'dataset-multi'
 
     def __init__(self, name, val, dimensions=1, datatype='numeric',
@@ -1221,12 +1260,6 @@ class Datasets(Setting):
 
         return tuple(val)
 
-    def copy(self):
-        """Make a setting which has its values copied from this one."""
-        return self._copyHelper((), (),
-                                {'dimensions': self.dimensions,
-                                 'datatype': self.datatype})
-
     def makeControl(self, *args):
         """Allow user to choose between the datasets."""
         return controls.Datasets(self, self.getDocument(), self.dimensions,
@@ -1247,6 +1280,8 @@ class DatasetExtended(Dataset):
     """Choose a dataset, give an expression or specify a list of float
     values."""
 
+    __slots__ = ()
+
     typename = 'dataset-extended'
 
     def convertTo(self, val):
@@ -1338,6 +1373,8 @@ class DatasetOrStr(Dataset):
     Non string datasets are converted to string arrays using this.
     """
 
+    __slots__ = ()
+
     typename = 'dataset-or-str'
 
     def __init__(self, name, val, **args):
@@ -1360,13 +1397,11 @@ class DatasetOrStr(Dataset):
     def makeControl(self, *args):
         return controls.DatasetOrString(self, self.getDocument(), *args)
 
-    def copy(self):
-        """Make a setting which has its values copied from this one."""
-        return self._copyHelper((), (), {})
-
 class Color(ChoiceOrMore):
     """A color setting."""
 
+    __slots__ = ()
+
     typename = 'color'
 
     _colors = [ 'white', 'black', 'red', 'green', 'blue',
@@ -1383,10 +1418,6 @@ class Color(ChoiceOrMore):
         ChoiceOrMore.__init__(self, name, self._colors, value,
                               **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def color(self):
         """Return QColor for color."""
         return qt4.QColor(self.val)
@@ -1397,6 +1428,8 @@ class Color(ChoiceOrMore):
 class FillStyle(Choice):
     """A setting for the different fill styles provided by Qt."""
 
+    __slots__ = ()
+
     typename = 'fill-style'
 
     _fillstyles = [ 'solid', 'horizontal', 'vertical', 'cross',
@@ -1426,10 +1459,6 @@ class FillStyle(Choice):
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, self._fillstyles, value, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def qtStyle(self):
         """Return Qt ID of fill."""
         return self._fillcnvt[self.val]
@@ -1440,6 +1469,8 @@ class FillStyle(Choice):
 class LineStyle(Choice):
     """A setting choosing a particular line style."""
 
+    __slots__ = ()
+
     typename = 'line-style'
 
     # list of allowed line styles
@@ -1478,10 +1509,6 @@ class LineStyle(Choice):
     def __init__(self, name, default, **args):
         Choice.__init__(self, name, self._linestyles, default, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def qtStyle(self):
         """Get Qt ID of chosen line style."""
         return self._linecnvt[self.val]
@@ -1495,6 +1522,8 @@ class Axis(Str):
     direction is 'horizontal', 'vertical' or 'both'
     """
 
+    __slots__ = ('direction',)
+
     typename = 'axis'
 
     def __init__(self, name, val, direction, **args):
@@ -1507,10 +1536,6 @@ class Axis(Str):
         Setting.__init__(self, name, val, **args)
         self.direction = direction
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (self.direction,), {})
-
     def makeControl(self, *args):
         """Allows user to choose an axis or enter a name."""
         return controls.Axis(self, self.getDocument(), self.direction, *args)
@@ -1518,6 +1543,8 @@ class Axis(Str):
 class WidgetChoice(Str):
     """Hold the name of a child widget."""
 
+    __slots__ = ('widgettypes',)
+
     typename = 'widget-choice'
 
     def __init__(self, name, val, widgettypes={}, **args):
@@ -1525,11 +1552,6 @@ class WidgetChoice(Str):
         Setting.__init__(self, name, val, **args)
         self.widgettypes = widgettypes
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (),
-                                {'widgettypes': self.widgettypes})
-
     def buildWidgetList(self, level, widget, outdict):
         """A recursive helper to build up a list of possible widgets.
 
@@ -1590,30 +1612,26 @@ class WidgetChoice(Str):
 class Marker(Choice):
     """Choose a marker type from one allowable."""
 
+    __slots__ = ()
+
     typename = 'marker'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, utils.MarkerCodes, value, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def makeControl(self, *args):
         return controls.Marker(self, *args)
 
 class Arrow(Choice):
     """Choose an arrow type from one allowable."""
 
+    __slots__ = ()
+
     typename = 'arrow'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, utils.ArrowCodes, value, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def makeControl(self, *args):
         return controls.Arrow(self, *args)
 
@@ -1621,6 +1639,8 @@ class LineSet(Setting):
     """A setting which corresponds to a set of lines.
     """
 
+    __slots__ = ()
+
     typename='line-multi'
 
     def convertTo(self, val):
@@ -1683,6 +1703,8 @@ class FillSet(Setting):
     This setting keeps an internal array of LineSettings.
     """
 
+    __slots__ = ()
+
     typename = 'fill-multi'
 
     def convertTo(self, val):
@@ -1747,6 +1769,8 @@ class FillSet(Setting):
 class Filename(Str):
     """Represents a filename setting."""
 
+    __slots__ = ()
+
     typename = 'filename'
 
     def makeControl(self, *args):
@@ -1760,6 +1784,8 @@ class Filename(Str):
 class ImageFilename(Filename):
     """Represents an image filename setting."""
 
+    __slots__ = ()
+
     typename = 'filename-image'
 
     def makeControl(self, *args):
@@ -1768,6 +1794,8 @@ class ImageFilename(Filename):
 class FontFamily(Str):
     """Represents a font family."""
 
+    __slots__ = ()
+
     typename = 'font-family'
 
     def makeControl(self, *args):
@@ -1779,6 +1807,8 @@ class ErrorStyle(Choice):
     The allowed values are below in _errorstyles.
     """
 
+    __slots__ = ()
+
     typename = 'errorbar-style'
 
     _errorstyles = (
@@ -1796,63 +1826,57 @@ class ErrorStyle(Choice):
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, self._errorstyles, value, **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def makeControl(self, *args):
         return controls.ErrorStyle(self, *args)
 
 class AlignHorz(Choice):
     """Alignment horizontally."""
 
+    __slots__ = ()
+
     typename = 'align-horz'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, ['left', 'centre', 'right'], value, **args)
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
 
 class AlignVert(Choice):
     """Alignment vertically."""
 
+    __slots__ = ()
+
     typename = 'align-vert'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, ['top', 'centre', 'bottom'], value, **args)
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
 
 class AlignHorzWManual(Choice):
     """Alignment horizontally."""
 
+    __slots__ = ()
+
     typename = 'align-horz-+manual'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, ['left', 'centre', 'right', 'manual'],
                         value, **args)
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
 
 class AlignVertWManual(Choice):
     """Alignment vertically."""
 
+    __slots__ = ()
+
     typename = 'align-vert-+manual'
 
     def __init__(self, name, value, **args):
         Choice.__init__(self, name, ['top', 'centre', 'bottom', 'manual'],
                         value, **args)
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
 
 # Bool which shows/hides other settings
 class BoolSwitch(Bool):
     """Bool switching setting."""
 
+    __slots__ = ('strue', 'sfalse')
+
     def __init__(self, name, value, settingsfalse=[], settingstrue=[],
                  **args):
         """Enables/disables a set of settings if True or False
@@ -1867,13 +1891,11 @@ class BoolSwitch(Bool):
     def makeControl(self, *args):
         return controls.BoolSwitch(self, *args)
 
-    def copy(self):
-        return self._copyHelper((), (), {'settingsfalse': self.sfalse,
-                                         'settingstrue': self.strue})
-
 class ChoiceSwitch(Choice):
     """Show or hide other settings based on the choice given here."""
 
+    __slots__ = ('strue', 'sfalse', 'showfn')
+
     def __init__(self, name, vallist, value, settingstrue=[], settingsfalse=[],
                  showfn=lambda val: True, **args):
         """Enables/disables a set of settings if True or False
@@ -1888,15 +1910,11 @@ class ChoiceSwitch(Choice):
     def makeControl(self, *args):
         return controls.ChoiceSwitch(self, False, self.vallist, *args)
 
-    def copy(self):
-        return self._copyHelper((self.vallist,), (),
-                                {'settingsfalse': self.sfalse,
-                                 'settingstrue': self.strue,
-                                 'showfn': self.showfn})
-
 class FillStyleExtended(ChoiceSwitch):
     """A setting for the different fill styles provided by Qt."""
 
+    __slots__ = ()
+
     typename = 'fill-style-ext'
 
     _strue = ( 'linewidth', 'linestyle', 'patternspacing',
@@ -1913,16 +1931,14 @@ class FillStyleExtended(ChoiceSwitch):
                               showfn=self._ishatch,
                               **args)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
     def makeControl(self, *args):
         return controls.FillStyleExtended(self, *args)
 
 class RotateInterval(Choice):
     '''Rotate a label with intervals given.'''
 
+    __slots__ = ()
+
     def __init__(self, name, val, **args):
         Choice.__init__(self, name,
                         ('-180', '-135', '-90', '-45',
@@ -1940,22 +1956,22 @@ class RotateInterval(Choice):
             val = '90'
         return Choice.convertTo(self, val)
 
-    def copy(self):
-        """Make a copy of the setting."""
-        return self._copyHelper((), (), {})
-
 class Colormap(Str):
     """A setting to set the color map used in an image.
     This is based on a Str rather than Choice as the list might
     change later.
     """
 
+    __slots__ = ()
+
     def makeControl(self, *args):
         return controls.Colormap(self, self.getDocument(), *args)
 
 class AxisBound(FloatOrAuto):
     """Axis bound - either numeric, Auto or date."""
 
+    __slots__ = ()
+
     typename = 'axis-bound'
 
     def makeControl(self, *args):
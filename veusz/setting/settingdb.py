@@ -77,6 +77,9 @@ defaultValues = {
 
     # add these directories to the python path (colon-separated)
     'external_pythonpath': '',
+
+    # maximum memory (in MB) used by old data kept in the undo history
+    'undo_maxmemory': 512,
     }
 
 class _SettingDB(object):
@@ -20,7 +20,7 @@
 
 from __future__ import division
 from ..compat import citems
-from .reference import Reference, ReferenceMultiple
+from .reference import Reference, ReferenceMultiple, treeChanged
 
 class Settings(object):
     """A class for holding collections of settings."""
@@ -106,7 +106,8 @@ class Settings(object):
         else:
             self.setnames.insert(posn, name)
         setting.parent = self
-        
+        treeChanged()
+
         if pixmap:
             setting.pixmap = pixmap
 
@@ -118,6 +119,7 @@ class Settings(object):
 
         del self.setnames[ self.setnames.index( name ) ]
         del self.setdict[ name ]
+        treeChanged()
         
     def __setattr__(self, name, val):
         """Allow us to do
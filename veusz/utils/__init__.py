@@ -21,7 +21,7 @@
 from .version import version
 from .textrender import Renderer, FontMetrics
 from .safe_eval import compileChecked, SafeEvalException
-from .fitlm import fitLM
+from .fitlm import fitLM, FitCancelled
 
 from .utilfuncs import *
 from .points import *
@@ -31,6 +31,7 @@ from .dates import *
 from .formatting import *
 from .colormap import *
 from .extbrushfilling import *
+from .decimate import *
 
 try:
     from ..helpers.qtloops import addNumpyToPolygonF, plotPathsToPainter, \
@@ -294,3 +294,93 @@ def dateREMatchToDate(match):
 
     # return to veusz float time
     return datetimeToFloat(d)
+
+def _daysFromCivil(year, month, day):
+    """Number of days since 1970-01-01 for (arrays of) dates in the
+    proleptic Gregorian calendar."""
+    year = year - (month <= 2)
+    era = year // 400
+    yoe = year - era*400
+    doy = (153*(month + N.where(month > 2, -3, 9)) + 2)//5 + day - 1
+    doe = yoe*365 + yoe//4 - yoe//100 + doy
+    return era*146097 + doe - 719468
+
+def dateStringsToFloats(regex, strings):
+    """Convert a sequence of date strings to an array of float dates,
+    using a regular expression from dateStrToRegularExpression.
+
+    This gives the same values as dateREMatchToDate on each string,
+    but is much faster for many values. Raises ValueError if any
+    string cannot be converted.
+    """
+
+    num = len(strings)
+    groups = [g for g in ('YYYY', 'YY', 'MM', 'DD', 'hh', 'mm', 'ss')
+              if g in regex.groupindex]
+    if not groups:
+        raise ValueError("no groups in expression")
+
+    # get text values for each group
+    matches = [regex.match(s) for s in strings]
+    if None in matches:
+        raise ValueError("string does not match")
+    vals = [m.group(*groups) for m in matches]
+    if len(groups) == 1:
+        vals = [(v,) for v in vals]
+    if (None,)*len(groups) in vals:
+        raise ValueError("no groups matched")
+    cols = dict(zip(groups, zip(*vals))) if vals else {}
+
+    def intcol(group, default):
+        if group not in cols:
+            return N.full(num, default, dtype=N.int64)
+        col = cols[group]
+        if None in col:
+            col = [default if v is None else v for v in col]
+        return N.array(list(map(int, col)), dtype=N.int64)
+
+    year = intcol('YYYY', offsetdate.year)
+    if 'YY' in cols:
+        year2 = intcol('YY', -1)
+        year = N.where(year2 < 0, year,
+                       N.where(year2 >= 70, 1900, 2000) + year2)
+    month = intcol('MM', offsetdate.month)
+    day = intcol('DD', offsetdate.day)
+    hour = intcol('hh', offsetdate.hour)
+    minute = intcol('mm', offsetdate.minute)
+    if 'ss' in cols:
+        col = cols['ss']
+        if None in col:
+            col = ['nan' if v is None else v for v in col]
+        secf = N.array(list(map(float, col)))
+        sec = N.floor(secf)
+        microsec = N.where(N.isfinite(secf), N.trunc(1e6*(secf-sec)), 0.)
+        isdef = N.isnan(secf)
+        sec = N.where(isdef, offsetdate.second, sec).astype(N.int64)
+        microsec = N.where(isdef, offsetdate.microsecond,
+                           microsec).astype(N.int64)
+    else:
+        sec = N.full(num, offsetdate.second, dtype=N.int64)
+        microsec = N.full(num, offsetdate.microsecond, dtype=N.int64)
+
+    # check values are valid (like datetime)
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    mdays = N.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+    if ( N.any((year < 1) | (year > 9999)) or
+         N.any((month < 1) | (month > 12)) or
+         N.any((day < 1) |
+               (day > mdays[N.clip(month, 0, 12)] + (leap & (month == 2)))) or
+         N.any(hour > 23) or N.any(minute > 59) or N.any(sec > 59) or
+         N.any(microsec > 999999) ):
+        raise ValueError("invalid date")
+
+    # total microseconds from offset date
+    offsetdays = _daysFromCivil(
+        offsetdate.year, offsetdate.month, offsetdate.day)
+    total = ( ((_daysFromCivil(year, month, day) - offsetdays)*86400 +
+               hour*3600 + minute*60 + sec)*1000000 + microsec )
+
+    # split up as a timedelta would, to get identical rounding
+    days = total // 86400000000
+    rem = total - days*86400000000
+    return days*86400 + ((rem // 1000000) + (rem % 1000000)*1e-6)
@@ -0,0 +1,109 @@
+#    Copyright (C) 2014 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Reduce the number of points to plot, without changing the output
+significantly.
+
+Coordinates given to these functions are plotter coordinates, where
+one unit is one pixel on the output device.
+"""
+
+from __future__ import division
+import numpy as N
+
+# do not bother decimating fewer points than this
+decimate_min_points = 256
+
+def _runsDecimate(cols, yvals):
+    """Return indices of points to keep for runs of consecutive
+    points in the same column.
+
+    For each run, the first, last, minimum and maximum points are
+    kept, in their original order."""
+
+    num = len(cols)
+    change = cols[1:] != cols[:-1]
+    starts = N.concatenate( ([0], N.nonzero(change)[0]+1) )
+    if len(starts)*4 >= num:
+        # no significant reduction possible
+        return None
+
+    ends = N.concatenate( (starts[1:], [num]) ) - 1
+
+    # sort by run number, then by y value in run
+    runnum = N.concatenate( ([0], N.cumsum(change)) )
+    order = N.lexsort( (yvals, runnum) )
+    minidx = order[starts]
+    maxidx = order[ends]
+
+    return N.unique( N.concatenate((starts, ends, minidx, maxidx)) )
+
+def decimateLine(xpts, ypts, width=1.):
+    """Decimate the points of a polyline.
+
+    Consecutive points which fall in the same column (or row) of
+    the given width are replaced by the first, last, minimum and
+    maximum points, so that the line drawn covers the same pixels.
+
+    Returns new (xpts, ypts) arrays.
+    """
+
+    if len(xpts) < decimate_min_points or len(xpts) != len(ypts):
+        return xpts, ypts
+    if not ( N.all(N.isfinite(xpts)) and N.all(N.isfinite(ypts)) ):
+        return xpts, ypts
+
+    # reduce points in columns, then rows
+    for a, b in ((xpts, ypts), (ypts, xpts)):
+        cols = N.floor(a*(1./width)).astype(N.int64)
+        keep = _runsDecimate(cols, b)
+        if keep is not None:
+            xpts, ypts = xpts[keep], ypts[keep]
+
+    return xpts, ypts
+
+def decimateMarkerIndices(xpts, ypts, cellsize=1.):
+    """Decimate the positions of markers to plot.
+
+    The plot is divided into a grid of cells of the size given. Only
+    the last marker plotted in each cell (which is the one on top) is
+    kept.
+
+    Returns an array of indices of the markers to keep, or None if
+    all markers should be plotted.
+    """
+
+    num = len(xpts)
+    if num < decimate_min_points or num != len(ypts):
+        return None
+    if not ( N.all(N.isfinite(xpts)) and N.all(N.isfinite(ypts)) ):
+        return None
+
+    cx = N.floor(xpts*(1./cellsize)).astype(N.int64)
+    cy = N.floor(ypts*(1./cellsize)).astype(N.int64)
+
+    # sort by cell, then by order plotted
+    order = N.lexsort( (N.arange(num), cy, cx) )
+    cx, cy = cx[order], cy[order]
+    last = N.nonzero( (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1]) )[0]
+    last = N.concatenate( (last, [num-1]) )
+    if len(last)*2 >= num:
+        # not worth reducing
+        return None
+
+    return N.sort(order[last])
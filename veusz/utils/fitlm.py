@@ -31,9 +31,67 @@ except:
 
 from ..compat import crange
 
+# maximum number of values to evaluate in one batched function call
+fit_batch_max_values = 4*1024*1024
+
+class FitCancelled(Exception):
+    """Raised by the function or progress callback to stop a fit."""
+
+def _batchDerivs(batchfunc, params, xvals, yvals, inve2, oldfunc,
+                 deltaderiv, derivs, pool):
+    """Evaluate the function for each parameter changed by deltaderiv
+    using batched calls, filling derivs with the change in function.
+
+    The x values are split into chunks, which are evaluated in the
+    thread pool, if given.
+
+    Returns an array of chi2 for each changed parameter, or None if
+    the function cannot be evaluated in batches.
+    """
+
+    numparams = len(params)
+    if N.shape(oldfunc) != xvals.shape:
+        return None
+
+    # the first row are the unchanged parameters, used to check
+    # the batched evaluation gives the same values as normal
+    paramsets = N.repeat(params[N.newaxis, :], numparams+1, axis=0)
+    paramsets[1:] += N.identity(numparams) * deltaderiv
+
+    chunk = max(fit_batch_max_values // (numparams+1), 1)
+    ranges = [ (i, min(i+chunk, len(xvals)))
+               for i in crange(0, len(xvals), chunk) ]
+
+    def evalchunk(r):
+        """Evaluate chunk, returning chi2 contributions or None."""
+        s = slice(r[0], r[1])
+        vals = batchfunc(paramsets, xvals[s])
+        if ( not isinstance(vals, N.ndarray) or
+             vals.shape != (numparams+1, r[1]-r[0]) ):
+            return None
+        old = oldfunc[s]
+        finite = N.isfinite(old)
+        if not ( N.all(N.isfinite(vals[0]) == finite) and
+                 N.allclose(vals[0][finite], old[finite],
+                            rtol=1e-10, atol=0) ):
+            return None
+        derivs[:, s] = vals[1:] - old
+        return ((vals[1:] - yvals[s])**2 * inve2[s]).sum(axis=1)
+
+    if pool is not None and len(ranges) > 1:
+        chi2s = pool.map(evalchunk, ranges)
+    else:
+        chi2s = [evalchunk(r) for r in ranges]
+
+    if any([c is None for c in chi2s]):
+        return None
+    return N.sum(chi2s, axis=0)
+
 def fitLM(func, params, xvals, yvals, errors,
           stopdeltalambda = 1e-5,
-          deltaderiv = 1e-5, maxiters = 20, Lambda = 1e-4):
+          deltaderiv = 1e-5, maxiters = 20, Lambda = 1e-4,
+          batchfunc = None, threads = 1, progress = None,
+          outstream = None, errstream = None):
 
     """
     Use Marquardt method as described in Bevington & Robinson to fit data
@@ -53,8 +111,23 @@ def fitLM(func, params, xvals, yvals, errors,
     deltaderiv: change to make in parameters to calculate derivative
     maxiters: maximum number of better fitting solutions before stopping
     Lambda: starting lambda value (as described in Bevington)
+
+    batchfunc: optional function taking a 2D array of parameter sets
+     (one set per row) and x values, returning a 2D array of function
+     values for each set. This is used to calculate the derivatives in
+     one call. If it returns None, or values which do not match func,
+     func is called for each parameter instead.
+    threads: number of threads to evaluate batchfunc in
+    progress: optional function called with the number of iterations,
+     chi2 and parameters after each iteration
+    outstream, errstream: streams for output and warnings (default
+     sys.stdout and sys.stderr)
+
+    func, batchfunc or progress may raise FitCancelled to stop the fit.
     """
 
+    errstream = errstream or sys.stderr
+
     # only use finite values for fitting
     finite = N.logical_and(
         N.logical_and( N.isfinite(xvals), N.isfinite(yvals)),
@@ -72,82 +145,100 @@ def fitLM(func, params, xvals, yvals, errors,
 
     # initialise temporary space
     beta = N.zeros( len(params), dtype='float64' )
-    alpha = N.zeros( (len(params), len(params)), dtype='float64' )
     derivs = N.zeros( (len(params), len(xvals)), dtype='float64' )
 
-    done = False
-    iters = 0
-    while iters < maxiters and not done:
-        # iterate over each of the parameters and calculate the derivatives
-        # of chi2 to populate the beta vector
-
-        # also calculate the derivative of the function at each of the points
-        # wrt the parameters
-
-        for i in crange( len(params) ):
-            params[i] += deltaderiv
-            new_func = func(params, xvals)
-            chi2_new = ((new_func - yvals)**2 * inve2).sum()
-            params[i] -= deltaderiv
-
-            beta[i] = chi2_new - chi2
-            derivs[i] = new_func - oldfunc
-
-        # beta is now dchi2 / dparam
-        beta *= (-0.5 / deltaderiv)
-        derivs *= (1. / deltaderiv)
-
-        # calculate alpha matrix
-        # FIXME: stupid - must be a better way to avoid this iteration
-        for j in crange( len(params) ):
-            for k in crange(j+1):
-                v = (derivs[j]*derivs[k] * inve2).sum()
-                alpha[j][k] = v
-                alpha[k][j] = v
-
-        # twiddle alpha using lambda
-        alpha *= 1. + N.identity(len(params), dtype='float64')*Lambda
-
-        # now work out deltas on parameters to get better fit
-        epsilon = NLA.inv( alpha )
-        deltas = N.dot(beta, epsilon)
-
-        # new solution
-        new_params = params+deltas
-        new_func = func(new_params, xvals)
-        new_chi2 = ( (new_func - yvals)**2 * inve2 ).sum()
-
-        if N.isnan(new_chi2):
-            sys.stderr.write('Chi2 is NaN. Aborting fit.\n')
-            break
-
-        if new_chi2 > chi2:
-            # if solution is worse, increase lambda
-            Lambda *= 10.
-        else:
-            # better fit, so we accept this solution
-
-            # if the change is small
-            done = chi2 - new_chi2 < stopdeltalambda
-
-            chi2 = new_chi2
-            params = new_params
-            oldfunc = new_func
-            Lambda *= 0.1
-
-            # format new parameters
-            iters += 1
-            p = [iters, chi2] + params.tolist()
-            str = ("%5i " + "%8g " * (len(params)+1)) % tuple(p)
-            print(str)
+    pool = None
+    if batchfunc is not None and threads > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(threads)
+
+    try:
+        done = False
+        iters = 0
+        while iters < maxiters and not done:
+            # calculate the derivatives of chi2 wrt the parameters to
+            # populate the beta vector, and the derivative of the
+            # function at each of the points wrt the parameters
+
+            newchi2s = None
+            if batchfunc is not None:
+                newchi2s = _batchDerivs(
+                    batchfunc, params, xvals, yvals, inve2, oldfunc,
+                    deltaderiv, derivs, pool)
+                if newchi2s is None:
+                    # do not try again
+                    batchfunc = None
+
+            if newchi2s is not None:
+                beta[:] = newchi2s - chi2
+            else:
+                # call function for each parameter
+                for i in crange( len(params) ):
+                    params[i] += deltaderiv
+                    new_func = func(params, xvals)
+                    chi2_new = ((new_func - yvals)**2 * inve2).sum()
+                    params[i] -= deltaderiv
+
+                    beta[i] = chi2_new - chi2
+                    derivs[i] = new_func - oldfunc
+
+            # beta is now dchi2 / dparam
+            beta *= (-0.5 / deltaderiv)
+            derivs *= (1. / deltaderiv)
+
+            # calculate alpha matrix
+            alpha = N.dot(derivs*inve2, derivs.T)
+
+            # twiddle alpha using lambda
+            alpha *= 1. + N.identity(len(params), dtype='float64')*Lambda
+
+            # now work out deltas on parameters to get better fit
+            epsilon = NLA.inv( alpha )
+            deltas = N.dot(beta, epsilon)
+
+            # new solution
+            new_params = params+deltas
+            new_func = func(new_params, xvals)
+            new_chi2 = ( (new_func - yvals)**2 * inve2 ).sum()
+
+            if N.isnan(new_chi2):
+                errstream.write('Chi2 is NaN. Aborting fit.\n')
+                break
+
+            if new_chi2 > chi2:
+                # if solution is worse, increase lambda
+                Lambda *= 10.
+            else:
+                # better fit, so we accept this solution
+
+                # if the change is small
+                done = chi2 - new_chi2 < stopdeltalambda
+
+                chi2 = new_chi2
+                params = new_params
+                oldfunc = new_func
+                Lambda *= 0.1
+
+                # format new parameters
+                iters += 1
+                p = [iters, chi2] + params.tolist()
+                str = ("%5i " + "%8g " * (len(params)+1)) % tuple(p)
+                print(str, file=outstream)
+
+            if progress is not None:
+                progress(iters, chi2, params)
+
+    finally:
+        if pool is not None:
+            pool.close()
 
     if not done:
-        sys.stderr.write("Warning: maximum number of iterations reached\n")
+        errstream.write("Warning: maximum number of iterations reached\n")
 
     # print out fit statistics at end
     dof = len(yvals) - len(params)
     redchi2 = chi2 / dof
-    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (chi2, dof, redchi2))
+    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (chi2, dof, redchi2),
+          file=outstream)
 
     return (params, chi2, dof)
-
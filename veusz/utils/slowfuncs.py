@@ -329,18 +329,89 @@ class RotatedRectangle:
         return poly
 
 class RectangleOverlapTester:
-    """Keep track of whether RotatedRectangles overlap."""
+    """Keep track of whether RotatedRectangles overlap.
+
+    Rectangles are indexed in a uniform grid of cells, so that only
+    nearby rectangles need to be checked for overlaps.
+    """
+
+    # maximum number of grid cells a rectangle can be added to
+    maxcells = 1024
+
     def __init__(self):
         self._rects = []
+        self._cellsize = None
+        self._grid = {}
+        self._large = []
+
+    def _cellRange(self, bbox):
+        """Return (x1, y1, x2, y2) range of cells for bounding box.
+
+        Returns None if bounding box covers too many cells."""
+        cs = self._cellsize
+        try:
+            x1 = int(math.floor(bbox.left() / cs))
+            y1 = int(math.floor(bbox.top() / cs))
+            x2 = int(math.floor(bbox.right() / cs))
+            y2 = int(math.floor(bbox.bottom() / cs))
+        except (ValueError, OverflowError):
+            return None
+        if (x2-x1+1)*(y2-y1+1) > self.maxcells:
+            return None
+        return x1, y1, x2, y2
+
+    def _overlaps(self, poly, bbox, idx):
+        rpoly, rbbox = self._rects[idx]
+        return ( bbox.intersects(rbbox) and
+                 len(poly.intersected(rpoly)) > 0 )
 
     def willOverlap(self, rect):
         """Will this rectangle overlap with the others?"""
         poly = rect.makePolygon()
-        for r in self._rects:
-            if len( poly.intersected(r.makePolygon()) ) > 0:
+        bbox = poly.boundingRect()
+
+        for idx in self._large:
+            if self._overlaps(poly, bbox, idx):
                 return True
+        if not self._grid:
+            return False
+
+        cellrange = self._cellRange(bbox)
+        if cellrange is None:
+            # too big for grid, so check everything
+            for idx in crange(len(self._rects)):
+                if self._overlaps(poly, bbox, idx):
+                    return True
+            return False
+
+        x1, y1, x2, y2 = cellrange
+        grid = self._grid
+        for cy in crange(y1, y2+1):
+            for cx in crange(x1, x2+1):
+                for idx in grid.get((cx, cy), ()):
+                    if self._overlaps(poly, bbox, idx):
+                        return True
         return False
 
     def addRect(self, rect):
         """Add rectangle to list."""
-        self._rects.append(rect)
+        poly = rect.makePolygon()
+        bbox = poly.boundingRect()
+        idx = len(self._rects)
+        self._rects.append( (poly, bbox) )
+
+        # size cells from first rectangle, as labels have similar sizes
+        if self._cellsize is None:
+            size = max(bbox.width(), bbox.height())
+            self._cellsize = size if size > 1 else 1.
+
+        cellrange = self._cellRange(bbox)
+        if cellrange is None:
+            self._large.append(idx)
+            return
+
+        x1, y1, x2, y2 = cellrange
+        grid = self._grid
+        for cy in crange(y1, y2+1):
+            for cx in crange(x1, x2+1):
+                grid.setdefault((cx, cy), []).append(idx)
@@ -1304,47 +1304,86 @@ class _Renderer:
         self.calcbounds = [xr[0], yr[0], xr[1], yr[1]]
         return self.calcbounds
 
+# maximum number of laid-out text items to keep in the cache
+text_layout_cache_size = 4096
+
+# cache of text layouts: key -> (parttree, width, maxlines, fontinfo)
+_layout_cache = {}
+
+def _layoutKey(painter, font, text):
+    """Key identifying how text is measured on this painter."""
+    device = painter.device()
+    return ( text, font.key(), device.devType(),
+             device.logicalDpiX(), device.logicalDpiY(),
+             getattr(painter, 'scaling', 1.) )
+
+def _getTextLayout(painter, font, text):
+    """Return (parttree, width, maxlines, fontinfo) for text.
+
+    The part tree is parsed and measured once for each text, font and
+    device resolution. fontinfo is (ascent, descent, height of 0, line
+    height). The returned tree has been measured and should only be
+    rendered afterwards, not measured again.
+    """
+
+    key = _layoutKey(painter, font, text)
+    layout = _layout_cache.get(key)
+    if layout is not None:
+        return layout
+
+    parttree = makePartTree(makePartList(text))
+    state = RenderState(font, painter, 0, 0, -1,
+                        actually_render = False)
+    fm = state.fontMetrics()
+    parttree.render(state)
+
+    layout = (
+        parttree, state.x, state.maxlines,
+        (fm.ascent(), fm.descent(), fm.boundingRectChar('0').height(),
+         fm.height()) )
+
+    if len(_layout_cache) >= text_layout_cache_size:
+        _layout_cache.clear()
+    _layout_cache[key] = layout
+    return layout
+
 class _StdRenderer(_Renderer):
     """Standard rendering class."""
 
     def _initText(self, text):
-        # make internal tree
-        partlist = makePartList(text)
-        self.parttree = makePartTree(partlist)
+        self.text = text
+        self.layout = None
+
+    def _getLayout(self):
+        """Get (cached) parsed and measured layout of text."""
+        if self.layout is None:
+            self.layout = _getTextLayout(self.painter, self.font, self.text)
+        return self.layout
 
     def _getWidthHeight(self):
         """Get size of box around text."""
 
-        # work out total width and height
         self.painter.setFont(self.font)
+        totalwidth, maxlines, fontinfo = self._getLayout()[1:]
+        ascent, descent, zeroheight, lineheight = fontinfo
 
         # work out height of box, and
         # make the bounding box a bit bigger if we want to include descents
-
-        state = RenderState(self.font, self.painter, 0, 0,
-                            self.alignhorz,
-                            actually_render = False)
-        fm = state.fontMetrics()
-
         if self.usefullheight:
-            totalheight = fm.ascent()
-            dy = fm.descent()
+            totalheight = ascent
+            dy = descent
         else:
             if self.alignvert == 0:
                 # if want vertical centering, better to centre around middle
                 # of typical letter (i.e. where strike position is)
-                #totalheight = fm.strikeOutPos()*2
-                totalheight = fm.boundingRectChar('0').height()
+                totalheight = zeroheight
             else:
                 # if top/bottom alignment, better to use maximum letter height
-                totalheight = fm.ascent()
+                totalheight = ascent
             dy = 0
 
-        # work out width
-        self.parttree.render(state)
-        totalwidth = state.x
         # add number of lines for height
-        totalheight += fm.height()*(state.maxlines-1)
+        totalheight += lineheight*(maxlines-1)
 
         return totalwidth, totalheight, dy
 
@@ -1368,7 +1407,7 @@ class _StdRenderer(_Renderer):
 
         # actually paint the string
         self.painter.setFont(self.font)
-        self.parttree.render(state)
+        self._getLayout()[0].render(state)
 
         # restore coordinate frame if text was rotated
         if self.angle != 0:
@@ -606,3 +606,68 @@ def unescapeHDFDataName(name):
     name = name.replace('`SL', '/')
     name = name.replace('`BT', '`')
     return name
+
+def nanMinMaxChunks(chunks):
+    """Return minimum and maximum of the values in an iterable of
+    arrays, ignoring NaNs. NaNs are returned if there are no values."""
+    minval = maxval = N.nan
+    for chunk in chunks:
+        chunk = chunk[ N.logical_not(N.isnan(chunk)) ]
+        if len(chunk) > 0:
+            cmin, cmax = chunk.min(), chunk.max()
+            minval = cmin if not (minval <= cmin) else minval
+            maxval = cmax if not (maxval >= cmax) else maxval
+    return minval, maxval
+
+class LRUCache(object):
+    """A dict-like cache holding up to maxsize items.
+
+    When full, the least recently used items are discarded.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        # map key -> [value, last use]
+        self.items = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        """Get item, marking it as recently used."""
+        item = self.items.get(key)
+        if item is None:
+            return default
+        self.counter += 1
+        item[1] = self.counter
+        return item[0]
+
+    def __getitem__(self, key):
+        item = self.items[key]
+        self.counter += 1
+        item[1] = self.counter
+        return item[0]
+
+    def __setitem__(self, key, value):
+        self.counter += 1
+        self.items[key] = [value, self.counter]
+        if len(self.items) > self.maxsize:
+            # discard oldest quarter at once, to avoid sorting often
+            byuse = sorted([(v[1], k) for k, v in citems(self.items)],
+                           key=lambda x: x[0])
+            for use, k in byuse[:max(1, len(byuse)//4)]:
+                del self.items[k]
+
+    def __delitem__(self, key):
+        del self.items[key]
+
+    def pop(self, key, default=None):
+        item = self.items.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self.items.clear()
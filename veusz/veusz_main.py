@@ -25,6 +25,7 @@ import sys
 import os.path
 import signal
 import optparse
+import time
 
 # trick to make sure veusz is on the path, if being run as a script
 try:
@@ -34,7 +35,7 @@ except ImportError:
         os.path.abspath(os.path.join(os.path.dirname(__file__), '..')) )
     import veusz
 
-from veusz.compat import czip, cbytes
+from veusz.compat import czip, cbytes, crange
 from veusz import qtall as qt4
 from veusz import utils
 
@@ -104,6 +105,186 @@ def export(exports, args):
         ci.Load(vsz)
         ci.run('Export(%s)' % repr(expfn))
 
+def _pageRangeParts(text):
+    '''Yield (start, end) page numbers (starting from 1) for each part
+    of a page range, where end is None if the part is open-ended.
+
+    Raises ValueError if invalid.
+    '''
+    if text.strip().lower() == 'all':
+        yield 1, None
+        return
+
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = part.split('-', 1)
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else None
+        else:
+            start = end = int(part)
+        if start < 1 or (end is not None and end < start):
+            raise ValueError('invalid page range %s' % repr(part))
+        yield start, end
+
+def parsePageRange(text, numpages):
+    '''Convert a page range, e.g. "1-3,5,7-", to a list of page indices
+    (starting from 0) in a document with numpages pages.
+
+    None or "all" selects every page. Raises ValueError if invalid, or
+    if a page or the start of a range is beyond the last page.
+    '''
+    if text is None or text.strip().lower() == 'all':
+        return list(crange(numpages))
+
+    pages = []
+    for start, end in _pageRangeParts(text):
+        if start > numpages:
+            raise ValueError('page %i is beyond the last page (%i)' % (
+                start, numpages))
+        if end is None:
+            end = numpages
+        for page in crange(start-1, min(end, numpages)):
+            if page not in pages:
+                pages.append(page)
+    return pages
+
+# application in batch export worker processes (if not forked)
+_batchapp = None
+
+def _batchExportInit(unsafe, plugins):
+    '''Set up a batch export worker process.'''
+    global _batchapp
+    from veusz import setting
+    from veusz import document
+
+    if qt4.QCoreApplication.instance() is None:
+        # a new process (not forked), which needs its own application
+        # and plugins
+        _batchapp = qt4.QApplication([])
+        from veusz import widgets
+        from veusz import dataimport
+        if plugins:
+            document.Document.loadPlugins(pluginlist=plugins)
+
+    setting.transient_settings['unsafe_mode'] = unsafe
+
+def _batchExportDocument(task):
+    '''Export pages of a document in a batch export worker.
+
+    task is (filename, templates, pagerange, part, numparts), where
+    every numparts-th page in the range is exported, starting from part.
+    Returns a list of (filename, outputfilename, seconds, error) for
+    each file written, where error is None if successful.
+    '''
+    from veusz import document
+
+    vsz, templates, pagerange, part, numparts = task
+
+    starttime = time.time()
+    try:
+        doc = document.Document()
+        ci = document.CommandInterpreter(doc)
+        ci.Load(vsz)
+        allpages = parsePageRange(pagerange, doc.getNumberPages())
+    except Exception as e:
+        return [(vsz, None, time.time()-starttime,
+                 '%s: %s' % (e.__class__.__name__, e))]
+
+    name = os.path.splitext(os.path.basename(vsz))[0]
+    results = []
+    for page in allpages[part::numparts]:
+        for template in templates:
+            if '{page}' not in template and len(allpages) > 1:
+                # need a different filename for each page
+                root, ext = os.path.splitext(template)
+                template = root + '-{page}' + ext
+            outfn = template.replace('{name}', name).replace(
+                '{page}', str(page+1))
+
+            starttime = time.time()
+            try:
+                document.Export(doc, outfn, page).export()
+                error = None
+            except Exception as e:
+                error = '%s: %s' % (e.__class__.__name__, e)
+            results.append( (vsz, outfn, time.time()-starttime, error) )
+
+    return results
+
+def batchExport(templates, args, pagerange=None, jobs=None, plugins=None):
+    '''Export pages of a set of documents to output files, using a
+    pool of processes.
+
+    templates: list of output filenames, where {name} is replaced by
+     the document name and {page} by the page number
+    pagerange: range of pages to export (see parsePageRange)
+    jobs: number of processes (default is number of CPUs, but only
+     one with Python 2 outside Windows)
+    plugins: plugins to load in new processes
+
+    Returns True if there were no failures.
+    '''
+    import multiprocessing
+    from veusz import setting
+
+    docs = args[1:]
+    if jobs is None:
+        try:
+            jobs = multiprocessing.cpu_count()
+        except NotImplementedError:
+            jobs = 1
+
+    # worker processes must be new processes, as Qt does not support
+    # painting in a forked copy of the running application
+    if hasattr(multiprocessing, 'get_context'):
+        mpcontext = multiprocessing.get_context('spawn')
+    elif sys.platform == 'win32':
+        mpcontext = multiprocessing
+    else:
+        # processes would be forked in Python 2
+        mpcontext = None
+        jobs = 1
+
+    # if there are fewer documents than processes, split the pages
+    # of each document between several processes
+    numparts = max(1, jobs // max(1, len(docs)))
+    tasks = [ (vsz, templates, pagerange, part, numparts)
+              for vsz in docs for part in crange(numparts) ]
+
+    unsafe = bool(setting.transient_settings['unsafe_mode'])
+    pool = None
+    if jobs > 1 and len(tasks) > 1:
+        pool = mpcontext.Pool(
+            processes=jobs, initializer=_batchExportInit,
+            initargs=(unsafe, plugins))
+        resultiter = pool.imap_unordered(_batchExportDocument, tasks)
+    else:
+        resultiter = (_batchExportDocument(t) for t in tasks)
+
+    starttime = time.time()
+    numfiles = numfailed = 0
+    try:
+        for results in resultiter:
+            for vsz, outfn, secs, error in results:
+                if error is None:
+                    numfiles += 1
+                    sys.stdout.write('%s: wrote %s (%.2fs)\n' % (
+                        vsz, outfn, secs))
+                else:
+                    numfailed += 1
+                    sys.stderr.write('%s: failed to write %s (%.2fs): %s\n' % (
+                        vsz, outfn if outfn else 'document', secs, error))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    sys.stdout.write('Exported %i files in %.2fs using %i processes, '
+                     '%i failures\n' % (
+                         numfiles, time.time()-starttime, jobs, numfailed))
+    return numfailed == 0
+
 def convertArgsUnicode(args):
     '''Convert set of arguments to unicode.
     Arguments in argv use current file system encoding
@@ -156,6 +337,18 @@ class VeuszApp(qt4.QApplication):
         parser.add_option('--export', action='append', metavar='FILE',
                           help='export the next document to this'
                           ' output image file, exiting when finished')
+        parser.add_option('--batch-export', action='append', metavar='FILE',
+                          help='export pages of every document to files'
+                          ' named FILE, where {name} is replaced by the'
+                          ' document name and {page} by the page number'
+                          ' (may be given several times for different'
+                          ' formats), exiting when finished')
+        parser.add_option('--export-pages', metavar='RANGE',
+                          help='pages to write in batch export, e.g. 1-3,5'
+                          ' (default all)')
+        parser.add_option('--export-jobs', type='int', metavar='N',
+                          help='number of processes to use for batch'
+                          ' export (default number of CPUs)')
         parser.add_option('--embed-remote', action='store_true',
                           help=optparse.SUPPRESS_HELP)
         parser.add_option('--plugin', action='append', metavar='FILE',
@@ -171,6 +364,24 @@ class VeuszApp(qt4.QApplication):
                 'export option needs same number of documents and '
                 'output files')
 
+        # batch export
+        if options.batch_export:
+            if options.export:
+                parser.error('cannot use export and batch-export together')
+            if len(args) < 2:
+                parser.error('batch-export option needs documents to export')
+            if len(args) > 2 and any(
+                '{name}' not in t for t in options.batch_export):
+                parser.error('batch-export filename needs {name} when'
+                             ' exporting several documents')
+            try:
+                if options.export_pages is not None:
+                    list(_pageRangeParts(options.export_pages))
+            except ValueError:
+                parser.error('invalid page range for export-pages option')
+            if options.export_jobs is not None and options.export_jobs < 1:
+                parser.error('export-jobs must be at least 1')
+
         # convert args to unicode from filesystem strings
         self.args = convertArgsUnicode(args)
         self.options = options
@@ -219,7 +430,8 @@ class VeuszApp(qt4.QApplication):
     def startup(self):
         """Do startup."""
 
-        if not (self.options.listen or self.options.export):
+        if not (self.options.listen or self.options.export or
+                self.options.batch_export):
             # show the splash screen on normal start
             self.splash = qt4.QSplashScreen(makeSplashLogo())
             self.splash.show()
@@ -270,6 +482,13 @@ class VeuszApp(qt4.QApplication):
             export(options.export, args)
             self.quit()
             sys.exit(0)
+        elif options.batch_export:
+            ok = batchExport(options.batch_export, args,
+                             pagerange=options.export_pages,
+                             jobs=options.export_jobs,
+                             plugins=options.plugin)
+            self.quit()
+            sys.exit(0 if ok else 1)
         else:
             # standard start main window
             self.openMainWindow(args)
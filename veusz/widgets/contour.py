@@ -56,6 +56,58 @@ def finitePoly(poly):
         out.append( line[validrows] )
     return out
 
+# minimum number of image pixels to trace levels in several threads
+contour_thread_min_pixels = 250000
+
+def _makeCntr(xc, yc, data, mask):
+    """Make contour tracer for image with pixel centres given."""
+    try:
+        # coordinates of rectilinear mesh do not need expanding
+        return Cntr(xc, yc, data, mask)
+    except ValueError:
+        # helper module built without support for 1D coordinates
+        yw, xw = data.shape
+        xpts = N.reshape( N.tile(xc, yw), (yw, xw) )
+        ypts = N.tile(yc[:, N.newaxis], xw)
+        return Cntr(xpts, ypts, data, mask)
+
+def traceContours(xc, yc, data, levels, numthreads=1):
+    """Trace contours of an image with pixel centres xc, yc.
+
+    levels is a list of (level,) tuples for contour lines or
+    (level1, level2) tuples for polygons between levels.
+    Returns a list of lists of polylines for each item in levels.
+
+    Levels are traced in several threads for large images if
+    numthreads > 1 (the tracer releases the GIL).
+    """
+
+    # only keep finite data points
+    mask = N.logical_not(N.isfinite(data))
+
+    def tracelevels(lvls):
+        c = _makeCntr(xc, yc, data, mask)
+        return [ finitePoly(c.trace(*l)) for l in lvls ]
+
+    numthreads = min(numthreads, len(levels))
+    if numthreads <= 1 or data.size < contour_thread_min_pixels:
+        return tracelevels(levels)
+
+    # each thread needs its own tracer, as the tracer keeps state
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(numthreads)
+    try:
+        parts = pool.map(tracelevels, [ levels[i::numthreads]
+                                        for i in crange(numthreads) ])
+    finally:
+        pool.close()
+
+    # put levels back into original order
+    out = [None]*len(levels)
+    for i, part in enumerate(parts):
+        out[i::numthreads] = part
+    return out
+
 class ContourLineLabeller(LineLabeller):
     def __init__(self, clip, rot, painter, font):
         LineLabeller.__init__(self, clip, rot)
@@ -180,6 +232,10 @@ class Contour(plotters.GenericPlotter):
         self._cachedpolygons = None
         self._cachedsubcontours = None
 
+        # traced polylines for each level, kept while data unchanged
+        self._tracecache = {}
+        self._tracekey = None
+
         if type(self) == Contour:
             self.readDefaults()
 
@@ -438,9 +494,10 @@ class Contour(plotters.GenericPlotter):
                          len(s.SubLines.lines) == 0 or s.SubLines.hide,
                          tuple(s.manualLevels) )
 
-        if data is not self.lastdataset or contsettings != self.contsettings:
+        datakey = (data, d.dataDependencyKey([s.data]))
+        if datakey != self.lastdataset or contsettings != self.contsettings:
             self.updateContours()
-            self.lastdataset = data
+            self.lastdataset = datakey
             self.contsettings = contsettings
 
         return True
@@ -467,47 +524,57 @@ class Contour(plotters.GenericPlotter):
 
         # find coordinates of image coordinate bounds
         data = d.data[s.data]
-        rangex, rangey = data.getDataRanges()
         yw, xw = data.data.shape
 
         if xw == 0 or yw == 0:
             return
 
-        xc, yc = data.getPixelCentres()
-        xpts = N.reshape( N.tile(xc, yw), (yw, xw) )
-        ypts = N.tile(yc[:, N.newaxis], xw)
-
-        # only keep finite data points
-        mask = N.logical_not(N.isfinite(data.data))
-
-        # iterate over the levels and trace the contours
         self._cachedcontours = None
         self._cachedpolygons = None
         self._cachedsubcontours = None
 
-        if Cntr is not None:
-            c = Cntr(xpts, ypts, data.data, mask)
-
-            # trace the contour levels
-            if len(s.Lines.lines) != 0:
-                self._cachedcontours = []
-                for level in levels:
-                    linelist = c.trace(level)
-                    self._cachedcontours.append( finitePoly(linelist) )
-
-            # trace the polygons between the contours
-            if len(s.Fills.fills) != 0 and len(levels) > 1 and not s.Fills.hide:
-                self._cachedpolygons = []
-                for level1, level2 in czip(levels[:-1], levels[1:]):
-                    linelist = c.trace(level1, level2)
-                    self._cachedpolygons.append( finitePoly(linelist) )
-
-            # trace sub-levels
-            if len(sublevels) > 0:
-                self._cachedsubcontours = []
-                for level in sublevels:
-                    linelist = c.trace(level)
-                    self._cachedsubcontours.append( finitePoly(linelist) )
+        if Cntr is None:
+            return
+
+        # lines, polygons between levels and sub-levels to trace
+        linekeys = polykeys = []
+        if len(s.Lines.lines) != 0:
+            linekeys = [ (level,) for level in levels ]
+        if len(s.Fills.fills) != 0 and len(levels) > 1 and not s.Fills.hide:
+            polykeys = list( czip(levels[:-1], levels[1:]) )
+        subkeys = [ (level,) for level in sublevels ]
+
+        # traced levels are reused while the data are the same, so
+        # only new levels need tracing
+        tracekey = (data, d.dataDependencyKey([s.data]))
+        if tracekey != self._tracekey:
+            self._tracecache = {}
+            self._tracekey = tracekey
+        cache = self._tracecache
+
+        needed = []
+        for key in linekeys + polykeys + subkeys:
+            if key not in cache and key not in needed:
+                needed.append(key)
+        if needed:
+            xc, yc = data.getPixelCentres()
+            traced = traceContours(
+                xc, yc, data.data, needed,
+                numthreads=setting.settingdb['plot_numthreads'])
+            cache.update( czip(needed, traced) )
+
+        # forget levels no longer used
+        used = set(linekeys + polykeys + subkeys)
+        for key in list(cache):
+            if key not in used:
+                del cache[key]
+
+        if linekeys:
+            self._cachedcontours = [cache[k] for k in linekeys]
+        if polykeys:
+            self._cachedpolygons = [cache[k] for k in polykeys]
+        if subkeys:
+            self._cachedsubcontours = [cache[k] for k in subkeys]
 
     def _plotContours(self, painter, posn, axes, linestyles,
                       contours, showlabels, hidelines, clip):
@@ -43,8 +43,13 @@ def _(text, disambiguation=None, context='Fit'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
-    """Do fitting with minuit (if installed)."""
+def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr,
+              progress=None, outstream=None):
+    """Do fitting with minuit (if installed).
+
+    progress is an optional function called with the number of
+    iterations, chi2 and parameters during the fit. Output is written
+    to outstream (default sys.stdout)."""
 
     def chi2(params):
         """generate a lambda function to impedance-match between PyMinuit's
@@ -54,7 +59,9 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
             chi2.iters += 1
             p = [chi2.iters, c] + params.tolist()
             str = ("%5i " + "%8g " * (len(params)+1)) % tuple(p)
-            print(str)
+            print(str, file=outstream)
+            if progress is not None:
+                progress(chi2.iters, c, params)
 
         return c
 
@@ -64,7 +71,7 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
     # this is safe because the only user-controlled variable is len(names)
     fn = eval(fnstr, {'chi2' : chi2, 'N' : N})
 
-    print(_('Fitting via Minuit:'))
+    print(_('Fitting via Minuit:'), file=outstream)
     m = minuit.Minuit(fn, fix_x=True, **values)
 
     # run the fit
@@ -81,7 +88,7 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
         m.minos()
         have_err = True
     except minuit.MinuitError as e:
-        print(e)
+        print(e, file=outstream)
         if str(e).startswith('Discovered a new minimum'):
             # the initial fit really failed
             raise
@@ -95,22 +102,176 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
         print(_('Fit results:\n') + "\n".join([
                     u"    %s = %g \u00b1 %g (+%g / %g)"
                     % (n, m.values[n], m.errors[n], m.merrors[(n, 1.0)],
-                       m.merrors[(n, -1.0)]) for n in names]))
+                       m.merrors[(n, -1.0)]) for n in names]),
+              file=outstream)
     elif have_symerr:
         print(_('Fit results:\n') + "\n".join([
                     u"    %s = %g \u00b1 %g" % (n, m.values[n], m.errors[n])
-                    for n in names]))
-        print(_('MINOS error estimate not available.'))
+                    for n in names]), file=outstream)
+        print(_('MINOS error estimate not available.'), file=outstream)
     else:
         print(_('Fit results:\n') + "\n".join([
-                    '    %s = %g' % (n, m.values[n]) for n in names]))
-        print(_('No error analysis available: fit quality uncertain'))
+                    '    %s = %g' % (n, m.values[n]) for n in names]),
+              file=outstream)
+        print(_('No error analysis available: fit quality uncertain'),
+              file=outstream)
 
-    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (retchi2, dof, redchi2))
+    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (retchi2, dof, redchi2),
+          file=outstream)
 
     vals = m.values
     return vals, retchi2, dof
 
+class _BufferedStream(object):
+    """Stream which stores text written to it, to be written out
+    later (as the real streams may only be written from the main
+    thread)."""
+
+    def __init__(self, messages, stream):
+        self.messages = messages
+        self.stream = stream
+
+    def write(self, text):
+        self.messages.append( (self.stream, text) )
+
+    def flush(self):
+        pass
+
+class FitJob(object):
+    """A fit of a function to data, which can be run in a separate
+    thread.
+
+    run() does the fit, calling the function given with progress
+    messages, and can be stopped from another thread with cancel().
+    finish() writes the output and applies the results to the fit
+    widget. It should be called in the main thread.
+    """
+
+    def __init__(self, fitwidget, compiled, paramnames, params,
+                 xvals, yvals, yserr):
+        self.fitwidget = fitwidget
+        self.compiled = compiled
+        self.paramnames = paramnames
+        self.params = params
+        self.xvals = xvals
+        self.yvals = yvals
+        self.yserr = yserr
+
+        s = fitwidget.settings
+        self.variable = s.variable
+        self.values = dict(s.values)
+        self.threads = s.threads
+        self.evalenv = fitwidget.initEnviron()
+
+        self.descr = _('Fitting %s') % fitwidget.path
+        self.cancelled = False
+        self.result = None
+
+        # output, written out in finish()
+        self.messages = []
+        self.stdout = _BufferedStream(self.messages, 'stdout')
+        self.stderr = _BufferedStream(self.messages, 'stderr')
+        self.logmessages = []
+
+    def cancel(self):
+        """Stop the fit (safe to call from other threads)."""
+        self.cancelled = True
+
+    def evalFunc(self, params, xvals):
+        """Evaluate function for parameters and x values."""
+
+        if self.cancelled:
+            raise utils.FitCancelled()
+
+        # update environment with variable and parameters
+        evalenv = self.evalenv
+        evalenv[self.variable] = xvals
+        evalenv.update( czip(self.paramnames, params) )
+
+        try:
+            return eval(self.compiled, evalenv) + xvals*0.
+        except Exception as e:
+            self.logmessages.append(cstr(e))
+            return N.nan
+
+    def evalBatch(self, paramsets, xvals):
+        """Evaluate function for each row of parameters in paramsets
+        in one call, by giving each parameter as a column.
+
+        This is called from several threads, so uses its own
+        environment. Returns None if evaluation fails."""
+
+        if self.cancelled:
+            raise utils.FitCancelled()
+
+        evalenv = self.evalenv.copy()
+        evalenv[self.variable] = xvals
+        for name, vals in czip(self.paramnames, paramsets.T):
+            evalenv[name] = vals[:, N.newaxis]
+
+        try:
+            return eval(self.compiled, evalenv) + xvals*0.
+        except Exception:
+            return None
+
+    def run(self, progress=None):
+        """Do the fit.
+
+        progress is an optional function called with a text message
+        giving the progress of the fit."""
+
+        def fitprogress(iters, chi2, params):
+            if self.cancelled:
+                raise utils.FitCancelled()
+            if progress is not None:
+                progress(_('Iteration %i, chi^2 = %g') % (iters, chi2))
+
+        try:
+            if minuit is not None:
+                vals, chi2, dof = minuitFit(
+                    self.evalFunc, self.params, self.paramnames, self.values,
+                    self.xvals, self.yvals, self.yserr,
+                    progress=fitprogress, outstream=self.stdout)
+            else:
+                print(_('Minuit not available, falling back to simple '
+                        'L-M fitting:'), file=self.stdout)
+                retn, chi2, dof = utils.fitLM(
+                    self.evalFunc, self.params, self.xvals, self.yvals,
+                    self.yserr, batchfunc=self.evalBatch,
+                    threads=self.threads, progress=fitprogress,
+                    outstream=self.stdout, errstream=self.stderr)
+                vals = {}
+                for i, v in czip(self.paramnames, retn):
+                    vals[i] = float(v)
+        except utils.FitCancelled:
+            print(_('Fit cancelled'), file=self.stdout)
+            return
+
+        self.result = (vals, chi2, dof)
+
+    def finish(self):
+        """Write output and update widget with results of fit."""
+
+        for stream, text in self.messages:
+            getattr(sys, stream).write(text)
+        del self.messages[:]
+        for msg in self.logmessages:
+            self.fitwidget.document.log(msg)
+        del self.logmessages[:]
+
+        if self.result is None:
+            return
+
+        # check widget was not deleted during fit
+        w = self.fitwidget
+        while w.parent is not None:
+            w = w.parent
+        if w is not self.fitwidget.document.basewidget:
+            sys.stderr.write(_('Fit widget deleted. Not updating.\n'))
+            return
+
+        self.fitwidget.applyFitResults(*self.result)
+
 class Fit(FunctionPlotter):
     """A plotter to fit a function to data."""
 
@@ -126,7 +287,8 @@ class Fit(FunctionPlotter):
 
         self.addAction( widget.Action('fit', self.actionFit,
                                       descr = _('Fit function'),
-                                      usertext = _('Fit function')) )
+                                      usertext = _('Fit function'),
+                                      jobfunction = self.fitJob) )
 
     @classmethod
     def addSettings(klass, s):
@@ -178,6 +340,13 @@ class Fit(FunctionPlotter):
                              descr = _('Output reduced-chi-squared from fitting'),
                              usertext=_('Fit reduced &chi;<sup>2</sup>')),
                9, readonly=True )
+        s.add( setting.Int(
+                'threads', 1,
+                minval=1, maxval=64,
+                descr = _('Number of threads to evaluate the function in '
+                          'when fitting without Minuit'),
+                usertext=_('Fit threads')),
+               10 )
 
         f = s.get('function')
         f.newDefault('a + b*x')
@@ -233,13 +402,21 @@ class Fit(FunctionPlotter):
 
     def actionFit(self):
         """Fit the data."""
+        job = self.fitJob()
+        if job is not None:
+            job.run()
+            job.finish()
+
+    def fitJob(self):
+        """Get the data to fit, returning a FitJob to do the fit, or None
+        if the fit is not possible."""
 
         s = self.settings
 
         # check and get compiled for of function
         compiled = self.document.compileCheckedExpression(s.function)
         if compiled is None:
-            return
+            return None
 
         # populate the input parameters
         paramnames = sorted(s.values)
@@ -282,18 +459,6 @@ class Fit(FunctionPlotter):
             print("Fitting %s from %g to %g" % (s.variable,
                                                 drange[0], drange[1]))
 
-        evalenv = self.initEnviron()
-        def evalfunc(params, xvals):
-            # update environment with variable and parameters
-            evalenv[self.settings.variable] = xvals
-            evalenv.update( czip(paramnames, params) )
-
-            try:
-                return eval(compiled, evalenv) + xvals*0.
-            except Exception as e:
-                self.document.log(cstr(e))
-                return N.nan
-
         # minimum set for fitting
         if s.min != 'Auto':
             if s.variable == 'x':
@@ -316,29 +481,21 @@ class Fit(FunctionPlotter):
         # various error checks
         if len(xvals) == 0:
             sys.stderr.write(_('No data values. Not fitting.\n'))
-            return
+            return None
         if len(xvals) != len(yvals) or len(xvals) != len(yserr):
             sys.stderr.write(_('Fit data not equal in length. Not fitting.\n'))
-            return
+            return None
         if len(params) > len(xvals):
             sys.stderr.write(_('No degrees of freedom for fit. Not fitting\n'))
-            return
+            return None
 
-        # actually do the fit, either via Minuit or our own LM fitter
-        chi2 = 1
-        dof = 1
+        return FitJob(self, compiled, paramnames, params,
+                      xvals, yvals, yserr)
 
-        if minuit is not None:
-            vals, chi2, dof = minuitFit(evalfunc, params, paramnames, s.values,
-                                        xvals, yvals, yserr)
-        else:
-            print(_('Minuit not available, falling back to simple L-M fitting:'))
-            retn, chi2, dof = utils.fitLM(evalfunc, params,
-                                          xvals,
-                                          yvals, yserr)
-            vals = {}
-            for i, v in czip(paramnames, retn):
-                vals[i] = float(v)
+    def applyFitResults(self, vals, chi2, dof):
+        """Update settings with the results of a fit."""
+
+        s = self.settings
 
         # list of operations do we can undo the changes
         operations = []
@@ -363,7 +520,7 @@ class Fit(FunctionPlotter):
         self.updateOutputLabel(operations, vals, chi2, dof)
 
         # actually change all the settings
-        d.applyOperation(
+        self.document.applyOperation(
             document.OperationMultiple(operations, descr=_('fit')) )
     
     def generateOutputExpr(self, vals):
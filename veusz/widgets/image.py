@@ -19,7 +19,9 @@
 """Image plotting from 2d datasets."""
 
 from __future__ import division
+import math
 
+from ..compat import crange
 from .. import qtall as qt4
 import numpy as N
 
@@ -33,14 +35,21 @@ def _(text, disambiguation=None, context='Image'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def cropLinearImageToBox(image, pltx, plty, posn):
-    """Given a plotting range pltx[0]->pltx[1], plty[0]->plty[1] and
-    plotting bounds posn, return an image which is cropped to posn.
+# only make reduced resolution versions of images larger than this
+image_pyramid_min_pixels = 1024*1024
+
+# number of values to reduce at a time when making reduced images
+image_reduce_chunk = 4*1024*1024
+
+def linearImageCropBox(imw, imh, pltx, plty, posn):
+    """Given an image of size imw x imh, a plotting range
+    pltx[0]->pltx[1], plty[0]->plty[1] and plotting bounds posn,
+    work out the pixels to keep to crop the image to posn.
 
     Returns:
      - updated pltx range
      - updated plty range
-     - cropped image
+     - (x, y, width, height) of pixels to keep (y from top of image)
     """
 
     x1, y1, x2, y2 = posn
@@ -49,8 +58,6 @@ def cropLinearImageToBox(image, pltx, plty, posn):
     plty2, plty1 = plty
     plth = plty2-plty1
 
-    imw = image.width()
-    imh = image.height()
     pixw = pltw / imw
     pixh = plth / imh
     cutr = [0, 0, imw-1, imh-1]
@@ -82,15 +89,35 @@ def cropLinearImageToBox(image, pltx, plty, posn):
         cutr[3] -= d
         plty[0] -= d*pixh
 
+    return pltx, plty, (cutr[0], cutr[1],
+                        cutr[2]-cutr[0]+1, cutr[3]-cutr[1]+1)
+
+def cropLinearImageToBox(image, pltx, plty, posn):
+    """Given a plotting range pltx[0]->pltx[1], plty[0]->plty[1] and
+    plotting bounds posn, return an image which is cropped to posn.
+
+    Returns:
+     - updated pltx range
+     - updated plty range
+     - cropped image
+    """
+
+    pltx, plty, box = linearImageCropBox(
+        image.width(), image.height(), pltx, plty, posn)
+
     # create chopped-down image
-    newimage = image.copy(
-        cutr[0], cutr[1], cutr[2]-cutr[0]+1, cutr[3]-cutr[1]+1)
+    newimage = image.copy(*box)
 
     # return new image coordinates and image
     return pltx, plty, newimage
 
-def cropGridImageToBox(image, gridx, gridy, posn):
-    """Given an image, pixel coordinates and box, crop image to box."""
+def gridImageCropRange(gridx, gridy, posn):
+    """Given pixel edge coordinates and box, work out the pixels to
+    keep to crop image to box.
+
+    Returns updated gridx, gridy and (x1, x2, y1, y2) index ranges of
+    the pixel edges kept, or None if no cropping is needed.
+    """
 
     def trimGrid(grid, p1, p2):
         """Trim grid to bounds given, returning index range."""
@@ -126,16 +153,64 @@ def cropGridImageToBox(image, gridx, gridy, posn):
 
     if x1 > 0 or y1 > 0 or x2 < len(gridx)-1 or y2 < len(gridy)-1:
         # do cropping
-        image = image.copy(x1, len(gridy)-y2, x2-x1-1, y2-y1-1)
+        crop = (x1, x2, y1, y2)
         gridx = N.array(gridx[x1:x2])
         gridy = N.array(gridy[y1:y2])
 
         # trim outer grid point to viewable range
         trimEdge(gridx, posn[0], posn[2])
         trimEdge(gridy, posn[1], posn[3])
+    else:
+        crop = None
+
+    return gridx, gridy, crop
+
+def cropGridImageToBox(image, gridx, gridy, posn):
+    """Given an image, pixel coordinates and box, crop image to box."""
+
+    ny = len(gridy)
+    gridx, gridy, crop = gridImageCropRange(gridx, gridy, posn)
+    if crop is not None:
+        x1, x2, y1, y2 = crop
+        image = image.copy(x1, ny-y2, x2-x1-1, y2-y1-1)
 
     return gridx, gridy, image
 
+def reduceImage(data, factor):
+    """Reduce the resolution of a 2D array by factor, averaging the
+    finite values in each block of factor x factor pixels.
+
+    If the size is not a multiple of factor, the last blocks are
+    partly outside the array."""
+
+    yw, xw = data.shape
+    oxw = -(-xw // factor)
+    oyw = -(-yw // factor)
+    sumvals = N.zeros( (oyw, oxw) )
+    counts = N.zeros( (oyw, oxw) )
+
+    # process rows in chunks, to avoid large temporary arrays
+    rowchunk = max(image_reduce_chunk // (xw*factor), 1) * factor
+    for row in crange(0, yw, rowchunk):
+        chunk = data[row:row+rowchunk]
+        finite = N.isfinite(chunk)
+        vals = N.where(finite, chunk, 0.)
+
+        # pad to a multiple of factor
+        ch, cw = chunk.shape
+        padh, padw = -ch % factor, -cw % factor
+        if padh or padw:
+            vals = N.pad(vals, ((0, padh), (0, padw)), 'constant')
+            finite = N.pad(finite, ((0, padh), (0, padw)), 'constant')
+
+        shape = (vals.shape[0]//factor, factor, vals.shape[1]//factor, factor)
+        orow = row // factor
+        sumvals[orow:orow+shape[0]] = vals.reshape(shape).sum(axis=3).sum(axis=1)
+        counts[orow:orow+shape[0]] = finite.reshape(shape).sum(axis=3).sum(axis=1)
+
+    with N.errstate(invalid='ignore', divide='ignore'):
+        return sumvals / counts
+
 class Image(plotters.GenericPlotter):
     """A class which plots an image on a graph with a specified
     coordinate system."""
@@ -149,6 +224,14 @@ class Image(plotters.GenericPlotter):
 
         plotters.GenericPlotter.__init__(self, parent, name=name)
 
+        # reduced resolution versions of data, by reduction factor
+        self.pyramid = {}
+        # key for data of pyramid and value range
+        self.pyramidkey = self.valuerangekey = None
+        self.valuerange = None
+        # last colormapped image (key, image)
+        self.imagecache = (None, None)
+
         if type(self) == Image:
             self.readDefaults()
 
@@ -226,20 +309,32 @@ class Image(plotters.GenericPlotter):
         out += [s.colorScaling, s.colorMap]
         return ', '.join(out)
 
+    def dataVersionKey(self, data):
+        """Key which changes when the data used by the widget change."""
+        d = self.document
+        names = []
+        plotters._settingsDatasetNames(d, self.settings, names)
+        return (data, d.dataDependencyKey(names))
+
     def getDataValueRange(self, data):
         """Update data range from data."""
 
         s = self.settings
-        minval = s.min
+        minval, maxval = s.min, s.max
+        if data is not None and (minval == 'Auto' or maxval == 'Auto'):
+            # range of data is kept until data change
+            key = self.dataVersionKey(data)
+            if key != self.valuerangekey:
+                self.valuerange = (N.nanmin(data.data), N.nanmax(data.data))
+                self.valuerangekey = key
         if minval == 'Auto':
             if data is not None:
-                minval = N.nanmin(data.data)
+                minval = self.valuerange[0]
             else:
                 minval = 0.
-        maxval = s.max
         if maxval == 'Auto':
             if data is not None:
-                maxval = N.nanmax(data.data)
+                maxval = self.valuerange[1]
             else:
                 maxval = minval + 1
 
@@ -282,6 +377,98 @@ class Image(plotters.GenericPlotter):
         return (minval, maxval, s.colorScaling, s.colorMap,
                 s.transparency, s.colorInvert)
 
+    def reducedData(self, data, factor):
+        """Return data reduced in resolution by factor, keeping
+        reduced versions until the data change."""
+
+        key = self.dataVersionKey(data)
+        if key != self.pyramidkey:
+            self.pyramid = {}
+            self.pyramidkey = key
+        if factor not in self.pyramid:
+            self.pyramid[factor] = reduceImage(data.data, factor)
+        return self.pyramid[factor]
+
+    def colorMappedImage(self, data, values, transimg, region):
+        """Make QImage from values (part of data given by region),
+        reusing the last image if nothing has changed."""
+
+        s = self.settings
+        d = self.document
+        cmap = d.getColormap(s.colorMap, s.colorInvert)
+        datavaluerange = self.getDataValueRange(data)
+
+        key = ( self.dataVersionKey(data), region,
+                tuple(N.ravel(cmap).tolist()), s.colorScaling,
+                tuple(datavaluerange), s.transparency )
+        if key == self.imagecache[0]:
+            return self.imagecache[1]
+
+        image = utils.applyColorMap(
+            cmap, s.colorScaling, values,
+            datavaluerange[0], datavaluerange[1],
+            s.transparency, transimg=transimg)
+        self.imagecache = (key, image)
+        return image
+
+    def linearImageDrawRegion(self, painter, data, transimg,
+                              pltrangex, pltrangey, posn):
+        """For a linearly spaced image, work out the part of the data
+        to draw, cropping to posn before colormapping.
+
+        If the image is reduced when drawn (and decimation is
+        allowed), a reduced resolution version of the data is used.
+
+        Returns values, transparency values, region key, updated
+        plotter x range, updated plotter y range.
+        """
+
+        yw, xw = data.data.shape
+        if ( pltrangex[0] < posn[0] or pltrangex[1] > posn[2] or
+             pltrangey[0] < posn[1] or pltrangey[1] > posn[3] ):
+            # need to crop image
+            pltrangex, pltrangey, box = linearImageCropBox(
+                xw, yw, pltrangex, pltrangey, posn)
+        else:
+            box = (0, 0, xw, yw)
+
+        # data rows are in the opposite order to image rows
+        cx, cy, cw, ch = box
+        col1, col2 = cx, cx+cw
+        row1, row2 = yw-cy-ch, yw-cy
+
+        # number of data pixels per output pixel
+        pixperout = min( cw / max(abs(pltrangex[1]-pltrangex[0]), 1),
+                         ch / max(abs(pltrangey[0]-pltrangey[1]), 1) )
+
+        if ( getattr(painter, 'decimate', False) and transimg is None and
+             xw*yw >= image_pyramid_min_pixels and pixperout >= 2 ):
+
+            # use reduced image with factor of 2 to keep enough pixels
+            factor = 2**int(math.log(pixperout, 2))
+            values = self.reducedData(data, factor)
+
+            # work out plotter coordinates of reduced pixels
+            pixw = (pltrangex[1]-pltrangex[0]) / cw
+            pixh = (pltrangey[1]-pltrangey[0]) / ch
+            lcol1, lcol2 = col1//factor, -(-col2//factor)
+            lrow1, lrow2 = row1//factor, -(-row2//factor)
+            pltrangex = ( pltrangex[0] + (lcol1*factor-col1)*pixw,
+                          pltrangex[0] + (lcol2*factor-col1)*pixw )
+            pltrangey = ( pltrangey[0] + (lrow1*factor-row1)*pixh,
+                          pltrangey[0] + (lrow2*factor-row1)*pixh )
+
+            region = (factor, lrow1, lrow2, lcol1, lcol2)
+            values = values[lrow1:lrow2, lcol1:lcol2]
+
+        else:
+            region = (1, row1, row2, col1, col2)
+            values = data.data[row1:row2, col1:col2]
+            if transimg is not None:
+                transimg = transimg[row1:row2, col1:col2]
+
+        return values, transimg, region, pltrangex, pltrangey
+
     def dataDraw(self, painter, axes, posn, clip):
         """Draw image."""
 
@@ -300,22 +487,28 @@ class Image(plotters.GenericPlotter):
         pltrangex = axes[0].dataToPlotterCoords(posn, N.array(rangex))
         pltrangey = axes[1].dataToPlotterCoords(posn, N.array(rangey))
 
-        # make QImage from data
-        cmap = d.getColormap(s.colorMap, s.colorInvert)
-        datavaluerange = self.getDataValueRange(data)
-        image = utils.applyColorMap(
-            cmap, s.colorScaling, data.data,
-            datavaluerange[0], datavaluerange[1],
-            s.transparency, transimg=transimg)
+        # the data are cropped to the visible area before colormapping,
+        # unless the transparency image does not match the data
+        cropfirst = transimg is None or transimg.shape == data.data.shape
 
         if data.isLinearImage():
             # linearly spaced grid
 
-            if ( pltrangex[0] < posn[0] or pltrangex[1] > posn[2] or
-                 pltrangey[0] < posn[1] or pltrangey[1] > posn[3] ):
-                # need to crop image
-                pltrangex, pltrangey, image = cropLinearImageToBox(
-                    image, pltrangex, pltrangey, posn)
+            if cropfirst:
+                (values, transvals, region,
+                 pltrangex, pltrangey) = self.linearImageDrawRegion(
+                    painter, data, transimg, pltrangex, pltrangey, posn)
+                image = self.colorMappedImage(
+                    data, values, transvals, region)
+
+            else:
+                image = self.colorMappedImage(
+                    data, data.data, transimg, None)
+                if ( pltrangex[0] < posn[0] or pltrangex[1] > posn[2] or
+                     pltrangey[0] < posn[1] or pltrangey[1] > posn[3] ):
+                    # need to crop image
+                    pltrangex, pltrangey, image = cropLinearImageToBox(
+                        image, pltrangex, pltrangey, posn)
 
         else:
             # get pixel edges, converted to plotter coordinates
@@ -323,9 +516,24 @@ class Image(plotters.GenericPlotter):
                 scalefnx=lambda v: axes[0].dataToPlotterCoords(posn, v),
                 scalefny=lambda v: axes[1].dataToPlotterCoords(posn, v))
 
-            # crop any pixels completely outside posn
-            xedgep, yedgep, image = cropGridImageToBox(
-                image, xedgep, yedgep, posn)
+            if cropfirst:
+                # crop any pixels completely outside posn
+                xedgep, yedgep, crop = gridImageCropRange(
+                    xedgep, yedgep, posn)
+                values = data.data
+                if crop is not None:
+                    x1, x2, y1, y2 = crop
+                    values = values[y1:y2-1, x1:x2-1]
+                    if transimg is not None:
+                        transimg = transimg[y1:y2-1, x1:x2-1]
+                image = self.colorMappedImage(data, values, transimg, crop)
+
+            else:
+                image = self.colorMappedImage(
+                    data, data.data, transimg, None)
+                # crop any pixels completely outside posn
+                xedgep, yedgep, image = cropGridImageToBox(
+                    image, xedgep, yedgep, posn)
 
             # make image on linear grid
             image = utils.resampleLinearImage(image, xedgep, yedgep)
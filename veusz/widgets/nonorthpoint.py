@@ -172,11 +172,20 @@ class NonOrthPoint(Widget):
         font = lab.makeQFont(painter)
         angle = lab.angle
 
+        # optionally skip labels overlapping those already drawn
+        overlaps = utils.RectangleOverlapTester() if lab.hideOverlap else None
+
         # iterate over each point and plot each label
         for x, y, t in czip(xplotter+deltax, yplotter+deltay,
                             textvals):
-            utils.Renderer( painter, font, x, y, t,
-                            alignhorz, alignvert, angle ).render()
+            r = utils.Renderer( painter, font, x, y, t,
+                                alignhorz, alignvert, angle )
+            if overlaps is not None:
+                rect = r.getTightBounds()
+                if overlaps.willOverlap(rect):
+                    continue
+                overlaps.addRect(rect)
+            r.render()
 
     def getColorbarParameters(self):
         """Return parameters for colorbar."""
@@ -105,6 +105,14 @@ class AxisDependHelper(object):
         self.axis_to_axislinked = {}
         self.axislinked_to_axis = {}
 
+        # order to process dependencies (once cycles are broken)
+        self.ordered = None
+
+        # ranges of plotters kept from the previous call to
+        # findAxisRanges and those used in this call
+        self.rangecache = {}
+        self.newrangecache = {}
+
     def recursivePlotterSearch(self, widget):
         """Find a list of plotters below widget.
 
@@ -192,14 +200,31 @@ class AxisDependHelper(object):
         axis.setAutoRange(axrange)
         del self.ranges[axis]
 
+    def _plotterRange(self, axis, plotter, plotterdep):
+        """Get the range of the plotter for the axis, reusing the
+        previous range if the plotter and its data are unchanged."""
+
+        key = plotter.rangeCacheKey(axis)
+        ckey = (plotter, plotterdep, axis)
+        if key is not None:
+            cached = self.rangecache.get(ckey)
+            if cached is not None and cached[0] == key:
+                self.newrangecache[ckey] = cached
+                return list(cached[1])
+
+        therange = list(defaultrange)
+        plotter.getRange(axis, plotterdep, therange)
+        if key is not None:
+            self.newrangecache[ckey] = (key, list(therange))
+        return therange
+
     def _updateRangeFromPlotter(self, axis, plotter, plotterdep):
         """Update the range for axis from the plotter."""
 
+        therange = self._plotterRange(axis, plotter, plotterdep)
+
         if axis.isLinked():
             # take range and map back to real axis
-            therange = list(defaultrange)
-            plotter.getRange(axis, plotterdep, therange)
-
             if therange != defaultrange:
                 # follow up chain
                 loopcheck = set()
@@ -215,7 +240,9 @@ class AxisDependHelper(object):
                         N.nanmax((self.ranges[axis][1], therange[1]))
                         ]
         else:
-            plotter.getRange(axis, plotterdep, self.ranges[axis])
+            axrange = self.ranges[axis]
+            axrange[0] = min(axrange[0], therange[0])
+            axrange[1] = max(axrange[1], therange[1])
 
     def processWidgetDeps(self, dep):
         """Process dependencies for a single widget."""
@@ -249,14 +276,16 @@ class AxisDependHelper(object):
         """
 
         # get ordered list, breaking cycles
-        while True:
-            ordered, cyclic = utils.topological_sort(self.pairs)
-            if not cyclic:
-                break
-            self.breakCycles(cyclic)
+        if self.ordered is None:
+            while True:
+                ordered, cyclic = utils.topological_sort(self.pairs)
+                if not cyclic:
+                    break
+                self.breakCycles(cyclic)
+            self.ordered = ordered
 
         # iterate over widgets in order
-        for dep in ordered:
+        for dep in self.ordered:
             self.processWidgetDeps(dep)
 
             # process deps for any axis functions
@@ -267,15 +296,25 @@ class AxisDependHelper(object):
     def findAxisRanges(self):
         """Find the ranges from the plotters and set the axis ranges.
 
-        Follows the dependencies calculated above.
+        Follows the dependencies calculated above. This can be called
+        again if the widgets are unchanged, to update the ranges from
+        changed data.
         """
 
+        self.ranges = dict( [(axis, list(defaultrange))
+                             for axis in self.axes] )
+        self.newrangecache = {}
+
         self.processDepends()
 
         # set any remaining ranges
         for axis in list(self.ranges.keys()):
             self._updateAxisAutoRange(axis)
 
+        # only keep ranges of plotters which are still used
+        self.rangecache = self.newrangecache
+        self.newrangecache = {}
+
 class Page(widget.Widget):
     """A class for representing a page of plotting."""
 
@@ -288,6 +327,11 @@ class Page(widget.Widget):
         widget.Widget.__init__(self, parent, name=name)
         if type(self) == Page:
             self.readDefaults()
+
+        # axis dependencies from the last draw, with the state of
+        # widgets used to compute them
+        self.axisdependkey = None
+        self.axisdependhelper = None
  
     @classmethod
     def addSettings(klass, s):
@@ -323,15 +367,35 @@ class Page(widget.Widget):
         """Return user-friendly description."""
         return textwrap.fill(self.settings.notes, 60)
 
+    def axisDependKey(self):
+        """Return a key describing the widgets on the page and their
+        settings, which changes if the axis dependencies may change."""
+
+        widgets = []
+        def walk(w):
+            widgets.append( (w, w.name, w.changeset) )
+            for c in w.children:
+                walk(c)
+        walk(self)
+        return (self.document.basewidget.changeset, tuple(widgets))
+
     def draw(self, parentposn, painthelper, outerbounds=None):
         """Draw the plotter. Clip graph inside bounds."""
 
         # document should pass us the page bounds
         x1, y1, x2, y2 = parentposn
 
-        # find ranges of axes
-        axisdependhelper = AxisDependHelper()
-        axisdependhelper.recursivePlotterSearch(self)
+        # find ranges of axes, reusing the dependencies if the
+        # widgets are unchanged
+        key = self.axisDependKey()
+        if key != self.axisdependkey:
+            helper = AxisDependHelper()
+            helper.recursivePlotterSearch(self)
+            if self.axisdependhelper is not None:
+                helper.rangecache = self.axisdependhelper.rangecache
+            self.axisdependhelper = helper
+            self.axisdependkey = key
+        axisdependhelper = self.axisdependhelper
         axisdependhelper.findAxisRanges()
 
         # store axis->plotter mappings in painthelper
@@ -22,7 +22,7 @@
 from __future__ import division
 import numpy as N
 
-from ..compat import CBool
+from ..compat import CBool, czip
 from .. import document
 
 class PickInfo(CBool):
@@ -87,6 +87,122 @@ def _chooseOrderingSign(m, c, p):
     else:
         assert m is not None or p is not None
 
+# use an index for picking if there are at least this many points
+pick_index_min_points = 4096
+
+class PointIndex(object):
+    """An index of screen points within bounds, to quickly find the
+    closest point to a position.
+
+    Points are placed on a grid of square cells for radial distances,
+    and are sorted in x or y for horizontal or vertical distances.
+    The results are the same as comparing the distance to every point.
+    """
+
+    def __init__(self, xscreen, yscreen, bounds):
+        self.xscreen = xscreen
+        self.yscreen = yscreen
+        self.bounds = tuple(bounds)
+
+        # indices of points in bounds
+        self.valid = N.nonzero(
+            (xscreen >= bounds[0]) & (xscreen <= bounds[2]) &
+            (yscreen >= bounds[1]) & (yscreen <= bounds[3]) )[0]
+
+        self.sorted = {}
+        self.grid = None
+
+    def _sortedAxis(self, vals):
+        """Return valid point indices sorted by vals, and sorted vals."""
+        key = id(vals)
+        if key not in self.sorted:
+            order = self.valid[N.argsort(vals[self.valid])]
+            self.sorted[key] = (order, vals[order])
+        return self.sorted[key]
+
+    def _makeGrid(self):
+        """Put valid points into grid cells."""
+        x1, y1, x2, y2 = self.bounds
+        # aim for a few points per cell
+        num = max(len(self.valid), 1)
+        cellsize = max(1., N.sqrt((x2-x1+1)*(y2-y1+1)*4./num))
+        nx = int((x2-x1)/cellsize)+1
+        ny = int((y2-y1)/cellsize)+1
+
+        xv = self.xscreen[self.valid]
+        yv = self.yscreen[self.valid]
+        itype = N.int32 if nx*ny < 2**31 else N.int64
+        gx = N.clip(((xv-x1)*(1./cellsize)).astype(itype), 0, nx-1)
+        gy = N.clip(((yv-y1)*(1./cellsize)).astype(itype), 0, ny-1)
+        cellid = gx*ny + gy
+
+        # order within cells does not matter, as the first of any
+        # equidistant points is chosen when picking
+        order = N.argsort(cellid)
+        self.grid = (cellsize, nx, ny, cellid[order], self.valid[order])
+
+    def closestAxis(self, vals, v0):
+        """Find closest valid point in vals to v0.
+        Returns (distance, index) or None if no valid points."""
+
+        order, svals = self._sortedAxis(vals)
+        if len(order) == 0:
+            return None
+
+        k = N.searchsorted(svals, v0)
+        cands = order[max(k-1, 0):k+1]
+        d = N.abs(vals[cands] - v0).min()
+
+        # find all points with the same distance to choose the first
+        eps = abs(d)*1e-12 + 1e-300
+        lo = N.searchsorted(svals, v0-d-eps, side='left')
+        hi = N.searchsorted(svals, v0+d+eps, side='right')
+        cands = order[lo:hi]
+        dist = N.abs(vals[cands] - v0)
+        m = dist.min()
+        return m, cands[dist == m].min()
+
+    def closestRadial(self, x0, y0):
+        """Find closest valid point to (x0, y0).
+        Returns (distance, index) or None if no valid points."""
+
+        if len(self.valid) == 0:
+            return None
+        if self.grid is None:
+            self._makeGrid()
+        cellsize, nx, ny, cellids, idxs = self.grid
+        x1, y1 = self.bounds[0], self.bounds[1]
+
+        cx = min(max(int((x0-x1)/cellsize), 0), nx-1)
+        cy = min(max(int((y0-y1)/cellsize), 0), ny-1)
+
+        radius = 1
+        while True:
+            # look at the square of cells around the position
+            gx1, gx2 = max(cx-radius, 0), min(cx+radius, nx-1)
+            gy1, gy2 = max(cy-radius, 0), min(cy+radius, ny-1)
+            # (same type as cellids, to avoid converting them)
+            starts = N.arange(gx1, gx2+1, dtype=cellids.dtype)*ny
+            lo = N.searchsorted(cellids, starts+gy1, side='left')
+            hi = N.searchsorted(cellids, starts+gy2, side='right')
+            cands = [idxs[a:b] for a, b in czip(lo, hi) if b > a]
+
+            # points outside square are at least this far away
+            bound = min(
+                x0-(x1+gx1*cellsize) if gx1 > 0 else N.inf,
+                x1+(gx2+1)*cellsize-x0 if gx2 < nx-1 else N.inf,
+                y0-(y1+gy1*cellsize) if gy1 > 0 else N.inf,
+                y1+(gy2+1)*cellsize-y0 if gy2 < ny-1 else N.inf)
+
+            if cands:
+                cands = N.concatenate(cands)
+                dist = N.sqrt((self.xscreen[cands] - x0)**2 +
+                              (self.yscreen[cands] - y0)**2)
+                m = dist.min()
+                if m < bound:
+                    return m, cands[dist == m].min()
+            radius *= 2
+
 class GenericPickable:
     """Utility class which abstracts the math of picking the closest point out
        of a list of points"""
@@ -97,6 +213,28 @@ class GenericPickable:
         self.xvals, self.yvals = vals
         self.xscreen, self.yscreen = screenvals
 
+        # index of points, built when picking
+        self.pointindex = None
+
+    def _indexPick(self, x0, y0, bounds, distance_direction):
+        """Find closest point using index, returning (distance,
+        index) or None if not possible."""
+
+        if len(self.xscreen) < pick_index_min_points:
+            return None
+        if ( self.pointindex is None or
+             self.pointindex.bounds != tuple(bounds) ):
+            self.pointindex = PointIndex(self.xscreen, self.yscreen, bounds)
+        index = self.pointindex
+
+        if distance_direction == 'vertical':
+            return index.closestAxis(self.yscreen, y0)
+        elif distance_direction == 'horizontal':
+            return index.closestAxis(self.xscreen, x0)
+        elif distance_direction == 'radial':
+            return index.closestRadial(x0, y0)
+        return None
+
     def _pickSign(self, i):
         if len(self.xscreen) <= 1:
             # we only have one element, so it doesn't matter anyways
@@ -127,6 +265,23 @@ class GenericPickable:
         if len(self.xscreen) == 0 or len(self.yscreen) == 0:
             return info
 
+        found = self._indexPick(x0, y0, bounds, distance_direction)
+        if found is not None:
+            m, i = found
+        else:
+            m, i = self._bruteForcePick(x0, y0, bounds, distance_direction)
+
+        info.screenpos = self.xscreen[i], self.yscreen[i]
+        info.coords = self.xvals[i], self.yvals[i]
+        info.distance = m
+        info.index = Index(self.xvals[i], i, self._pickSign(i))
+
+        return info
+
+    def _bruteForcePick(self, x0, y0, bounds, distance_direction):
+        """Find closest point by computing distances to every point.
+        Returns (distance, index)."""
+
         # calculate distances
         if distance_direction == 'vertical':
             # measure distance along y
@@ -152,13 +307,7 @@ class GenericPickable:
         # if there are multiple equidistant points, arbitrarily take
         # the first one
         i = N.nonzero(dist == m)[0][0]
-
-        info.screenpos = self.xscreen[i], self.yscreen[i]
-        info.coords = self.xvals[i], self.yvals[i]
-        info.distance = m
-        info.index = Index(self.xvals[i], i, self._pickSign(i))
-
-        return info
+        return m, i
 
     def pickIndex(self, oldindex, direction, bounds):
         info = PickInfo(self.widget, labels=self.labels)
@@ -25,6 +25,8 @@ from __future__ import division
 from .. import qtall as qt4
 import numpy as N
 
+from ..compat import cbasestr
+from .. import document
 from .. import setting
 
 from . import widget
@@ -33,6 +35,16 @@ def _(text, disambiguation=None, context='Plotters'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+def _settingsDatasetNames(doc, settings, names):
+    """Add names of datasets used in settings to the list names."""
+    for s in settings.getList():
+        if isinstance(s, setting.Settings):
+            _settingsDatasetNames(doc, s, names)
+        elif isinstance(s, setting.Datasets):
+            names += s.val
+        elif isinstance(s, setting.Dataset) and isinstance(s.val, cbasestr):
+            names += document.expressionDependencies(doc.data, s.val)
+
 class GenericPlotter(widget.Widget):
     """Generic plotter."""
 
@@ -151,6 +163,48 @@ class GenericPlotter(widget.Widget):
         """Update range variable for axis with dependency name given."""
         pass
 
+    def renderCacheKey(self, axes, posn):
+        """Return a key describing the state used to draw the plotter.
+
+        If this is unchanged between redraws, the previous drawing is
+        reused. The key includes the settings of the plotter, the
+        stylesheet, the axes and the datasets referred to.
+        """
+
+        doc = self.document
+        names = []
+        _settingsDatasetNames(doc, self.settings, names)
+        return (
+            tuple(posn),
+            self.changeset,
+            doc.basewidget.changeset,
+            tuple([ (a.changeset, tuple(a.getPlottedRange()))
+                    for a in axes ]),
+            doc.dataDependencyKey(names),
+        )
+
+    def rangeCacheKey(self, axis):
+        """Return a key describing the state used to compute the range
+        of the plotter on axis (see getRange).
+
+        If this is unchanged, the previous range is reused. None is
+        returned if the range cannot be cached, e.g. if it depends
+        on the ranges of other axes.
+        """
+
+        if self.requiresAxisRange():
+            return None
+
+        doc = self.document
+        names = []
+        _settingsDatasetNames(doc, self.settings, names)
+        return (
+            self.changeset,
+            doc.basewidget.changeset,
+            axis.changeset,
+            doc.dataDependencyKey(names),
+        )
+
     def draw(self, parentposn, painthelper, outerbounds = None):
         """Draw for generic plotters."""
 
@@ -167,7 +221,16 @@ class GenericPlotter(widget.Widget):
 
         # clip data within bounds of plotter
         cliprect = self.clipAxesBounds(axes, posn)
-        painter = painthelper.painter(self, posn, clip=cliprect)
+
+        # reuse previous drawing if nothing has changed
+        cachekey = None
+        if painthelper.rendercache is not None:
+            cachekey = self.renderCacheKey(axes, posn)
+            if painthelper.cachedLayer(self, posn, cachekey, clip=cliprect):
+                return posn
+
+        painter = painthelper.painter(self, posn, clip=cliprect,
+                                      cachekey=cachekey)
         with painter:
             self.dataDraw(painter, axes, posn, cliprect)
         return posn
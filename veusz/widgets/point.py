@@ -306,6 +306,9 @@ class PointPlotter(GenericPlotter):
         if type(self) == PointPlotter:
             self.readDefaults()
 
+        # pickable for last bounds, with the state used to make it
+        self.pickablecache = (None, None)
+
     @classmethod
     def addSettings(klass, s):
         """Construct list of settings."""
@@ -707,11 +710,20 @@ class PointPlotter(GenericPlotter):
         font = lab.makeQFont(painter)
         angle = lab.angle
 
+        # optionally skip labels overlapping those already drawn
+        overlaps = utils.RectangleOverlapTester() if lab.hideOverlap else None
+
         # iterate over each point and plot each label
         for x, y, t in czip(xplotter+deltax, yplotter+deltay,
                             textvals):
-            utils.Renderer( painter, font, x, y, t,
-                            alignhorz, alignvert, angle ).render()
+            r = utils.Renderer( painter, font, x, y, t,
+                                alignhorz, alignvert, angle )
+            if overlaps is not None:
+                rect = r.getTightBounds()
+                if overlaps.willOverlap(rect):
+                    continue
+                overlaps.addRect(rect)
+            r.render()
 
     def getAxisLabels(self, direction):
         """Get labels for axis if using a label axis."""
@@ -742,11 +754,19 @@ class PointPlotter(GenericPlotter):
 
         if axes is None:
             map_fn = None
+            key = None
         else:
             map_fn = lambda x, y: ( axes[0].dataToPlotterCoords(bounds, x),
                                     axes[1].dataToPlotterCoords(bounds, y) )
+            # reuse pickable (and its index of points) if unchanged
+            key = self.renderCacheKey(axes, bounds)
+            if key == self.pickablecache[0]:
+                return self.pickablecache[1]
 
-        return pickable.DiscretePickable(self, 'xData', 'yData', map_fn)
+        p = pickable.DiscretePickable(self, 'xData', 'yData', map_fn)
+        if key is not None:
+            self.pickablecache = (key, p)
+        return p
 
     def pickPoint(self, x0, y0, bounds, distance = 'radial'):
         return self._pickable(bounds).pickPoint(x0, y0, bounds, distance)
@@ -827,7 +847,11 @@ class PointPlotter(GenericPlotter):
                     self._drawBezierLine( painter, xplotter, yplotter, posn,
                                           xvals, yvals )
                 else:
-                    self._drawPlotLine( painter, xplotter, yplotter, posn,
+                    xline, yline = xplotter, yplotter
+                    if painter.decimate and s.PlotLine.steps == 'off':
+                        # skip points which would not change the line
+                        xline, yline = utils.decimateLine(xline, yline)
+                    self._drawPlotLine( painter, xline, yline, posn,
                                         xvals, yvals, cliprect )
 
             #print "Painting error bars"
@@ -881,6 +905,14 @@ class PointPlotter(GenericPlotter):
                     cmap = self.document.getColormap(
                         s.MarkerFill.colorMap, s.MarkerFill.colorMapInvert)
 
+                # skip markers hidden by later ones at the same pixel
+                if painter.decimate and scaling is None:
+                    keep = utils.decimateMarkerIndices(xplt, yplt)
+                    if keep is not None:
+                        xplt, yplt = xplt[keep], yplt[keep]
+                        if colorvals is not None:
+                            colorvals = colorvals[keep]
+
                 # actually plot datapoints
                 utils.plotMarkers(painter, xplt, yplt, s.marker, markersize,
                                   scaling=scaling, clip=cliprect,
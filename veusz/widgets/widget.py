@@ -39,20 +39,30 @@ class Action(object):
     function: function to call with no arguments
     descr: description of action
     usertext: name of action to display to user
+    jobfunction: optional function returning a job (or None) to run
+     the action in the background from the user interface
     """
 
-    def __init__(self, name, function, descr='', usertext=''):
+    def __init__(self, name, function, descr='', usertext='',
+                 jobfunction=None):
         """Initialise Action
 
         Name of action is name
         Calls function function() on invocation
         Action has description descr
-        Usertext is short form of name to display to user."""
+        Usertext is short form of name to display to user.
+
+        If given, jobfunction() returns an object with methods run(),
+        cancel() and finish() and a descr attribute. run(progress)
+        does the work in another thread, calling progress with text
+        messages. finish() is called in the main thread afterwards.
+        """
 
         self.name = name
         self.function = function
         self.descr = descr
         self.usertext = usertext
+        self.jobfunction = jobfunction
 
 class Widget(object):
     """ Fundamental plotting widget interface."""
@@ -73,6 +83,9 @@ class Widget(object):
         self.parent = parent
         self.document = None
 
+        # increased when settings of this widget are modified
+        self.changeset = 0
+
         if not self.isAllowedParent(parent):
             raise RuntimeError("Widget parent is of incorrect type")
 
@@ -87,6 +100,8 @@ class Widget(object):
 
         # store child widgets
         self.children = []
+        # map of names to children, with tree version when made
+        self._childmap = (-1, None)
         
         # settings for widget
         self.settings = setting.Settings( 'Widget_' + self.typename,
@@ -136,6 +151,7 @@ class Widget(object):
                 raise ValueError('New name "%s" already exists' % name)
 
         self.name = name
+        setting.treeChanged()
 
     def addDefaultSubWidgets(self):
         '''Add default sub widgets to widget, if any'''
@@ -180,6 +196,7 @@ class Widget(object):
         index is a position to place the new child
         """
         self.children.insert(index, child)
+        setting.treeChanged()
 
     def createUniqueName(self, prefix):
         """Create a name using the prefix which hasn't been used before."""
@@ -230,10 +247,12 @@ class Widget(object):
 
     def getChild(self, name):
         """Return a child with a name."""
-        for i in self.children:
-            if i.name == name:
-                return i
-        return None
+        version, childmap = self._childmap
+        if version != setting.treeVersion():
+            # first child of each name is returned
+            childmap = dict([(c.name, c) for c in reversed(self.children)])
+            self._childmap = (setting.treeVersion(), childmap)
+        return childmap.get(name)
 
     def hasChild(self, name):
         """Return whether there is a child with a name."""
@@ -254,6 +273,7 @@ class Widget(object):
 
         if i < nc:
             self.children.pop(i)
+            setting.treeChanged()
         else:
             raise ValueError("Cannot remove graph '%s' - does not exist" % name)
 
@@ -409,6 +429,7 @@ class Widget(object):
             if existingname:
                 w.name = w.chooseName()
 
+            setting.treeChanged()
             return True
 
     def updateControlItem(self, controlitem, pos):
@@ -53,6 +53,26 @@ class _Writer(object):
         """ Does nothing as yet."""
         pass
 
+class _JobThread(qt4.QThread):
+    """Thread to run a job (see widgets.Action).
+
+    emits sigProgress with progress messages from the job
+    """
+
+    sigProgress = qt4.pyqtSignal(object)
+
+    def __init__(self, job):
+        qt4.QThread.__init__(self)
+        self.job = job
+        self.error = None
+
+    def run(self):
+        """Run job, keeping any backtrace if it fails."""
+        try:
+            self.job.run(self.sigProgress.emit)
+        except Exception:
+            self.error = ''.join(traceback.format_exception(*sys.exc_info()))
+
 class _CommandEdit(qt4.QLineEdit):
     """ A special class to allow entering of the command line.
 
@@ -201,6 +221,9 @@ class ConsoleWindow(qt4.QDockWidget):
         # keep track of multiple line commands
         self.command_build = ''
 
+        # threads running background jobs
+        self.jobthreads = []
+
         # get called if enter is pressed in the input control
         self._inputedit.sigEnter.connect(self.slotEnter)
         # called if document logs something
@@ -259,6 +282,65 @@ class ConsoleWindow(qt4.QDockWidget):
         sys.stdout = temp_stdout
         sys.stderr = temp_stderr
 
+    def runJobs(self, jobfunctions):
+        """Run jobs in a background thread, one after another, showing
+        their progress. The jobs are returned by the functions given,
+        which are called within the console window.
+
+        See widgets.Action for the job interface."""
+
+        jobfunctions = list(jobfunctions)
+
+        def nextjob(cancelled=False):
+            if cancelled:
+                del jobfunctions[:]
+            while jobfunctions:
+                jobs = []
+                func = jobfunctions.pop(0)
+                self.runFunction(lambda: jobs.append(func()))
+                if jobs and jobs[0] is not None:
+                    self._startJob(jobs[0], nextjob)
+                    break
+
+        nextjob()
+
+    def _startJob(self, job, ondone):
+        """Start job in thread. ondone is called when it has finished,
+        with whether it was cancelled."""
+
+        dialog = qt4.QProgressDialog(job.descr, _('Cancel'), 0, 0, self)
+        dialog.setWindowTitle(_('Running - Veusz'))
+        dialog.setWindowModality(qt4.Qt.WindowModal)
+        dialog.setMinimumDuration(500)
+        dialog.setValue(0)
+
+        thread = _JobThread(job)
+        cancelled = []
+
+        def progress(text):
+            dialog.setLabelText('%s\n%s' % (job.descr, text))
+        def cancel():
+            cancelled.append(True)
+            job.cancel()
+        def finished():
+            dialog.canceled.disconnect(cancel)
+            dialog.reset()
+            dialog.deleteLater()
+            self.jobthreads.remove(thread)
+            if thread.error is not None:
+                self.output_stderr(thread.error)
+            else:
+                self.runFunction(job.finish)
+            ondone(bool(cancelled))
+
+        thread.sigProgress.connect(progress)
+        thread.finished.connect(finished)
+        dialog.canceled.connect(cancel)
+
+        # keep reference while running
+        self.jobthreads.append(thread)
+        thread.start()
+
     def checkVisible(self):
         """If this window is hidden, show it, then hide it again in a few
         seconds."""
@@ -30,6 +30,7 @@ import numpy as N
 from .. import setting
 from ..dialogs import exceptiondialog
 from .. import document
+from ..document.painthelper import RenderCache
 from .. import utils
 from .. import widgets
 
@@ -277,6 +278,9 @@ class PlotWindow( qt4.QGraphicsView ):
         # state of last plot from painthelper
         self.painthelper = None
 
+        # layers of widgets kept between redraws
+        self.rendercache = RenderCache()
+
         self.lastwidgetsselected = []
         self.oldzoom = -1.
         self.zoomfactor = 1.
@@ -916,8 +920,10 @@ class PlotWindow( qt4.QGraphicsView ):
                 # errors cause an exception window to pop up
                 try:
                     phelper = document.PaintHelper(
-                        size, scaling=self.zoomfactor, dpi=self.dpi)
+                        size, scaling=self.zoomfactor, dpi=self.dpi,
+                        rendercache=self.rendercache, decimate=True)
                     self.document.paintTo(phelper, self.pagenumber)
+                    self.rendercache.finishRedraw()
 
                 except Exception:
                     # stop updates this time round and show exception dialog
@@ -1004,6 +1010,7 @@ class PlotWindow( qt4.QGraphicsView ):
     def actionForceUpdate(self):
         """Force an update for the graph."""
         self.docchangeset = -100
+        self.rendercache.clear()
         self.checkPlotUpdate()
 
     def slotFullScreen(self):
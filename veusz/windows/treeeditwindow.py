@@ -120,7 +120,10 @@ class SettingsProxySingle(SettingsProxy):
 
     def onAction(self, action, console):
         """Run action on console."""
-        console.runFunction(action.function)
+        if action.jobfunction is not None:
+            console.runJobs([action.jobfunction])
+        else:
+            console.runFunction(action.function)
 
     def name(self):
         """Return name."""
@@ -257,10 +260,17 @@ class SettingsProxyMulti(SettingsProxy):
     def onAction(self, action, console):
         """Run actions with same name."""
         aname = action.name
+        actions = []
         for w in self.widgets:
             for a in w.actions:
                 if a.name == aname:
-                    console.runFunction(a.function)
+                    actions.append(a)
+
+        if all([a.jobfunction is not None for a in actions]):
+            console.runJobs([a.jobfunction for a in actions])
+        else:
+            for a in actions:
+                console.runFunction(a.function)
 
     def name(self):
         return self._settingsatlevel[0].name